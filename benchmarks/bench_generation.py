@@ -0,0 +1,176 @@
+"""
+Benchmark for Swarm's generation and submission throughput.
+
+Generates synthetic command files (with comments, blank lines and multi-line
+commands), then times each phase for every output mode:
+
+  parse   - streaming the file through the parser
+  write   - writing job scripts / the manifest
+  submit  - writing the master script(s) and "submitting" to a fake sbatch
+
+Each case runs in a fresh Python process so peak memory is measured cleanly.
+
+Usage:
+    python benchmarks/bench_generation.py
+    python benchmarks/bench_generation.py --sizes 1000,1000000 --modes manifest --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+DEFAULT_MODES = "scripts,manifest"
+
+# A stand-in for sbatch that accepts anything and prints a job ID instantly
+FAKE_SBATCH = """#!/bin/sh
+echo "Submitted batch job $$"
+"""
+
+def generate_command_file(path: Path, lines: int, seed: int = 42) -> None:
+    """Writes roughly `lines` lines: mostly commands, plus comments, blanks and continuations."""
+    rng = random.Random(seed)
+    written = 0
+    with open(path, "w") as handle:
+        while written < lines:
+            roll = rng.random()
+            if roll < 0.05:
+                handle.write(f"# sample {written}\n")
+                written += 1
+            elif roll < 0.08:
+                handle.write("\n")
+                written += 1
+            elif roll < 0.25:
+                handle.write(
+                    f"samtools view -bS sample_{written}.sam \\\n"
+                    f"  | samtools sort -@ 4 \\\n"
+                    f"  -o sample_{written}.bam\n"
+                )
+                written += 3
+            else:
+                handle.write(f"python analyze.py --input data_{written}.csv --seed {rng.randint(0, 10**6)}\n")
+                written += 1
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _count_files(directory: Path) -> int:
+    return sum(1 for _ in directory.iterdir())
+
+def run_case(command_file: Path, mode: str, work_dir: Path, max_array_size: int) -> dict:
+    """Runs one (size, mode) case in this process and returns its measurements."""
+    from swarm.parser import create_job_scripts, create_task_manifest, iter_commands
+    from swarm.slurm import submit_job_array
+
+    results = {}
+
+    start = time.perf_counter()
+    commands = sum(1 for _ in iter_commands(command_file))
+    results["parse"] = {"seconds": time.perf_counter() - start, "peak_rss_mb": _peak_rss_mb(), "files": 0}
+
+    array_dir = work_dir / "arrays"
+    array_dir.mkdir()
+    create = create_task_manifest if mode == "manifest" else create_job_scripts
+    start = time.perf_counter()
+    job_scripts = create(command_file, array_dir)
+    results["write"] = {
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb(),
+        "files": _count_files(array_dir),
+    }
+
+    files_before = _count_files(array_dir)
+    start = time.perf_counter()
+    job_ids = submit_job_array(
+        job_scripts=job_scripts,
+        output_log="%A_%a.log",
+        error_log="%A_%a.err",
+        job_name="bench",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=1,
+        memory="1G",
+        cwd=work_dir,
+        rate_limit=None,
+        max_array_size=max_array_size,
+        dry_run=False
+    )
+    results["submit"] = {
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb(),
+        "files": _count_files(array_dir) - files_before,
+        "arrays": len(job_ids),
+    }
+    results["commands"] = commands
+    return results
+
+def run_case_in_subprocess(command_file: Path, mode: str, max_array_size: int) -> dict:
+    """Runs a case in a fresh interpreter, with the fake sbatch first on PATH."""
+    with tempfile.TemporaryDirectory(prefix="swarm_bench_") as tmp:
+        tmp_path = Path(tmp)
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        sbatch = bin_dir / "sbatch"
+        sbatch.write_text(FAKE_SBATCH)
+        sbatch.chmod(0o755)
+
+        work_dir = tmp_path / "work"
+        work_dir.mkdir()
+        env = {**os.environ, "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"}
+        result = subprocess.run(
+            [sys.executable, __file__, "--run-case", str(command_file), mode, str(work_dir), str(max_array_size)],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True
+        )
+        # The case prints its results as the last line of stdout
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Swarm generation and submission throughput.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated input sizes in lines (default: {DEFAULT_SIZES}).")
+    parser.add_argument("--modes", default=DEFAULT_MODES, help=f"Comma-separated output modes (default: {DEFAULT_MODES}).")
+    parser.add_argument("--max-array-size", type=int, default=10001, help="MaxArraySize to split against (default: 10001).")
+    parser.add_argument("--json", help="Also write all results to this JSON file.")
+    parser.add_argument("--run-case", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        command_file, mode, work_dir, max_array_size = args.run_case
+        print(json.dumps(run_case(Path(command_file), mode, Path(work_dir), int(max_array_size))))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    modes = args.modes.split(",")
+    all_results = []
+
+    print(f"{'lines':>9} {'commands':>9} {'mode':>9} {'phase':>7} {'seconds':>9} {'peak MB':>8} {'files':>8}")
+    with tempfile.TemporaryDirectory(prefix="swarm_bench_inputs_") as inputs:
+        for size in sizes:
+            command_file = Path(inputs) / f"commands_{size}.sh"
+            generate_command_file(command_file, size)
+            for mode in modes:
+                results = run_case_in_subprocess(command_file, mode, args.max_array_size)
+                for phase in ("parse", "write", "submit"):
+                    measured = results[phase]
+                    print(f"{size:>9} {results['commands']:>9} {mode:>9} {phase:>7} "
+                          f"{measured['seconds']:>9.3f} {measured['peak_rss_mb']:>8.1f} {measured['files']:>8}")
+                all_results.append({"lines": size, "mode": mode, **results})
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(all_results, indent=2))
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from swarm.manifest import ManifestWriter
+from swarm.modules import verify_modules_cached
+from swarm.parser import JobScriptWriter, write_tasks
+from swarm.slurm import (
+    BACKENDS,
+    DEFAULT_MAX_IN_FLIGHT,
+    get_max_array_size,
+    stage_dependencies,
+    submit_job_array,
+)
+from swarm.staging import NodeStaging
+from swarm.state import dry_run_dir, load_state, read_task_status
+
+logger = logging.getLogger(__name__)
+
+class JobHandle(NamedTuple):
+    """What one Swarm.submit() call produced: the array's name, files and Slurm job ID(s)."""
+    job_name: str
+    job_ids: Tuple[str, ...]     # empty for a dry run
+    array_dir: Path
+    task_count: int
+
+    def state(self) -> Dict:
+        """The saved state of the submission (the same file `swarm resume` uses)."""
+        return load_state(self.array_dir, self.job_name)
+
+    def task_status(self) -> Dict[int, int]:
+        """{task_id: exit_code} for every task that has finished so far."""
+        return read_task_status(Path(self.state()["tasks_file"]))
+
+class Swarm:
+    """
+    Submits job arrays straight from Python, without a command file or the
+    CLI. Settings are given once (with the same defaults as the `swarm`
+    command) and every submit() call streams one iterable of commands into
+    a new array. Modules are verified once, when the Swarm is created, and
+    logging is left to the application that uses it.
+
+        swarm = Swarm(partition="compute", memory="4G", modules=["samtools"])
+        handle = swarm.submit((f"samtools index {bam}" for bam in bams), job_name="index")
+    """
+
+    def __init__(
+        self,
+        array_dir: Union[str, Path] = "sbatch_arrays",
+        cwd: Union[str, Path] = None,
+        partition: str = "general-cpu",
+        time: str = "24:00:00",
+        cpus: int = 4,
+        memory: str = "8G",
+        output_log: str = "%A_%a.log",
+        error_log: str = "%A_%a.err",
+        sbatch_options: str = "",
+        rate_limit: int = None,
+        bundle: int = 1,
+        serial: bool = False,
+        manifest: bool = True,
+        modules: List[str] = None,
+        container_image: str = None,
+        container_mounts: str = None,
+        backend: str = "slurm",
+        max_array_size: int = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        log_segments: int = 0,
+        compress_logs: bool = False,
+        staging: NodeStaging = None,
+        speculative: bool = False,
+        dry_run: bool = False
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Choose from: {', '.join(BACKENDS)}.")
+
+        # Same layout as the CLI: a relative array_dir lives inside the working directory
+        self.cwd = Path(cwd or Path.cwd()).resolve()
+        self.array_dir = (self.cwd / array_dir).resolve()
+        self.array_dir.mkdir(parents=True, exist_ok=True)
+
+        self.modules = list(modules or [])
+        if self.modules:
+            failures = verify_modules_cached(self.modules)
+            if failures:
+                details = "; ".join(f"{module}: {diagnostics}" for module, diagnostics in failures.items())
+                raise ValueError(f"Could not load module(s): {details}")
+
+        self.options = dict(
+            partition=partition,
+            time=time,
+            cpus=cpus,
+            memory=memory,
+            output_log=output_log,
+            error_log=error_log,
+            sbatch_options=sbatch_options,
+            rate_limit=rate_limit,
+            bundle=bundle,
+            serial=serial,
+            container_image=container_image,
+            container_mounts=container_mounts,
+            backend=backend,
+            max_in_flight=max_in_flight,
+            log_segments=log_segments,
+            compress_logs=compress_logs,
+            staging=staging,
+            speculative=speculative,
+            dry_run=dry_run,
+        )
+        self.manifest = manifest
+        self._max_array_size = max_array_size
+
+    @property
+    def max_array_size(self) -> Optional[int]:
+        # Asked from scontrol once, on the first Slurm submission
+        if self._max_array_size is None and self.options["backend"] == "slurm":
+            self._max_array_size = get_max_array_size()
+        return self._max_array_size
+
+    def submit(
+        self,
+        commands: Iterable[str],
+        job_name: str = "swarm_array",
+        after: JobHandle = None,
+        **options
+    ) -> JobHandle:
+        """
+        Writes the commands into array_dir/<job_name> as they are produced
+        (a generator is never held in memory) and submits them as one job
+        array. Each item is one complete bash command. `after` makes the
+        array wait until that earlier submission has succeeded, and any
+        keyword (e.g. memory="64G") overrides the Swarm's setting for this
+        array only.
+        """
+        unknown = set(options) - set(self.options)
+        if unknown:
+            raise TypeError(f"Unknown submit option(s): {', '.join(sorted(unknown))}")
+        settings = {**self.options, **options}
+        if settings["speculative"] and settings["bundle"] > 1:
+            raise ValueError("speculative=True cannot be combined with bundle > 1.")
+
+        # Every array gets its own folder, so submissions never overwrite each other's tasks
+        # A dry run keeps clear of the scripts of real submissions (see dry_run_dir)
+        array_dir = dry_run_dir(self.array_dir) if settings["dry_run"] else self.array_dir
+        task_dir = array_dir / job_name
+        task_dir.mkdir(parents=True, exist_ok=True)
+        writer = ManifestWriter(task_dir) if self.manifest else JobScriptWriter(task_dir)
+        tasks = write_tasks(_checked(commands), writer, self.modules)
+        if not len(tasks):
+            raise ValueError(f"No commands given for '{job_name}'.")
+
+        dependencies = None
+        if after is not None:
+            dependencies = stage_dependencies(after.job_name, list(after.job_ids), per_task=False)
+
+        job_ids = submit_job_array(
+            job_scripts=tasks,
+            job_name=job_name,
+            array_dir=array_dir,
+            cwd=self.cwd,
+            max_array_size=self.max_array_size,
+            dependencies=dependencies,
+            **settings
+        )
+        logger.info(f"Submitted {len(tasks)} task(s) as '{job_name}': {', '.join(job_ids) or 'dry run'}")
+        return JobHandle(job_name, tuple(job_ids), self.array_dir, len(tasks))
+
+def _checked(commands: Iterable[str]) -> Iterator[str]:
+    """Passes the commands through, refusing any that would not fit on one line."""
+    for number, command in enumerate(commands, start=1):
+        command = command.strip()
+        if not command:
+            raise ValueError(f"Command {number} is empty.")
+        if "\n" in command:
+            raise ValueError(f"Command {number} spans several lines; join them with ';' or '&&'.")
+        yield command
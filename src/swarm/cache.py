@@ -0,0 +1,39 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+def cache_dir() -> Path:
+    """
+    Where Swarm keeps data between runs. Uses $SWARM_CACHE_DIR if set,
+    otherwise $XDG_CACHE_HOME/swarm (usually ~/.cache/swarm).
+    """
+    if os.environ.get("SWARM_CACHE_DIR"):
+        path = Path(os.environ["SWARM_CACHE_DIR"])
+    else:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        path = Path(xdg_cache) / "swarm"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def load_json(path: Path, default: Any = None) -> Any:
+    """Reads a JSON file, returning `default` if it is missing or unreadable."""
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        logger.debug(f"Ignoring unreadable cache file {path}: {e}")
+        return default
+
+def save_json(path: Path, data: Any) -> None:
+    """
+    Writes a JSON file atomically (write a temp file, then rename), so that
+    concurrent swarm runs never see a half-written file.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
@@ -0,0 +1,119 @@
+import fcntl
+import logging
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from swarm.cache import cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Pyxis/enroot's default registry when an image has no "registry#" prefix
+DEFAULT_REGISTRY = "docker.io"
+
+def image_cache_dir() -> Path:
+    """
+    Where staged .sqsh images are kept. Compute nodes must be able to read it,
+    so it defaults to Swarm's cache directory (usually in your home directory)
+    and can be moved to shared scratch with $SWARM_IMAGE_CACHE.
+    """
+    if os.environ.get("SWARM_IMAGE_CACHE"):
+        path = Path(os.environ["SWARM_IMAGE_CACHE"])
+    else:
+        path = cache_dir() / "images"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def is_image_file(image: str) -> bool:
+    """True if --image already points at a squashfs file instead of a registry image."""
+    return image.endswith(".sqsh") or image.startswith(("/", "./", "../")) or Path(image).is_file()
+
+def registry_reference(image: str) -> str:
+    """
+    Turns Pyxis' "[USER@][REGISTRY#]IMAGE[:TAG]" format into a plain
+    "registry/image:tag" reference, e.g. "ubuntu" -> "docker.io/library/ubuntu:latest".
+    """
+    # A "user@" prefix only exists together with a "registry#"
+    reference = image.split("@", 1)[1] if "#" in image and "@" in image.split("#")[0] else image
+    registry, _, name = reference.rpartition("#")
+    registry = registry or DEFAULT_REGISTRY
+    if registry == DEFAULT_REGISTRY and "/" not in name:
+        name = f"library/{name}"
+    if ":" not in name.rsplit("/", 1)[-1]:
+        name = f"{name}:latest"
+    return f"{registry}/{name}"
+
+def resolve_digest(image: str) -> Optional[str]:
+    """
+    Asks the registry for the image's digest (e.g. "sha256:ab12...") with skopeo.
+    This only downloads the manifest, not the image. Returns None if skopeo is
+    not installed or the registry cannot be reached.
+    """
+    try:
+        result = subprocess.run(
+            ["skopeo", "inspect", "--format", "{{.Digest}}", f"docker://{registry_reference(image)}"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug(f"Could not resolve the digest of {image} ({e}).")
+        return None
+    digest = result.stdout.strip()
+    return digest or None
+
+def _cache_key(image: str, digest: Optional[str]) -> str:
+    """File name for a cached image: its digest if known, otherwise its name."""
+    if digest:
+        return digest.replace(":", "-")
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", registry_reference(image))
+
+def stage_image(image: str, dry_run: bool = False) -> Path:
+    """
+    Imports a registry image into the shared .sqsh cache once (with
+    `enroot import`) and returns the cached file. Later runs with the same
+    digest reuse the file, so compute nodes never pull from the registry.
+    """
+    digest = resolve_digest(image)
+    if digest is None:
+        logger.warning(f"Could not resolve the digest of '{image}'. Caching it by name, "
+                       "so a re-pushed tag will not be noticed.")
+    sqsh_path = image_cache_dir() / f"{_cache_key(image, digest)}.sqsh"
+
+    if sqsh_path.exists():
+        logger.info(f"Using cached image {sqsh_path} for {image}")
+        return sqsh_path
+    if dry_run:
+        print(f"[DRY RUN] Would import {image} into {sqsh_path}")
+        return sqsh_path
+
+    # Several swarm runs may stage the same image at once: only one imports it
+    lock_path = sqsh_path.with_name(f"{sqsh_path.name}.lock")
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if sqsh_path.exists():
+            logger.info(f"Image {image} was staged by another swarm run.")
+            return sqsh_path
+
+        # Import under a temporary name and rename, so a crash never leaves a broken cache entry
+        tmp_path = sqsh_path.with_name(f".{sqsh_path.name}.{os.getpid()}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        print(f"Importing {image} into {sqsh_path} (only needed once)...")
+        try:
+            subprocess.run(
+                ["enroot", "import", "--output", str(tmp_path), f"docker://{image}"],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+        except FileNotFoundError:
+            raise RuntimeError("'enroot' was not found, so the image cannot be staged. Run without --stage-image.")
+        except subprocess.CalledProcessError as e:
+            tmp_path.unlink(missing_ok=True)
+            raise RuntimeError(f"enroot import failed: {e.stderr.strip()}")
+
+        os.replace(tmp_path, sqsh_path)
+    logger.info(f"Staged {image} ({digest or 'digest unknown'}) at {sqsh_path}")
+    return sqsh_path
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Optional
+
+# The event log lives next to the array scripts it describes, one JSON object per line
+EVENT_LOG_FILE = "swarm_events.jsonl"
+
+# Records logged before we know the array_dir are kept in memory (up to this many)
+BUFFER_LIMIT = 10_000
+
+# Write the log file in large chunks instead of one system call per record
+WRITE_BUFFER_BYTES = 1 << 16
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON line. Structured fields can be attached with
+    logger.info("...", extra={"event": {"phase": "parse", "seconds": 1.2}}).
+    """
+
+    def __init__(self, run_id: str):
+        super().__init__()
+        self.run_id = run_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "time": round(record.created, 6),
+            "run": self.run_id,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        event.update(getattr(record, "event", {}))
+        return json.dumps(event, default=str)
+
+class DeferredFileHandler(logging.Handler):
+    """
+    Buffers records in memory until open() says where the log file goes,
+    then writes everything (earlier records first) through a buffered file.
+    """
+
+    def __init__(self, run_id: str):
+        super().__init__()
+        self.setFormatter(JsonFormatter(run_id))
+        self._pending = []
+        self._stream = None
+
+    def open(self, path: Path) -> None:
+        # The listener thread may be emitting at the same time
+        with self.lock:
+            if self._stream is not None:
+                return
+            self._stream = open(path, "a", buffering=WRITE_BUFFER_BYTES)
+            for record in self._pending:
+                self._stream.write(self.format(record) + "\n")
+            self._pending = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self._stream is None:
+            if len(self._pending) < BUFFER_LIMIT:
+                self._pending.append(record)
+            return
+        self._stream.write(self.format(record) + "\n")
+
+    def close(self) -> None:
+        with self.lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+        super().close()
+
+class EventLog:
+    """
+    Routes all logging through a queue, so logging calls only enqueue a record
+    and a background thread does the formatting and writing. Records go to a
+    JSONL file in array_dir (once open_in() is called) and, with --debug, to
+    the terminal as well.
+    """
+
+    def __init__(self, level: int = logging.INFO, debug_console: bool = False):
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.path: Optional[Path] = None
+
+        self.file_handler = DeferredFileHandler(self.run_id)
+        self.file_handler.setLevel(level)
+        handlers = [self.file_handler]
+
+        # If the user passes the --debug flag, ALSO print technical logs to the screen
+        if debug_console:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(logging.DEBUG)
+            console_handler.setFormatter(logging.Formatter("DEBUG [%(name)s]: %(message)s"))
+            handlers.append(console_handler)
+
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = QueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+        # Records below this level are dropped before they are even created
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+        root.setLevel(logging.DEBUG if debug_console else level)
+        self.listener.start()
+
+    def open_in(self, directory: Path) -> Path:
+        """Starts writing the event log into `directory` (earlier records included)."""
+        self.path = directory / EVENT_LOG_FILE
+        self.file_handler.open(self.path)
+        return self.path
+
+    def close(self) -> None:
+        """Writes out everything still queued and detaches from the logging system."""
+        self.listener.stop()
+        self.file_handler.close()
+        logging.getLogger().removeHandler(self.queue_handler)
@@ -0,0 +1,213 @@
+import json
+import logging
+import math
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from swarm.cache import cache_dir, load_json, save_json
+from swarm.report import format_duration, percentile
+from swarm.state import read_task_records, state_path
+
+logger = logging.getLogger(__name__)
+
+# Requests are sized from this percentile of past runs, plus some headroom
+HISTORY_PERCENTILE = 99
+TIME_HEADROOM = 1.5
+MEM_HEADROOM = 1.25
+
+# Only the most recent runs count (pipelines and inputs change over time)
+RECENT_RUNS = 5
+
+# A submission whose tasks have not all reported after this long (some were
+# killed, say) is recorded with what it has
+MAX_SUBMISSION_AGE = 7 * 24 * 3600
+
+# Never request less than this, however quick or small the tasks were
+MIN_TIME_SECONDS = 5 * 60
+MIN_MEM_KB = 256 * 1024
+
+def _history_file() -> Path:
+    return cache_dir() / "history.jsonl"
+
+def load_history(job_name: str) -> List[Dict]:
+    """All recorded runs of a job name, oldest first."""
+    runs = []
+    try:
+        with open(_history_file()) as handle:
+            for line in handle:
+                try:
+                    run = json.loads(line)
+                except ValueError:
+                    continue
+                if run.get("job_name") == job_name:
+                    runs.append(run)
+    except FileNotFoundError:
+        pass
+    return runs
+
+def _parse_memory_kb(value: str) -> Optional[float]:
+    """Parses sacct memory values such as '2048K', '1.5G' or '512M' into kilobytes."""
+    match = re.fullmatch(r"([\d.]+)([KMGT]?)", value.strip())
+    if not match:
+        return None
+    scale = {"": 1 / 1024, "K": 1, "M": 1024, "G": 1024 ** 2, "T": 1024 ** 3}[match.group(2)]
+    return float(match.group(1)) * scale
+
+def query_sacct(job_ids: List[str]) -> Tuple[List[float], List[float]]:
+    """
+    Asks Slurm's accounting for the runtime and peak memory of every successful
+    task in the given jobs. Returns (runtimes in seconds, peak RSS in KB).
+    """
+    try:
+        result = subprocess.run(
+            ["sacct", "-j", ",".join(job_ids), "--parsable2", "--noheader",
+             "--units=K", "--format=JobID,State,ElapsedRaw,MaxRSS"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug(f"Could not query sacct ({e}).")
+        return [], []
+
+    runtimes: Dict[str, float] = {}
+    peak_rss: Dict[str, float] = {}
+    for line in result.stdout.splitlines():
+        fields = line.split("|")
+        if len(fields) < 4:
+            continue
+        job_id, state, elapsed, max_rss = fields[:4]
+        task = job_id.split(".")[0]
+        # The array task line holds the runtime, its steps (.batch, .extern) the memory
+        if "." not in job_id and state == "COMPLETED" and elapsed.isdigit():
+            runtimes[task] = float(elapsed)
+        memory = _parse_memory_kb(max_rss) if max_rss else None
+        if memory is not None:
+            peak_rss[task] = max(memory, peak_rss.get(task, 0))
+
+    return list(runtimes.values()), [peak_rss[task] for task in runtimes if task in peak_rss]
+
+def _submissions_file() -> Path:
+    return cache_dir() / "submissions.json"
+
+def remember_submission(array_dir: Path, job_name: str) -> None:
+    """
+    Notes where the state of a --auto-resources submission lives, so a later
+    run of the same job name can learn from it from any directory.
+    """
+    path = str(state_path(array_dir, job_name).resolve())
+    submissions = load_json(_submissions_file(), {})
+    if path not in submissions.setdefault(job_name, []):
+        submissions[job_name].append(path)
+        save_json(_submissions_file(), submissions)
+
+def _commands_at_once(state: Dict) -> Tuple[int, int]:
+    """(rounds, commands at once) of one array task: how a bundle (or pack worker pool) ran its commands."""
+    parallel = state.get("parallel_tasks", 1)
+    if state.get("pack"):
+        return 1, parallel
+    bundle = state.get("bundle", 1)
+    parallel = min(bundle, parallel)
+    return -(-bundle // parallel), parallel
+
+def _has_finished(state_file: Path, state: Dict) -> bool:
+    """True once every task of a submission has reported back (or it was submitted long ago)."""
+    if time.time() - state_file.stat().st_mtime > MAX_SUBMISSION_AGE:
+        return True
+    return len(read_task_records(Path(state["tasks_file"]))) >= state["job_count"]
+
+def record_previous_run(array_dir: Path, job_name: str, use_sacct: bool = False) -> bool:
+    """
+    Adds the last submission of `job_name` in array_dir to the history store,
+    before a new submission overwrites its files. Runtimes and peak memory
+    are stored per command. Returns True if a run was added.
+    """
+    state = load_json(state_path(array_dir, job_name))
+    if not state or not state.get("job_ids"):
+        return False
+    if any(run.get("job_ids") == state["job_ids"] for run in load_history(job_name)):
+        return False
+
+    successful = [r for r in read_task_records(Path(state["tasks_file"])).values() if r.exit_code == 0]
+    runtimes = [r.duration for r in successful if r.duration is not None]
+    peak_rss = [r.peak_rss_kb for r in successful if r.peak_rss_kb is not None]
+
+    # Nodes without GNU time record no memory, so ask Slurm's accounting instead.
+    # It reports whole array tasks: a bundle's figures are spread over its commands,
+    # and a packed allocation's runtime says nothing about one command.
+    if use_sacct and (not runtimes or not peak_rss):
+        sacct_runtimes, sacct_rss = query_sacct(state["job_ids"])
+        rounds, at_once = _commands_at_once(state)
+        if not state.get("pack"):
+            runtimes = runtimes or [runtime / rounds for runtime in sacct_runtimes]
+        peak_rss = peak_rss or [rss / at_once for rss in sacct_rss]
+
+    if not runtimes and not peak_rss:
+        return False
+
+    run = {
+        "job_name": job_name,
+        "job_ids": state["job_ids"],
+        "recorded": time.time(),
+        "tasks": len(successful),
+        "runtime": percentile(runtimes, HISTORY_PERCENTILE) if runtimes else None,
+        "peak_rss_kb": percentile(peak_rss, HISTORY_PERCENTILE) if peak_rss else None,
+    }
+    with open(_history_file(), "a") as handle:
+        handle.write(json.dumps(run) + "\n")
+    logger.debug(f"Recorded run {state['job_ids']} of '{job_name}' in the history store.")
+    return True
+
+def record_previous_runs(job_name: str, array_dir: Path, use_sacct: bool = False) -> int:
+    """
+    Adds every earlier --auto-resources submission of `job_name` (wherever
+    its array_dir is) that has finished to the history store, plus the one
+    in `array_dir` that is about to be overwritten. Returns how many were added.
+    """
+    recorded = int(record_previous_run(array_dir, job_name, use_sacct=use_sacct))
+    submissions = load_json(_submissions_file(), {})
+    remaining = []
+    for path in submissions.get(job_name, []):
+        state_file = Path(path)
+        state = load_json(state_file)
+        if not state:
+            continue
+        if _has_finished(state_file, state):
+            recorded += record_previous_run(state_file.parent, job_name, use_sacct=use_sacct)
+        else:
+            # Still running: look again next time
+            remaining.append(path)
+    if submissions.get(job_name, []) != remaining:
+        submissions[job_name] = remaining
+        save_json(_submissions_file(), submissions)
+    return recorded
+
+def suggest_resources(
+    job_name: str,
+    serial_tasks: int = 1,
+    parallel_tasks: int = 1
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Suggests (--time, --mem) for a job name from its recent runs, or None for
+    either one if there is no history to go on. With bundling, an array task
+    runs `serial_tasks` commands back to back and `parallel_tasks` at once.
+    """
+    runs = load_history(job_name)[-RECENT_RUNS:]
+    runtimes = [run["runtime"] for run in runs if run.get("runtime") is not None]
+    peak_rss = [run["peak_rss_kb"] for run in runs if run.get("peak_rss_kb") is not None]
+
+    time_str = None
+    if runtimes:
+        # Round up to whole minutes
+        seconds = max(MIN_TIME_SECONDS, math.ceil(max(runtimes) * serial_tasks * TIME_HEADROOM / 60) * 60)
+        time_str = format_duration(seconds)
+
+    mem_str = None
+    if peak_rss:
+        # Round up to whole megabytes
+        mem_str = f"{math.ceil(max(MIN_MEM_KB, max(peak_rss) * parallel_tasks * MEM_HEADROOM) / 1024)}M"
+
+    return time_str, mem_str
@@ -0,0 +1,169 @@
+import fcntl
+import getpass
+import logging
+import os
+import socket
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from swarm.cache import cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Last job ID handed out on this machine, shared by every swarm process (under a lock)
+JOB_ID_FILE = "local_job_ids.txt"
+
+# Exit codes of the local arrays run by this process: {job_id: {array index: exit code}},
+# so a later stage's --dependency can be honoured
+_finished: Dict[str, Dict[int, int]] = {}
+
+def _allocate_job_ids(count: int) -> int:
+    """
+    Reserves `count` consecutive numeric job IDs and returns the first. Like
+    Slurm, the array is known by its first ID and task N of it has ID first + N.
+    The counter file is locked, so two swarm processes (e.g. a submission and
+    its resume) never share an ID, and it starts from the clock.
+    """
+    path = cache_dir() / JOB_ID_FILE
+    with open(path, "a+") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        handle.seek(0)
+        last = handle.read().strip()
+        first = max(int(last) + 1 if last.isdigit() else 0, int(time.time()))
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{first + count - 1}\n")
+    return first
+
+def _blocked_by_dependency(dependency: str, index: int) -> bool:
+    """
+    True if a local --dependency cannot be met for this array index: the
+    matching task ("aftercorr") or any task ("afterok") of an earlier local
+    array failed. Jobs this process did not run are not known and never block.
+    """
+    kind, _, job_ids = dependency.partition(":")
+    for job_id in job_ids.split(":"):
+        codes = _finished.get(job_id)
+        if codes is None:
+            logger.warning(f"The local backend cannot check --dependency on job {job_id}; running anyway.")
+            continue
+        if kind == "aftercorr" and codes.get(index, 0) != 0:
+            return True
+        if kind == "afterok" and any(codes.values()):
+            return True
+    return False
+
+def parse_array_spec(array_spec: str) -> Tuple[List[int], int]:
+    """
+    Expands a Slurm --array value such as "1-10%2" or "3,17-19,40".
+    Returns (indexes, max_simultaneous), with 0 meaning "no limit".
+    """
+    spec, _, limit = array_spec.partition("%")
+    indexes = []
+    for part in spec.split(","):
+        if "-" in part:
+            first, last = part.split("-", 1)
+            step = 1
+            if ":" in last:
+                last, step = last.split(":", 1)
+            indexes.extend(range(int(first), int(last) + 1, int(step)))
+        elif part:
+            indexes.append(int(part))
+    return indexes, int(limit) if limit else 0
+
+def expand_log_pattern(pattern: str, job_id: str, task_id: int, job_name: str, task_job_id: str = None) -> str:
+    """
+    Fills in Slurm's filename patterns (%A, %a, %j, %x, %u, %N, %%) the way
+    sbatch does. %j is the task's own job ID (`task_job_id`).
+    """
+    replacements = {
+        "A": job_id,
+        "a": str(task_id),
+        "j": task_job_id or job_id,
+        "x": job_name,
+        "u": getpass.getuser(),
+        "N": socket.gethostname(),
+        "%": "%",
+    }
+    result = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == "%":
+            key = next(chars, "")
+            result.append(replacements.get(key, f"%{key}"))
+        else:
+            result.append(char)
+    return "".join(result)
+
+def _sbatch_options(sbatch_command_parts: List[str]) -> Dict[str, str]:
+    """Reads the --key=value options of an sbatch command built by Swarm."""
+    options = {}
+    for part in sbatch_command_parts[1:-1]:
+        if part.startswith("--") and "=" in part:
+            key, value = part[2:].split("=", 1)
+            options[key] = value
+    return options
+
+def run_local_array(sbatch_command_parts: List[str]) -> str:
+    """
+    Runs an sbatch command's array on this machine instead of submitting it.
+    Every array index runs the master script in its own process, up to the
+    --array rate limit (or the number of CPUs) at a time. Returns a job ID.
+    """
+    options = _sbatch_options(sbatch_command_parts)
+    master_script = sbatch_command_parts[-1]
+    indexes, max_running = parse_array_spec(options.get("array", "1"))
+    concurrency = max_running or os.cpu_count() or 1
+
+    for ignored in ("container-image", "container-mounts", "exclude"):
+        if ignored in options:
+            logger.warning(f"The local backend ignores --{ignored}.")
+
+    first_id = _allocate_job_ids(len(indexes))
+    job_id = str(first_id)
+    dependency = options.get("dependency")
+    job_name = options.get("job-name", "swarm_array")
+    cwd = Path(options.get("chdir", "."))
+    # With --open-mode=append, tasks may share one log file (as with --log-segments)
+    mode = "a" if options.get("open-mode") == "append" else "w"
+    logger.info(f"Running {len(indexes)} task(s) of {master_script} locally, {concurrency} at a time.")
+
+    def run_task(position: int, task_id: int) -> Optional[int]:
+        # A task whose dependency can never be met is cancelled, as with --kill-on-invalid-dep
+        if dependency and _blocked_by_dependency(dependency, task_id):
+            return None
+        task_job_id = str(first_id + position)
+        env = {
+            **os.environ,
+            "SLURM_JOB_ID": task_job_id,
+            "SLURM_ARRAY_JOB_ID": job_id,
+            "SLURM_ARRAY_TASK_ID": str(task_id),
+            "SLURM_JOB_NAME": job_name,
+            "SLURM_CPUS_PER_TASK": options.get("cpus-per-task", "1"),
+            "SLURM_SUBMIT_DIR": str(Path.cwd()),
+        }
+        output_path = cwd / expand_log_pattern(options.get("output", "slurm-%A_%a.out"), job_id, task_id, job_name, task_job_id)
+        error_path = cwd / expand_log_pattern(options.get("error", str(output_path)), job_id, task_id, job_name, task_job_id)
+
+        with open(output_path, mode) as stdout:
+            if error_path == output_path:
+                return subprocess.run(["bash", master_script], cwd=cwd, env=env,
+                                      stdout=stdout, stderr=subprocess.STDOUT).returncode
+            with open(error_path, mode) as stderr:
+                return subprocess.run(["bash", master_script], cwd=cwd, env=env,
+                                      stdout=stdout, stderr=stderr).returncode
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        exit_codes = list(pool.map(run_task, range(len(indexes)), indexes))
+
+    cancelled = sum(1 for code in exit_codes if code is None)
+    failed = sum(1 for code in exit_codes if code is not None and code != 0)
+    # Cancelled tasks count as failed for the stages that depend on this one
+    _finished[job_id] = {index: 1 if code is None else code for index, code in zip(indexes, exit_codes)}
+    print(f"Local job {job_id} finished: {len(indexes) - failed - cancelled} of {len(indexes)} task(s) succeeded.")
+    if cancelled:
+        print(f"Local job {job_id}: {cancelled} task(s) did not run because their --dependency failed.")
+    return job_id
@@ -1,40 +1,49 @@
+import itertools
 import logging
 from typing import List
 import typer
 from pathlib import Path
-import subprocess
 
 # Import our core logic modules
-from swarm.parser import create_job_scripts
-from swarm.slurm import submit_job_array
+from swarm.containers import is_image_file, stage_image
+from swarm.eventlog import EventLog
+from swarm.history import record_previous_runs, remember_submission, suggest_resources
+from swarm.modules import verify_modules_cached
+from swarm.monitor import MIN_POLL_INTERVAL, ArrayMonitor
+from swarm.parser import STDIN_SOURCE, Resources, TaskGroup, create_stages
+from swarm.profiling import PROFILER
+from swarm.report import report_job_array
+from swarm.slurm import (
+    BACKENDS,
+    DEFAULT_MAX_IN_FLIGHT,
+    get_max_array_size,
+    resume_job_array,
+    speculate_job_array,
+    stage_dependencies,
+    submit_job_array,
+)
+from swarm.speculation import DEFAULT_THRESHOLD
+from swarm.staging import NodeStaging
+from swarm.sweep import create_sweep
+from swarm.state import dry_run_dir
+from swarm.taskcache import TaskCache, record_finished_tasks
+from swarm.tasklogs import STREAMS, read_task_logs
 
 # Initialize Typer (handles terminal commands and help menus)
 app = typer.Typer(help="Swarm: A modern Slurm job array generator.")
 
-def setup_logging(debug_mode: bool):
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+def setup_logging(debug_mode: bool, log_level: str = "INFO") -> EventLog:
     """
     Configures the 'Black Box Flight Recorder' (Logging).
-    Tracks detailed, technical data behind the scenes safely to a file.
-    """
-    # 1. ALWAYS save detailed debug logs to a file called swarm.log
-    file_handler = logging.FileHandler("swarm.log")
-    file_handler.setLevel(logging.DEBUG)
-    file_format = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    file_handler.setFormatter(file_format)
-
-    handlers = [file_handler]
-
-    # 2. If the user passes the --debug flag, ALSO print technical logs to the screen
-    if debug_mode:
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        console_format = logging.Formatter("DEBUG [%(name)s]: %(message)s")
-        console_handler.setFormatter(console_format)
-        handlers.append(console_handler)
-
-    # 3. Apply these rules to the core Python logging system
-    logging.basicConfig(level=logging.DEBUG, handlers=handlers)
+    Logging calls only put records on a queue. A background thread writes them
+    as JSON lines to <array_dir>/swarm_events.jsonl (see EventLog.open_in) and,
+    with --debug, prints them to the terminal too. Call close() when done.
+    """
+    event_log = EventLog(level=getattr(logging, log_level.upper()), debug_console=debug_mode)
     logging.debug("--- Swarm execution started ---")
+    return event_log
 
 # =========================================================================
 # MODULE VERIFIER
@@ -43,38 +52,68 @@ def verify_modules(modules_str: str) -> List[str]:
     """
     Safely checks if cluster modules exist by testing a load command 
     in a background login shell. Returns a clean list of modules.
+    All modules are checked in a single login shell, and modules that
+    were verified recently are skipped thanks to an on-disk cache.
     """
     if not modules_str:
         return []
     
     modules = [m.strip() for m in modules_str.split(",") if m.strip()]
-    
-    for mod in modules:
-        logging.debug(f"Verifying module exists: {mod}")
-        # We use a login shell (-l) so the 'module' bash function is available
-        check_cmd = f"module load {mod}"
-        result = subprocess.run(
-            ["bash", "-l", "-c", check_cmd], 
-            capture_output=True, 
-            text=True
-        )
-        
-        if result.returncode != 0:
-            typer.secho(f"Error: Could not find or load module '{mod}'.", fg=typer.colors.RED)
-            typer.secho(f"Cluster responded: {result.stderr.strip()}", fg=typer.colors.YELLOW)
-            raise typer.Exit(code=1)
+    failures = verify_modules_cached(modules)
+
+    for mod, diagnostics in failures.items():
+        typer.secho(f"Error: Could not find or load module '{mod}'.", fg=typer.colors.RED)
+        typer.secho(f"Cluster responded: {diagnostics}", fg=typer.colors.YELLOW)
+
+    if failures:
+        raise typer.Exit(code=1)
             
     return modules
 
+def _is_default(ctx: typer.Context, param_name: str) -> bool:
+    """True if an option was left at its default (not typed by the user)."""
+    source = ctx.get_parameter_source(param_name)
+    return source is None or source.name == "DEFAULT"
+
+def _auto_resources(ctx: typer.Context, job_name: str, time: str, memory: str, commands_per_task: int, parallel_tasks: int):
+    """
+    Replaces the default --time/--mem with values learned from earlier runs.
+    Values the user typed on the command line are always kept.
+    """
+    # An array task runs its commands in rounds of `parallel_tasks`
+    suggested_time, suggested_mem = suggest_resources(
+        job_name,
+        serial_tasks=-(-commands_per_task // parallel_tasks),
+        parallel_tasks=min(commands_per_task, parallel_tasks)
+    )
+    if suggested_time is None and suggested_mem is None:
+        typer.secho(f"No previous runs of '{job_name}' found. Using the requested resources.", fg=typer.colors.YELLOW)
+        return time, memory
+
+    if suggested_time and _is_default(ctx, "time"):
+        time = suggested_time
+    if suggested_mem and _is_default(ctx, "memory"):
+        memory = suggested_mem
+    typer.secho(f"Auto-resources from previous runs: --time={time} --mem={memory}", fg=typer.colors.GREEN)
+    return time, memory
+
 # @app.callback means this runs immediately when the user types `swarm`
 @app.callback(invoke_without_command=True)
 def main(
-    # MANDATORY OPTION: Only the file is required (...)
-    file: str = typer.Option(..., "--file", "-f", help="Input bash file with multiple commands."),
+    ctx: typer.Context,
+
+    # MANDATORY OPTION: Only the file is required (unless running a subcommand like `swarm resume`)
+    file: str = typer.Option(None, "--file", "-f", help="Input bash file with multiple commands (.gz supported, '-' reads stdin)."),
+
+    # PARAMETER SWEEPS (instead of --file): one template, expanded per task at run time
+    template: str = typer.Option(None, "--template", help="Command template with {name} placeholders, used instead of --file."),
+    params: List[str] = typer.Option(None, "--param", help="Template parameter NAME=VALUES: 'a,b,c', '1..100[..step]', '@file.txt' or '@table.csv:column'. Repeatable."),
+    zip_params: bool = typer.Option(False, "--zip", help="Pair the --param values up (1st with 1st, ...) instead of trying every combination."),
     
     # DIRECTORY CONTROL OPTIONS
     chdir: str = typer.Option(None, "--chdir", "-D", help="Execution directory for the Slurm job. Defaults to the bash file's directory."),
     array_dir: str = typer.Option("sbatch_arrays", "--array_dir", help="Where to save the generated array scripts. Defaults to a folder inside the chdir."),
+    manifest: bool = typer.Option(False, "--manifest", help="Write all commands into one indexed manifest instead of one script per task."),
     
     # OPTIONAL SLURM OPTIONS (With sensible defaults, NO account option)
     partition: str = typer.Option("general-cpu", "--partition", "-p", help="Partition to submit the job."),
@@ -86,42 +125,106 @@ def main(
     sbatch_options: str = typer.Option("", "--sbatch_options", help="Additional sbatch options (e.g., --gres=gpu:1)."),
     job_name: str = typer.Option("swarm_array", "--job_name", "-J", help="Job name for the job array."),
     rate_limit: int = typer.Option(None, "--rate_limit", help="Job submission rate limit (max simultaneous tasks)."),
+    bundle: int = typer.Option(1, "--bundle", "-b", min=1, help="Number of commands to pack into each array task."),
+    serial: bool = typer.Option(False, "--serial", help="Run bundled commands one after another instead of up to --cpus at a time."),
+    backend: str = typer.Option("slurm", "--backend", help="Where to run the tasks: 'slurm' (sbatch) or 'local' (this machine, --rate_limit tasks at a time)."),
+    pack: int = typer.Option(0, "--pack", min=0, help="Run everything in this many allocations, each with --cpus workers pulling commands from a shared queue."),
+    force: bool = typer.Option(False, "--force", help="Run every command, even those whose '#SWARM --outputs' are up to date."),
+    auto_resources: bool = typer.Option(False, "--auto-resources", help="Pick --time and --mem from previous runs of the same --job_name (unless given explicitly)."),
+    max_array_size: int = typer.Option(None, "--max_array_size", min=2, help="Split arrays larger than this (default: MaxArraySize from 'scontrol show config')."),
+    max_in_flight: int = typer.Option(DEFAULT_MAX_IN_FLIGHT, "--max_in_flight", min=1, help="How many sbatch calls may run at once when submitting several arrays."),
+    log_segments: int = typer.Option(0, "--log-segments", min=0, help="Collect task output in this many shared, indexed log files instead of two files per task (read with `swarm logs`)."),
+    compress_logs: bool = typer.Option(False, "--compress-logs", help="Gzip each task's output inside the --log-segments files."),
+    speculative: bool = typer.Option(False, "--speculative", help="Let `swarm speculate` start a second attempt of slow tasks on other nodes; the first to succeed is kept."),
     
     # OPTIONAL CONTAINER OPTIONS (Pyxis/Enroot)
     container_image: str = typer.Option(None, "--image", help="Path or URL to the Pyxis/Enroot container image (e.g., ubuntu:latest or /path/to/image.sqsh)."),
+    stage_container_image: bool = typer.Option(False, "--stage-image", help="Import a registry --image once into a shared .sqsh cache and run from that file."),
     container_mounts: str = typer.Option(None, "--mounts", help="Comma-separated list of container mounts (e.g., /src:/dest,/src2:/dest2)."),
     
+    # OPTIONAL NODE-LOCAL STAGING (spares the shared filesystem)
+    stage_in: List[str] = typer.Option(None, "--stage-in", help="File or folder to copy once per node into node-local scratch, found in $SWARM_STAGED/<name>. Repeatable."),
+    stage_out: str = typer.Option(None, "--stage-out", help="Folder that receives what each task writes into its node-local $SWARM_OUTPUT."),
+    scratch: str = typer.Option(None, "--scratch", help="Node-local folder for --stage-in/--stage-out (default: $TMPDIR, or /tmp)."),
+
     # OPTIONAL MODULES (Cluster-specific, verified at runtime)
     modules: str = typer.Option(None, "--modules", "-m", help="Comma-separated list of modules to load (e.g., 'python,gcc/11.2')."),
     
     # OPTIONAL DEV FLAGS
     dry_run: bool = typer.Option(False, "--dry-run", help="Print the planned actions without executing them."),
-    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal."),
+    log_level: str = typer.Option("INFO", "--log-level", help="Detail of the event log written to <array_dir>/swarm_events.jsonl: DEBUG, INFO, WARNING or ERROR."),
+    profile: bool = typer.Option(False, "--profile", help="Print how long each phase (module checks, parsing, writing, submission) took.")
 ):
     """
     Parse a bash file and submit it as a Slurm job array.
     """
-    # 1. Start the logging system
-    setup_logging(debug)
+    # Subcommands (e.g. `swarm resume`) take care of everything themselves
+    if ctx.invoked_subcommand is not None:
+        return
+    if file is None and template is None:
+        ctx.fail("Missing option '--file' / '-f' (or '--template').")
+    if file is not None and template is not None:
+        ctx.fail("Use either --file or --template, not both.")
+    if params and template is None:
+        ctx.fail("--param only works together with --template.")
+    if compress_logs and not log_segments:
+        ctx.fail("--compress-logs only works together with --log-segments.")
+    if speculative and (pack or bundle > 1):
+        ctx.fail("--speculative cannot be combined with --pack or --bundle.")
+
+    if log_level.upper() not in LOG_LEVELS:
+        ctx.fail(f"Unknown --log-level '{log_level}'. Choose from: {', '.join(LOG_LEVELS)}.")
+
+    # 1. Start the logging system (and the profiler, if requested)
+    event_log = setup_logging(debug, log_level)
+    ctx.call_on_close(event_log.close)
     logger = logging.getLogger(__name__)
+    PROFILER.reset(enabled=profile)
+
+    if backend not in BACKENDS:
+        ctx.fail(f"Unknown --backend '{backend}'. Choose from: {', '.join(BACKENDS)}.")
+    if log_segments and not (_is_default(ctx, "output_log") and _is_default(ctx, "error_log")):
+        typer.secho("Warning: --log-segments replaces --output_log/--error_log; task output goes to the log segments.",
+                    fg=typer.colors.YELLOW)
     
     # 1.5. VERIFY MODULES (New: Fail fast before we do any file operations!)
     module_list = []
     if modules:
         logger.info("Verifying requested cluster modules...")
-        module_list = verify_modules(modules)
+        with PROFILER.phase("verify modules"):
+            module_list = verify_modules(modules)
         typer.secho(f"Verified {len(module_list)} module(s).", fg=typer.colors.GREEN)
 
+    # 1.6. Stage the container image once, instead of a pull on every node
+    if stage_container_image and container_image and not is_image_file(container_image):
+        try:
+            with PROFILER.phase("stage image"):
+                container_image = str(stage_image(container_image, dry_run=dry_run))
+        except RuntimeError as e:
+            typer.secho(f"Error: {e}", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+        typer.secho(f"Using staged image: {container_image}", fg=typer.colors.GREEN)
+
     # =========================================================================
     # PATH RESOLUTION LOGIC
     # =========================================================================
     
-    # 2a. Resolve the main bash file
-    bash_file = Path(file).resolve()
-    logger.debug(f"Resolved bash file path: {bash_file}")
+    # 2a. Resolve the main bash file ("-" means the commands arrive on stdin)
+    bash_file = None
+    if file is not None:
+        bash_file = STDIN_SOURCE if file == STDIN_SOURCE else Path(file).resolve()
+        logger.debug(f"Resolved bash file path: {bash_file}")
+        # Fail before anything (array_dir, event log) is created next to a file that isn't there
+        if bash_file != STDIN_SOURCE and not bash_file.is_file():
+            raise FileNotFoundError(f"Bash file not found: {bash_file}")
 
     # 2b. Resolve the working directory (chdir)
-    if chdir is None:
+    if chdir is None and bash_file in (STDIN_SOURCE, None):
+        # Commands from stdin or a template have no home directory, so use where swarm was run
+        cwd_path = Path.cwd()
+        logger.debug("No --chdir provided. Defaulting to the current directory.")
+    elif chdir is None:
         # If no chdir provided, default to the directory where the bash file lives
         cwd_path = bash_file.parent
         logger.debug("No --chdir provided. Defaulting to bash file directory.")
@@ -138,44 +241,339 @@ def main(
     array_dir_path.mkdir(parents=True, exist_ok=True)
     logger.debug(f"Resolved array scripts directory to: {array_dir_path}")
 
+    # 2d. From here on, the event log is written next to the array scripts
+    event_log.open_in(array_dir_path)
+
+    # A dry run writes its scripts into a subfolder, so the scripts of the last
+    # real submission (which `swarm resume` reruns) are never overwritten
+    scripts_dir_path = dry_run_dir(array_dir_path) if dry_run else array_dir_path
+
+    # 2e. Check the node-local staging paths (relative to the working directory)
+    staging = None
+    if stage_in or stage_out:
+        try:
+            staging = NodeStaging.create(stage_in, stage_out, cwd_path, scratch=scratch)
+        except ValueError as e:
+            typer.secho(f"Error: {e}", fg=typer.colors.RED)
+            raise typer.Exit(code=1)
+    elif scratch:
+        typer.secho("Warning: --scratch only matters together with --stage-in or --stage-out.", fg=typer.colors.YELLOW)
+
     # =========================================================================
     # CORE EXECUTION
     # =========================================================================
 
     # 3. User Interface: Tell the user what we are doing
-    typer.secho(f"Processing bash file: {bash_file}", fg=typer.colors.CYAN)
+    if template is not None:
+        typer.secho(f"Expanding template: {template}", fg=typer.colors.CYAN)
+    else:
+        typer.secho(f"Processing bash file: {bash_file}", fg=typer.colors.CYAN)
     
-    # 4. Parse the file into separate job scripts
-    logger.info("Calling parser to create individual job scripts...")
-    job_scripts = create_job_scripts(bash_file, array_dir_path, modules=module_list)
+    # 4. Parse the file into separate job scripts (or a single indexed manifest).
+    # "#SWARM stage <name>" markers split it into one array per stage, and
+    # "#SWARM --mem/-t/-c" directives into one array per resource shape.
+    if manifest:
+        logger.info("Calling parser to create an indexed task manifest...")
+    else:
+        logger.info("Calling parser to create individual job scripts...")
+    # A template is written once, with its parameter tables; nothing per task.
+    # Commands whose "#SWARM --outputs" are up to date are left out, based on
+    # the earlier runs in this array_dir (recorded in the task cache first).
+    task_cache = TaskCache(cwd_path, skip=not force)
+    if template is None:
+        with PROFILER.phase("history"):
+            record_finished_tasks(array_dir_path, task_cache)
+    try:
+        with PROFILER.phase("write tasks"):
+            if template is not None:
+                sweep = create_sweep(template, params or [], scripts_dir_path, zipped=zip_params,
+                                     modules=module_list, cwd=Path.cwd())
+                groups = [TaskGroup(None, Resources(), sweep)]
+                typer.secho(f"First task: {sweep.read_command(1)}", fg=typer.colors.CYAN)
+            else:
+                groups = create_stages(bash_file, scripts_dir_path, manifest=manifest, modules=module_list,
+                                       task_cache=task_cache)
+    except ValueError as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
     
-    if not job_scripts:
+    if task_cache.skipped:
+        typer.secho(f"Skipping {task_cache.skipped} task(s) whose outputs are up to date (--force runs them anyway).",
+                    fg=typer.colors.GREEN)
+    if not groups and task_cache.skipped:
+        typer.secho("All tasks are up to date. Nothing to submit.", fg=typer.colors.GREEN)
+        raise typer.Exit()
+    if not groups:
         logger.error("Parser returned no scripts. Exiting.")
         typer.secho("Error: No valid commands found in the bash file.", fg=typer.colors.RED)
         raise typer.Exit(code=1)
 
-    typer.secho(f"Successfully split into {len(job_scripts)} array tasks.", fg=typer.colors.GREEN)
-
-    # 5. Submit the array to Slurm
-    logger.info("Passing data to Slurm submission module...")
-    submit_job_array(
-        job_scripts=job_scripts,
-        output_log=output_log,
-        error_log=error_log,
-        job_name=job_name,
-        partition=partition,
-        # account="",          # Blank since we removed the account requirement
-        array_dir=array_dir_path,
-        sbatch_options=sbatch_options,
-        time=time,
-        cpus=cpus,
-        memory=memory,
-        cwd=cwd_path,        # Pass the calculated working directory
-        rate_limit=rate_limit,
-        container_image=container_image,
-        container_mounts=container_mounts,
-        dry_run=dry_run
-    )
+    if pack and len(groups) > 1:
+        typer.secho("Error: --pack cannot be combined with '#SWARM' stages or resource directives.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    # 5. Submit the array to Slurm (split into several arrays if it is too big)
+    # (Only Slurm has a MaxArraySize; local runs never need splitting.)
+    if max_array_size is None and backend == "slurm":
+        with PROFILER.phase("scontrol"):
+            max_array_size = get_max_array_size()
+
+    # Each stage (named <job_name>_<stage>) waits for the one before it. Within a
+    # stage, every resource shape is an array of its own (<name>_<shape>).
+    previous_stage = None  # (name, job IDs, task count of each array)
+    for stage, stage_groups in itertools.groupby(groups, key=lambda group: group.stage):
+        stage_groups = list(stage_groups)
+        stage_job_name = f"{job_name}_{stage}" if stage else job_name
+        layout = [len(group.tasks) for group in stage_groups]
+
+        # 5a. Link the stage to the one before it. Task N can only wait for
+        # task N when both stages are a single array of the same size (and
+        # no skipped tasks have shifted the numbering).
+        dependencies = None
+        if previous_stage:
+            previous_name, previous_ids, previous_layout = previous_stage
+            per_task = len(layout) == 1 and layout == previous_layout and not task_cache.skipped
+            dependencies = stage_dependencies(previous_name, previous_ids, per_task)
+
+        stage_job_ids = []
+        for group in stage_groups:
+            job_scripts = group.tasks
+            label = group.resources.label
+            group_job_name = f"{stage_job_name}_{label}" if label else stage_job_name
+            # Directives override the command line for this group only
+            group_cpus = group.resources.cpus or cpus
+
+            if stage or label:
+                typer.secho(f"{group_job_name}: {len(job_scripts)} array tasks.", fg=typer.colors.CYAN)
+            else:
+                typer.secho(f"Successfully split into {len(job_scripts)} array tasks.", fg=typer.colors.GREEN)
+            if pack:
+                typer.secho(f"Packing into {min(pack, len(job_scripts))} allocation(s) of {cpus} worker(s) each.", fg=typer.colors.GREEN)
+            elif bundle > 1:
+                bundle_count = -(-len(job_scripts) // bundle)
+                typer.secho(f"Bundling {bundle} commands per task: {bundle_count} Slurm array task(s).", fg=typer.colors.GREEN)
+
+            # 5b. With --auto-resources, save the earlier runs of this job name (from
+            # any array_dir) to the history store, then size --time/--mem from the
+            # runs stored so far (unless the user set them)
+            group_time, group_memory = time, memory
+            if auto_resources:
+                with PROFILER.phase("history"):
+                    record_previous_runs(group_job_name, array_dir_path, use_sacct=True)
+                # Each array task (or packed allocation) runs this many commands, this many at once
+                if pack:
+                    commands_per_task = -(-len(job_scripts) // min(pack, len(job_scripts)))
+                    parallel_tasks = group_cpus
+                else:
+                    commands_per_task = bundle
+                    parallel_tasks = 1 if serial else group_cpus
+                with PROFILER.phase("history"):
+                    group_time, group_memory = _auto_resources(ctx, group_job_name, time, memory, commands_per_task, parallel_tasks)
+            group_time = group.resources.time or group_time
+            group_memory = group.resources.memory or group_memory
+
+            logger.info("Passing data to Slurm submission module...")
+            with PROFILER.phase("write master scripts"):
+                job_ids = submit_job_array(
+                    job_scripts=job_scripts,
+                    output_log=output_log,
+                    error_log=error_log,
+                    job_name=group_job_name,
+                    partition=partition,
+                    # account="",          # Blank since we removed the account requirement
+                    array_dir=scripts_dir_path,
+                    sbatch_options=sbatch_options,
+                    time=group_time,
+                    cpus=group_cpus,
+                    memory=group_memory,
+                    cwd=cwd_path,        # Pass the calculated working directory
+                    rate_limit=rate_limit,
+                    container_image=container_image,
+                    container_mounts=container_mounts,
+                    bundle=bundle,
+                    serial=serial,
+                    max_array_size=max_array_size,
+                    pack=pack,
+                    backend=backend,
+                    max_in_flight=max_in_flight,
+                    dependencies=dependencies,
+                    log_segments=log_segments,
+                    compress_logs=compress_logs,
+                    staging=staging,
+                    speculative=speculative,
+                    dry_run=dry_run
+                )
+            stage_job_ids.extend(job_ids)
+            # Let later --auto-resources runs of this job name find this one, from anywhere
+            if auto_resources and job_ids:
+                remember_submission(array_dir_path, group_job_name)
+        previous_stage = (stage_job_name, stage_job_ids, layout)
+
+    if profile:
+        typer.echo(PROFILER.report())
+
+@app.command()
+def resume(
+    array_dir: str = typer.Argument(..., help="The --array_dir of the submission to resume."),
+    job_name: str = typer.Option(None, "--job_name", "-J", help="Which submission to resume. Defaults to the most recent one."),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Print the planned actions without executing them."),
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+):
+    """
+    Resubmit only the tasks that failed or never finished.
+    """
+    event_log = setup_logging(debug)
+    array_dir_path = Path(array_dir).resolve()
+    try:
+        if array_dir_path.is_dir():
+            event_log.open_in(array_dir_path)
+        resume_job_array(array_dir_path, job_name=job_name, dry_run=dry_run)
+    except FileNotFoundError as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    finally:
+        event_log.close()
+
+@app.command()
+def speculate(
+    array_dir: str = typer.Argument(..., help="The --array_dir of a submission made with --speculative."),
+    job_name: str = typer.Option(None, "--job_name", "-J", help="Which submission to check. Defaults to the most recent one."),
+    threshold: float = typer.Option(DEFAULT_THRESHOLD, "--threshold", min=1, help="Treat a task as slow once it has run this many times the median task duration."),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Print the planned actions without executing them."),
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+):
+    """
+    Start a second attempt of slow tasks on other nodes. The first attempt to succeed is kept.
+    """
+    event_log = setup_logging(debug)
+    array_dir_path = Path(array_dir).resolve()
+    try:
+        if array_dir_path.is_dir():
+            event_log.open_in(array_dir_path)
+        speculate_job_array(array_dir_path, job_name=job_name, threshold=threshold, dry_run=dry_run)
+    except (FileNotFoundError, ValueError) as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    finally:
+        event_log.close()
+
+@app.command()
+def report(
+    array_dir: str = typer.Argument(..., help="The --array_dir of the submission to summarise."),
+    job_name: str = typer.Option(None, "--job_name", "-J", help="Which submission to report on. Defaults to the most recent one."),
+    top: int = typer.Option(10, "--top", min=0, help="How many of the slowest tasks to list."),
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+):
+    """
+    Summarise task runtimes, peak memory and failures of a submission.
+    """
+    event_log = setup_logging(debug)
+    array_dir_path = Path(array_dir).resolve()
+    try:
+        if array_dir_path.is_dir():
+            event_log.open_in(array_dir_path)
+        typer.echo(report_job_array(array_dir_path, job_name=job_name, top=top))
+    except FileNotFoundError as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    finally:
+        event_log.close()
+
+def _state_totals(jobs) -> str:
+    """One line of task counts per state, over all jobs (e.g. "COMPLETED 8, RUNNING 12")."""
+    totals = {}
+    for states in jobs.values():
+        for state, count in states.items():
+            totals[state] = totals.get(state, 0) + count
+    return ", ".join(f"{state} {count}" for state, count in sorted(totals.items())) or "no tasks in sacct yet"
+
+@app.command()
+def status(
+    array_dir: str = typer.Argument(..., help="The --array_dir of the submission(s) to check."),
+    job_name: str = typer.Option(None, "--job_name", "-J", help="Which submission to check. Defaults to all of them."),
+    interval: float = typer.Option(MIN_POLL_INTERVAL, "--interval", min=1, help="Reuse a scheduler answer younger than this many seconds."),
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+):
+    """
+    Show how many array tasks are pending, running, completed or failed.
+    """
+    event_log = setup_logging(debug)
+    array_dir_path = Path(array_dir).resolve()
+    try:
+        if array_dir_path.is_dir():
+            event_log.open_in(array_dir_path)
+        monitor = ArrayMonitor(array_dir_path, [job_name] if job_name else None, min_interval=interval)
+        typer.echo(monitor.summary(monitor.poll()))
+    except (FileNotFoundError, RuntimeError) as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    finally:
+        event_log.close()
+
+@app.command()
+def wait(
+    array_dir: str = typer.Argument(..., help="The --array_dir of the submission(s) to wait for."),
+    job_name: str = typer.Option(None, "--job_name", "-J", help="Which submission to wait for. Defaults to all of them."),
+    interval: float = typer.Option(MIN_POLL_INTERVAL, "--interval", min=1, help="Seconds between scheduler queries (grows while nothing changes)."),
+    timeout: float = typer.Option(None, "--timeout", min=0, help="Give up after this many seconds (exit code 2)."),
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+):
+    """
+    Wait until every task has finished. Exits with 0 only if all of them succeeded.
+    """
+    event_log = setup_logging(debug)
+    array_dir_path = Path(array_dir).resolve()
+    try:
+        if array_dir_path.is_dir():
+            event_log.open_in(array_dir_path)
+        monitor = ArrayMonitor(array_dir_path, [job_name] if job_name else None, min_interval=interval)
+        jobs = monitor.wait(timeout=timeout, on_poll=lambda jobs: typer.echo(_state_totals(jobs)))
+    except TimeoutError as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=2)
+    except (FileNotFoundError, RuntimeError) as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    finally:
+        event_log.close()
+
+    typer.echo(monitor.summary(jobs))
+    if not monitor.succeeded():
+        raise typer.Exit(code=1)
+
+@app.command()
+def logs(
+    array_dir: str = typer.Argument(..., help="The --array_dir of a submission made with --log-segments."),
+    task_id: int = typer.Argument(..., min=1, help="The task whose output to show."),
+    job_name: str = typer.Option(None, "--job_name", "-J", help="Which submission to read. Defaults to the most recent one."),
+    stream: str = typer.Option("both", "--stream", help="Which output to show: out, err or both."),
+    debug: bool = typer.Option(False, "--debug", help="Enable detailed debug logging to the terminal.")
+):
+    """
+    Show one task's output from the shared log segments.
+    """
+    if stream not in (*STREAMS, "both"):
+        raise typer.BadParameter(f"Unknown --stream '{stream}'. Choose from: out, err, both.")
+
+    event_log = setup_logging(debug)
+    array_dir_path = Path(array_dir).resolve()
+    try:
+        if array_dir_path.is_dir():
+            event_log.open_in(array_dir_path)
+        outputs = read_task_logs(array_dir_path, task_id, job_name=job_name)
+    except (FileNotFoundError, ValueError) as e:
+        typer.secho(f"Error: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    finally:
+        event_log.close()
+
+    # stdout goes to stdout and stderr to stderr, so they can be redirected separately
+    shown = [name for name in STREAMS if stream in (name, "both") and outputs[name]]
+    if not shown:
+        typer.secho(f"No output recorded for task {task_id} (it printed nothing or has not finished yet).",
+                    fg=typer.colors.YELLOW, err=True)
+    for name in shown:
+        typer.echo(outputs[name], nl=False, err=(name == "err"))
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Every index record is a zero-padded byte offset followed by a newline.
+# Fixed-width records mean task N lives at byte (N - 1) * INDEX_RECORD_SIZE,
+# so both Python and the bash master script can jump straight to it.
+INDEX_WIDTH = 12
+INDEX_RECORD_SIZE = INDEX_WIDTH + 1
+
+COMMANDS_FILE = "commands.txt"
+INDEX_FILE = "commands.idx"
+
+
+class TaskManifest:
+    """
+    All commands of a job array stored in a single file (one command per line),
+    plus a compact offset index. Only two files are created on disk, no matter
+    how many tasks the array has.
+    """
+
+    def __init__(self, directory: Path, count: int):
+        self.directory = directory
+        self.count = count
+
+    @property
+    def commands_path(self) -> Path:
+        return self.directory / COMMANDS_FILE
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    @classmethod
+    def open(cls, directory: Path) -> "TaskManifest":
+        """Re-open a manifest that was written earlier (e.g. for a resume)."""
+        index_size = (directory / INDEX_FILE).stat().st_size
+        return cls(directory, index_size // INDEX_RECORD_SIZE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def read_command(self, task_id: int) -> str:
+        """Return the command for a 1-based task ID using two seeks."""
+        if not 1 <= task_id <= self.count:
+            raise IndexError(f"Task {task_id} is outside the manifest (1-{self.count}).")
+
+        with open(self.index_path, "rb") as index:
+            index.seek((task_id - 1) * INDEX_RECORD_SIZE)
+            offset = int(index.read(INDEX_WIDTH))
+
+        with open(self.commands_path, "rb") as commands:
+            commands.seek(offset)
+            return commands.readline().decode().rstrip("\n")
+
+    def shell_read_line(self, position_expr: str) -> str:
+        """Bash pipeline that prints line N (1-based, an arithmetic expression) using the same two seeks."""
+        return (
+            f'tail -c +$(( 10#$(tail -c +$(( ({position_expr} - 1) * {INDEX_RECORD_SIZE} + 1 )) '
+            f'"{self.index_path.resolve()}" | head -c {INDEX_WIDTH}) + 1 )) '
+            f'"{self.commands_path.resolve()}" | head -n 1'
+        )
+
+    def shell_command(self, task_id_var: str, runner: str = "bash") -> str:
+        """
+        Bash snippet that runs one task. `tail -c +N` seeks on regular files,
+        so looking up task N costs the same for task 1 as for task 1,000,000.
+        """
+        return (
+            f'OFFSET=$(tail -c +$(( ({task_id_var} - 1) * {INDEX_RECORD_SIZE} + 1 )) '
+            f'"{self.index_path.resolve()}" | head -c {INDEX_WIDTH})\n'
+            f'{runner} -c "$(tail -c +$(( 10#$OFFSET + 1 )) '
+            f'"{self.commands_path.resolve()}" | head -n 1)"'
+        )
+
+
+class ManifestWriter:
+    """Appends commands to a manifest, recording each command's byte offset."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.count = 0
+        self._offset = 0
+        self._commands = open(directory / COMMANDS_FILE, "wb")
+        self._index = open(directory / INDEX_FILE, "wb")
+
+    def write(self, command: str) -> None:
+        data = f"{command}\n".encode()
+        self._index.write(f"{self._offset:0{INDEX_WIDTH}d}\n".encode())
+        self._commands.write(data)
+        self._offset += len(data)
+        self.count += 1
+
+    def close(self) -> TaskManifest:
+        self._commands.close()
+        self._index.close()
+        logger.debug(f"Wrote manifest with {self.count} commands to {self.directory}")
+        return TaskManifest(self.directory, self.count)
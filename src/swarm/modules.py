@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from swarm.cache import cache_dir, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+# Successfully verified modules are trusted for this long (in seconds)
+MODULE_CACHE_TTL = 24 * 60 * 60
+
+# Printed before each module's diagnostics so we can split the output back up
+MARKER = "@@SWARM_MODULE@@"
+
+# Every module is loaded in its own subshell so they can't affect each other.
+# The modules are passed as arguments ($@), never pasted into the script.
+CHECK_SCRIPT = f"""
+for mod in "$@"; do
+    out=$( (module load "$mod") 2>&1 )
+    rc=$?
+    printf '%s\\t%s\\t%s\\n' '{MARKER}' "$mod" "$rc"
+    printf '%s\\n' "$out"
+done
+"""
+
+def _cache_file() -> Path:
+    return cache_dir() / "modules.json"
+
+def module_path_fingerprint() -> str:
+    """
+    Fingerprint of $MODULEPATH and the modification times of its directories.
+    It changes whenever modules are added to or removed from the cluster.
+    """
+    parts = [os.environ.get("MODULEPATH", "")]
+    for directory in parts[0].split(":"):
+        try:
+            parts.append(f"{directory}={os.stat(directory).st_mtime_ns}")
+        except OSError:
+            parts.append(f"{directory}=missing")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+def check_modules(modules: List[str]) -> Dict[str, Tuple[bool, str]]:
+    """
+    Tries `module load` for every module in ONE login shell (starting a
+    login shell is the slow part). Returns {module: (loaded_ok, diagnostics)}.
+    """
+    logger.debug(f"Verifying {len(modules)} module(s) in one login shell: {modules}")
+    # We use a login shell (-l) so the 'module' bash function is available
+    result = subprocess.run(
+        ["bash", "-l", "-c", CHECK_SCRIPT, "bash", *modules],
+        capture_output=True,
+        text=True
+    )
+
+    results: Dict[str, Tuple[bool, str]] = {}
+    current_module = None
+    diagnostics: List[str] = []
+    # Anything printed before the first marker (e.g. login banners) is ignored
+    for line in result.stdout.splitlines() + [f"{MARKER}\t\t"]:
+        if line.startswith(f"{MARKER}\t"):
+            if current_module is not None:
+                results[current_module] = (return_code == "0", "\n".join(diagnostics).strip())
+            _, current_module, return_code = line.split("\t", 2)
+            diagnostics = []
+        elif current_module is not None:
+            diagnostics.append(line)
+
+    # A module with no marker means the shell itself failed before reaching it
+    for mod in modules:
+        if mod not in results:
+            results[mod] = (False, result.stderr.strip() or "Module check did not run.")
+    return results
+
+def verify_modules_cached(modules: List[str], ttl: int = MODULE_CACHE_TTL) -> Dict[str, str]:
+    """
+    Checks the modules, skipping any that were verified within `ttl` seconds
+    on the same module path. Returns {module: diagnostics} for the failures.
+    """
+    fingerprint = module_path_fingerprint()
+    now = time.time()
+    cache = load_json(_cache_file(), default={})
+
+    to_check = [
+        mod for mod in modules
+        if now - cache.get(f"{fingerprint}:{mod}", 0) > ttl
+    ]
+    logger.debug(f"{len(modules) - len(to_check)} module(s) found in the verification cache.")
+    if not to_check:
+        return {}
+
+    failures = {}
+    for mod, (loaded_ok, diagnostics) in check_modules(to_check).items():
+        if loaded_ok:
+            cache[f"{fingerprint}:{mod}"] = now
+        else:
+            failures[mod] = diagnostics
+
+    # Drop expired entries so the cache doesn't grow forever
+    cache = {key: stamp for key, stamp in cache.items() if now - stamp <= ttl}
+    save_json(_cache_file(), cache)
+    return failures
@@ -0,0 +1,185 @@
+import logging
+import subprocess
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from swarm.cache import load_json, save_json
+from swarm.local import parse_array_spec
+from swarm.state import find_job_names, incomplete_tasks, load_state, read_task_status
+
+logger = logging.getLogger(__name__)
+
+# One cache of scheduler answers per array_dir, shared by `swarm status` and `swarm wait`
+STATUS_CACHE_FILE = "swarm_status.json"
+
+# Slurm states in which a task may still change. Everything else is final.
+ACTIVE_STATES = {
+    "PENDING", "RUNNING", "REQUEUED", "REQUEUE_FED", "REQUEUE_HOLD", "RESIZING",
+    "SUSPENDED", "CONFIGURING", "COMPLETING", "SIGNALING", "STAGE_OUT", "STOPPED",
+}
+
+# Never ask sacct more often than this; while nothing changes, `swarm wait`
+# polls less and less often, up to MAX_POLL_INTERVAL
+MIN_POLL_INTERVAL = 30.0
+MAX_POLL_INTERVAL = 300.0
+POLL_BACKOFF = 1.5
+
+# Takes the sacct arguments and returns its output. Tests pass a fake one.
+SacctRunner = Callable[[List[str]], str]
+
+def run_sacct(arguments: List[str]) -> str:
+    """Runs sacct and returns its output."""
+    try:
+        result = subprocess.run(["sacct", *arguments], capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("sacct was not found. Is this a Slurm cluster?")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"sacct failed: {(e.stderr or '').strip()}")
+    return result.stdout
+
+def parse_sacct(output: str) -> Dict[str, Dict[str, int]]:
+    """
+    Counts array tasks per state for every job in `sacct --parsable2` output.
+    Pending tasks are often listed as one line ("123_[5-100%10]"), which
+    counts as every task in the range.
+    """
+    counts: Dict[str, Counter] = {}
+    for line in output.splitlines():
+        fields = line.split("|")
+        if len(fields) < 2 or not fields[0]:
+            continue
+        job_id, _, task_spec = fields[0].partition("_")
+        # "CANCELLED by 1234" is just CANCELLED
+        state = fields[1].split()[0] if fields[1].strip() else "UNKNOWN"
+        tasks = 1
+        if task_spec.startswith("["):
+            tasks = len(parse_array_spec(task_spec.strip("[]"))[0])
+        counts.setdefault(job_id, Counter())[state] += tasks
+    return {job_id: dict(states) for job_id, states in counts.items()}
+
+def is_finished(states: Optional[Dict[str, int]]) -> bool:
+    """True once sacct knows the job and none of its tasks can change any more."""
+    return bool(states) and not ACTIVE_STATES.intersection(states)
+
+class ArrayMonitor:
+    """
+    Follows the Slurm jobs of the submissions in an array_dir. All of them
+    are looked up with a single sacct call, and the answer is cached in the
+    array_dir: a poll within `min_interval` of the last query about each of
+    its jobs (by any swarm process) reuses it, and jobs that have finished
+    are never queried again.
+    """
+
+    def __init__(
+        self,
+        array_dir: Path,
+        job_names: List[str] = None,
+        runner: SacctRunner = run_sacct,
+        clock: Callable[[], float] = time.time,
+        min_interval: float = MIN_POLL_INTERVAL
+    ):
+        self.array_dir = array_dir
+        self.runner = runner
+        self.clock = clock
+        self.min_interval = min_interval
+        self.states = [load_state(array_dir, name) for name in (job_names or find_job_names(array_dir))]
+        if not self.states:
+            raise FileNotFoundError(f"No Swarm submissions found in {array_dir}")
+
+    @property
+    def cache_path(self) -> Path:
+        return self.array_dir / STATUS_CACHE_FILE
+
+    def slurm_job_ids(self) -> List[str]:
+        """Job IDs to ask Slurm about (local runs had finished before submission returned)."""
+        return [job_id for state in self.states if state.get("backend", "slurm") == "slurm"
+                for job_id in state["job_ids"]]
+
+    def poll(self) -> Dict[str, Dict[str, int]]:
+        """Returns {job_id: {state: task count}}, querying sacct only if the cache is stale."""
+        cache = load_json(self.cache_path, {"queried": {}, "jobs": {}})
+        jobs, queried = cache["jobs"], cache["queried"]
+        active = [job_id for job_id in self.slurm_job_ids() if not is_finished(jobs.get(job_id))]
+        if not active:
+            return jobs
+
+        # Every job must have been asked about recently: another `swarm status -J`
+        # or a `swarm resume` may have left jobs in the cache that were never queried
+        now = self.clock()
+        age = max(now - queried.get(job_id, float("-inf")) for job_id in active)
+        if age < self.min_interval:
+            logger.debug(f"Using the cached job states ({age:.0f}s old).")
+            return jobs
+
+        output = self.runner(["--jobs", ",".join(active), "--allocations", "--noheader",
+                              "--parsable2", "--format=JobID,State"])
+        jobs.update(parse_sacct(output))
+        queried.update({job_id: now for job_id in active})
+        logger.debug(f"sacct reported on {len(active)} job(s).")
+        save_json(self.cache_path, {"queried": queried, "jobs": jobs})
+        return jobs
+
+    def finished(self, jobs: Dict[str, Dict[str, int]]) -> bool:
+        return all(is_finished(jobs.get(job_id)) for job_id in self.slurm_job_ids())
+
+    def succeeded(self) -> bool:
+        """
+        True if every command's latest attempt reported exit code 0. The tasks
+        file decides, not sacct: after a resume the original job still shows
+        the FAILED tasks that were rerun since, and losing attempts of a
+        --speculative array show as CANCELLED. A task that never reported
+        (e.g. killed for running out of time) counts as failed.
+        """
+        for state in self.states:
+            status = read_task_status(Path(state["tasks_file"]))
+            if incomplete_tasks(state["job_count"], status):
+                return False
+        return True
+
+    def wait(
+        self,
+        timeout: float = None,
+        on_poll: Callable[[Dict[str, Dict[str, int]]], None] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        max_interval: float = MAX_POLL_INTERVAL
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Polls until every job has finished (or `timeout` seconds have passed).
+        The interval grows while nothing changes and drops back to
+        min_interval when something does.
+        """
+        start = self.clock()
+        interval = self.min_interval
+        previous = None
+        while True:
+            jobs = self.poll()
+            if on_poll:
+                on_poll(jobs)
+            if self.finished(jobs):
+                return jobs
+            if timeout is not None and self.clock() - start >= timeout:
+                raise TimeoutError(f"Jobs still running after {timeout:.0f}s.")
+
+            interval = self.min_interval if jobs != previous else min(interval * POLL_BACKOFF, max_interval)
+            previous = jobs
+            sleep(interval)
+
+    def summary(self, jobs: Dict[str, Dict[str, int]]) -> str:
+        """Per-state counts of every submission's array tasks, plus its commands' exit codes."""
+        lines = []
+        for state in self.states:
+            status = read_task_status(Path(state["tasks_file"]))
+            failed = sum(1 for code in status.values() if code != 0)
+            lines.append(f"{state['job_name']} ({state['job_count']} commands): "
+                         f"{len(status) - failed} succeeded, {failed} failed, "
+                         f"{state['job_count'] - len(status)} not reported")
+            if state.get("backend", "slurm") != "slurm":
+                continue
+            for job_id in state["job_ids"]:
+                states = jobs.get(job_id)
+                counts = ", ".join(f"{name} {count}" for name, count in sorted(states.items())) if states \
+                    else "not in sacct yet"
+                lines.append(f"  job {job_id}: {counts}")
+        return "\n".join(lines)
@@ -1,50 +1,355 @@
+import contextlib
+import gzip
+import itertools
 import logging
+import re
+import sys
+from collections.abc import Sequence
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple, Union
+
+from swarm.manifest import ManifestWriter, TaskManifest
+from swarm.profiling import PROFILER
+from swarm.taskcache import TASK_KEYS_FILE, TaskCache
 
 # Best Practice: Name the logger after the current module (swarm.parser)
 logger = logging.getLogger(__name__)
 
-def create_job_scripts(bash_file: Path, array_dir: Path, modules: List[str] = None) -> List[Path]: # <--- UPDATED
-    logger.debug(f"Starting parsing for file: {bash_file.resolve()}")
-    
-    # NEW: Format the module prefix if any modules are requested
-    module_prefix = ""
-    if modules:
-        module_prefix = f"module load {' '.join(modules)} && "
-        logger.debug(f"Module prefix to be added to each job: {module_prefix}")
-    
-    
-    job_scripts: List[Path] = []
-    current_command: List[str] = []
-    inside_command = False
+# Passing "-" as the bash file reads the commands from stdin instead
+STDIN_SOURCE = "-"
+
+# Comments starting with "#SWARM" are instructions for Swarm, not for bash
+DIRECTIVE_PREFIX = "#SWARM"
+STAGE_NAME = re.compile(r"[A-Za-z0-9_.-]+")
+
+# Maps every task back to the line of the command file it came from
+LINE_MAP_FILE = "lines.txt"
+
+# Per-command resource directives, e.g. "#SWARM --mem 64G -t 2:00:00 -c 8"
+RESOURCE_OPTIONS = {
+    "-c": "cpus", "--cpus": "cpus", "--cpus-per-task": "cpus",
+    "--mem": "memory",
+    "-t": "time", "--time": "time",
+}
+
+# Files a command reads and writes, e.g. "#SWARM --inputs a.fq --outputs a.bam,a.bai".
+# Commands that declare outputs can be skipped when those are up to date (see TaskCache).
+FILE_OPTIONS = {"--inputs": "inputs", "--outputs": "outputs"}
 
-    lines = bash_file.read_text().splitlines()
-    logger.debug(f"Read {len(lines)} lines from bash file.")
+class Resources(NamedTuple):
+    """Resources requested by "#SWARM" directives. None means "use the command line value"."""
+    cpus: Optional[int] = None
+    memory: Optional[str] = None
+    time: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        """A short name for this resource shape, e.g. "memory64G_time2-00-00"."""
+        parts = [f"{field}{value}" for field, value in self._asdict().items() if value is not None]
+        return re.sub(r"[^A-Za-z0-9._-]+", "-", "_".join(parts))
+
+class Command(NamedTuple):
+    """One parsed command, plus where it came from."""
+    text: str
+    line: int                    # line number where the command starts
+    stage: Optional[str] = None  # set by a "#SWARM stage <name>" marker
+    resources: Resources = Resources()  # set by "#SWARM --mem ..." just above it
+    inputs: Tuple[str, ...] = ()        # set by "#SWARM --inputs ..." just above it
+    outputs: Tuple[str, ...] = ()       # set by "#SWARM --outputs ..." just above it
+
+# =========================================================================
+# INPUT: read commands one line at a time (constant memory)
+# =========================================================================
+def open_command_source(source: Union[Path, str]) -> TextIO:
+    """
+    Opens the command file for streaming. Supports plain files, gzip files
+    (by their .gz suffix) and stdin ("-"). Use it as a context manager.
+    """
+    if str(source) == STDIN_SOURCE:
+        # Never close the real stdin when the `with` block ends
+        return contextlib.nullcontext(sys.stdin)
+
+    source = Path(source)
+    if source.suffix == ".gz":
+        return gzip.open(source, "rt")
+    return open(source)
+
+def parse_annotated_commands(lines: Iterable[str]) -> Iterator[Command]:
+    """
+    Yields one full Command at a time. Blank lines and comments are skipped,
+    and lines ending in a backslash are joined with the next line.
+    "#SWARM stage" applies to every command that follows it, resource and
+    file directives only to the next command.
+    Only the lines of the current command are ever held in memory.
+    """
+    current_command: List[str] = []
+    first_line = 0
+    # Directives collect here until the command they belong to is complete
+    pending = Command("", 0)
+    line_count = 0
 
-    for line_num, line in enumerate(lines, start=1):
+    for line_count, line in enumerate(lines, start=1):
         stripped_line = line.strip()
 
+        if stripped_line.startswith(DIRECTIVE_PREFIX) and not current_command:
+            pending = _parse_directive(stripped_line, line_count, pending)
+            continue
+
         if not stripped_line or stripped_line.startswith('#'):
             continue
 
+        if not current_command:
+            first_line = line_count
+
         if stripped_line.endswith('\\'):
             current_command.append(stripped_line[:-1].strip())
-            inside_command = True
         else:
             current_command.append(stripped_line)
-            inside_command = False
-            
+
             full_command = ' '.join(current_command).strip()
             current_command = []
 
             if full_command:
-                job_script = array_dir / f"job_{len(job_scripts) + 1}.sh"
-                final_content = f"{module_prefix}{full_command}\n"
-                job_script.write_text(final_content)
-                job_scripts.append(job_script)
-                # Log the exact command being written
-                logger.debug(f"Created {job_script.name} with command: {full_command}")
+                yield pending._replace(text=full_command, line=first_line)
+                pending = Command("", 0, pending.stage)
+
+    logger.debug(f"Read {line_count} lines from bash file.")
+
+def _parse_directive(directive: str, line_number: int, pending: Command) -> Command:
+    """Applies one "#SWARM ..." line to the pending command (its stage, resources and files)."""
+    words = directive[len(DIRECTIVE_PREFIX):].split()
+    if words[:1] == ["stage"]:
+        if len(words) != 2 or not STAGE_NAME.fullmatch(words[1]):
+            raise ValueError(f"Line {line_number}: expected '#SWARM stage <name>' "
+                             f"(letters, digits, '_', '.', '-'), got '{directive}'.")
+        return pending._replace(stage=words[1])
+
+    if not words or not words[0].startswith("-"):
+        logger.warning(f"Line {line_number}: ignoring unknown directive '{directive}'.")
+        return pending
+
+    # Options, as "--mem 64G" or "--mem=64G" (file lists are comma-separated)
+    words = iter(words)
+    for word in words:
+        option, _, value = word.partition("=")
+        if option not in RESOURCE_OPTIONS and option not in FILE_OPTIONS:
+            raise ValueError(f"Line {line_number}: unknown option '{option}' in '{directive}'. "
+                             f"Supported: {', '.join([*RESOURCE_OPTIONS, *FILE_OPTIONS])}.")
+        value = value or next(words, "")
+        if option in FILE_OPTIONS:
+            files = tuple(name for name in value.split(",") if name)
+            if not files:
+                raise ValueError(f"Line {line_number}: missing file list for '{option}' in '{directive}'.")
+            field = FILE_OPTIONS[option]
+            pending = pending._replace(**{field: getattr(pending, field) + files})
+            continue
+        field = RESOURCE_OPTIONS[option]
+        if not value or (field == "cpus" and not value.isdigit()):
+            raise ValueError(f"Line {line_number}: missing or invalid value for '{option}' in '{directive}'.")
+        pending = pending._replace(resources=pending.resources._replace(**{field: int(value) if field == "cpus" else value}))
+    return pending
+
+def parse_commands(lines: Iterable[str]) -> Iterator[str]:
+    """Like parse_annotated_commands, but yields just the command text."""
+    for command in parse_annotated_commands(lines):
+        yield command.text
+
+def iter_commands(source: Union[Path, str]) -> Iterator[str]:
+    """Streams the parsed commands of a file, gzip file or stdin."""
+    with open_command_source(source) as handle:
+        yield from parse_commands(handle)
+
+# =========================================================================
+# OUTPUT: writers that consume the command stream as it is produced
+# =========================================================================
+class JobScripts(Sequence):
+    """
+    The job_1.sh ... job_N.sh scripts inside array_dir. Behaves like a list of
+    paths, but only stores the directory and the count, not N Path objects.
+    """
+
+    def __init__(self, directory: Path, count: int):
+        self.directory = directory
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("job script index out of range")
+        return self.directory / f"job_{index + 1}.sh"
+
+    def shell_command(self, task_id_var: str, runner: str = "bash") -> str:
+        return f"{runner} {self.directory.resolve()}/job_{task_id_var}.sh"
+
+class JobScriptWriter:
+    """Writes every command into its own job_N.sh script."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.count = 0
+        # Decided once: building a log message per command is costly on huge files
+        self._log_commands = logger.isEnabledFor(logging.DEBUG)
+
+    def write(self, command: str) -> None:
+        self.count += 1
+        job_script = self.directory / f"job_{self.count}.sh"
+        job_script.write_text(f"{command}\n")
+        # Log the exact command being written
+        if self._log_commands:
+            logger.debug(f"Created {job_script.name} with command: {command}")
+
+    def close(self) -> JobScripts:
+        return JobScripts(self.directory, self.count)
+
+def _module_prefix(modules: List[str] = None) -> str:
+    """Formats the module prefix if any modules are requested."""
+    if not modules:
+        return ""
+    module_prefix = f"module load {' '.join(modules)} && "
+    logger.debug(f"Module prefix to be added to each job: {module_prefix}")
+    return module_prefix
+
+def write_tasks(commands: Iterable[str], writer, modules: List[str] = None):
+    """
+    Feeds a stream of commands into a writer (JobScriptWriter or ManifestWriter)
+    and returns whatever the writer produces when it is closed.
+    """
+    module_prefix = _module_prefix(modules)
+
+    try:
+        for command in commands:
+            writer.write(f"{module_prefix}{command}")
+    finally:
+        result = writer.close()
+    return result
+
+class TaskGroup(NamedTuple):
+    """The tasks of one stage that share a resource shape: they become one array."""
+    stage: Optional[str]
+    resources: Resources
+    tasks: Union[JobScripts, TaskManifest]
+
+def write_resource_groups(
+    commands: Iterable[Command],
+    directory: Path,
+    make_writer,
+    modules: List[str] = None,
+    task_cache: TaskCache = None
+):
+    """
+    Sorts a stream of commands by resource shape, writing each shape's tasks
+    into its own folder (commands without directives go straight into
+    `directory`). Each folder also gets a lines.txt, whose line N is the
+    source line number of task N. With a task cache, commands whose declared
+    outputs are up to date are left out, and the cache key of every task
+    with outputs goes into the folder's keys.txt.
+    Returns [(resources, tasks)] in file order.
+    """
+    module_prefix = _module_prefix(modules)
+    writers = {}
+
+    try:
+        for command in commands:
+            text = f"{module_prefix}{command.text}"
+            key = None
+            if task_cache is not None:
+                key = task_cache.key(text, command.inputs, command.outputs)
+                if task_cache.is_up_to_date(key, command.inputs, command.outputs):
+                    continue
+
+            if command.resources not in writers:
+                group_dir = directory
+                if command.resources != Resources():
+                    group_dir = directory / f"resources_{command.resources.label}"
+                    group_dir.mkdir(parents=True, exist_ok=True)
+                key_map = None
+                if task_cache is not None:
+                    key_map = open(group_dir / TASK_KEYS_FILE, "w")
+                else:
+                    # Never leave the keys of an earlier run next to these tasks
+                    (group_dir / TASK_KEYS_FILE).unlink(missing_ok=True)
+                writers[command.resources] = (make_writer(group_dir), open(group_dir / LINE_MAP_FILE, "w"), key_map)
+            writer, line_map, key_map = writers[command.resources]
+            writer.write(text)
+            line_map.write(f"{command.line}\n")
+            if key:
+                key_map.write(f"{writer.count}\t{key}\n")
+    finally:
+        groups = []
+        for resources, (writer, line_map, key_map) in writers.items():
+            line_map.close()
+            if key_map:
+                key_map.close()
+            groups.append((resources, writer.close()))
+    return groups
+
+# =========================================================================
+# ENTRY POINTS
+# =========================================================================
+def create_job_scripts(bash_file: Union[Path, str], array_dir: Path, modules: List[str] = None) -> JobScripts:
+    logger.debug(f"Starting parsing for file: {bash_file}")
+
+    # Open the input first so a missing file fails before anything is written
+    with open_command_source(bash_file) as handle:
+        job_scripts = write_tasks(PROFILER.timed_iter("parse", parse_commands(handle)), JobScriptWriter(array_dir), modules)
 
     logger.info(f"Successfully generated {len(job_scripts)} job scripts in {array_dir}")
-    return job_scripts
\ No newline at end of file
+    return job_scripts
+
+def create_task_manifest(bash_file: Union[Path, str], array_dir: Path, modules: List[str] = None) -> TaskManifest:
+    """
+    Same parsing rules as create_job_scripts, but every command goes into a
+    single indexed manifest instead of its own job_N.sh file.
+    """
+    logger.debug(f"Starting parsing for file: {bash_file}")
+
+    with open_command_source(bash_file) as handle:
+        manifest = write_tasks(PROFILER.timed_iter("parse", parse_commands(handle)), ManifestWriter(array_dir), modules)
+
+    logger.info(f"Successfully generated a manifest of {len(manifest)} tasks in {array_dir}")
+    return manifest
+
+def create_stages(
+    bash_file: Union[Path, str],
+    array_dir: Path,
+    manifest: bool = False,
+    modules: List[str] = None,
+    task_cache: TaskCache = None
+) -> List[TaskGroup]:
+    """
+    Splits a command file at its "#SWARM stage <name>" markers and writes each
+    stage's tasks into array_dir/stage_<name>. Within a stage, commands with
+    "#SWARM --mem/-t/-c" directives are grouped by resource shape, so every
+    TaskGroup can be submitted as an array of its own. A plain file is a
+    single group, written straight into array_dir like create_job_scripts.
+    With a task cache, up-to-date commands are skipped (see TaskCache).
+    """
+    logger.debug(f"Starting parsing for file: {bash_file}")
+    make_writer = ManifestWriter if manifest else JobScriptWriter
+    groups: List[TaskGroup] = []
+    seen_stages = []
+
+    with open_command_source(bash_file) as handle:
+        # Consecutive commands with the same stage are written together, one stage at a time
+        for stage, commands in itertools.groupby(PROFILER.timed_iter("parse", parse_annotated_commands(handle)), key=lambda c: c.stage):
+            if seen_stages and seen_stages[0] is None:
+                raise ValueError("Commands found before the first '#SWARM stage' marker.")
+            if stage in seen_stages:
+                raise ValueError(f"Stage '{stage}' appears more than once. Keep each stage's commands together.")
+            seen_stages.append(stage)
+
+            stage_dir = array_dir
+            if stage is not None:
+                stage_dir = array_dir / f"stage_{stage}"
+                stage_dir.mkdir(parents=True, exist_ok=True)
+            for resources, tasks in write_resource_groups(commands, stage_dir, make_writer, modules, task_cache):
+                groups.append(TaskGroup(stage, resources, tasks))
+                logger.info(f"Wrote {len(tasks)} task(s) into {tasks.directory}")
+
+    return groups
@@ -0,0 +1,83 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+class Profiler:
+    """
+    Adds up wall time per phase for --profile. Time spent in a nested phase
+    is subtracted from its parent, so every second is counted exactly once.
+    Does nothing (and costs nothing) unless enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.totals: Dict[str, float] = {}
+        # Time spent in nested phases, one entry per open phase
+        self._children: List[float] = []
+
+    def reset(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.totals = {}
+        self._children = []
+
+    def _add(self, name: str, seconds: float) -> None:
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._add(name, elapsed - self._children.pop())
+            if self._children:
+                self._children[-1] += elapsed
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterable:
+        """
+        Counts the time spent producing each item as phase `name`, e.g. the
+        parsing that happens lazily while the items are being written out.
+        """
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        iterator = iter(iterable)
+        total = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    total += time.perf_counter() - start
+                yield item
+        finally:
+            self._add(name, total)
+            if self._children:
+                self._children[-1] += total
+
+    def report(self) -> str:
+        """A table of the phases, slowest first, which is also logged as structured events."""
+        overall = sum(self.totals.values()) or 1.0
+        lines = ["Profile (wall time per phase):"]
+        for name, seconds in sorted(self.totals.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"  {name:<22}{seconds:>10.3f}s{100 * seconds / overall:>7.1f}%")
+            logger.info(f"Phase '{name}' took {seconds:.3f}s",
+                        extra={"event": {"phase": name, "seconds": round(seconds, 6)}})
+        lines.append(f"  {'total':<22}{sum(self.totals.values()):>10.3f}s")
+        return "\n".join(lines)
+
+# One profiler for the whole run, switched on by --profile
+PROFILER = Profiler()
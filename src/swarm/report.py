@@ -0,0 +1,81 @@
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from swarm.state import TaskRecord, load_state, read_task_records
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 95, 99)
+HISTOGRAM_WIDTH = 40
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a non-empty list (pct between 0 and 100)."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def format_duration(seconds: float) -> str:
+    """Formats seconds the way Slurm's --time does: [D-]HH:MM:SS."""
+    seconds = int(round(seconds))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    clock = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{days}-{clock}" if days else clock
+
+def format_memory(kilobytes: float) -> str:
+    """Formats kilobytes the way Slurm's --mem does (e.g. 512M, 1.5G)."""
+    if kilobytes >= 1024 * 1024:
+        return f"{kilobytes / (1024 * 1024):.1f}G"
+    return f"{max(kilobytes / 1024, 1):.0f}M"
+
+def _percentile_row(label: str, values: List[float], formatter) -> str:
+    cells = [formatter(percentile(values, pct)) for pct in PERCENTILES] + [formatter(max(values))]
+    return f"  {label:<12}" + "".join(f"{cell:>12}" for cell in cells)
+
+def build_report(job_count: int, records: Dict[int, TaskRecord], job_name: str, top: int = 10) -> str:
+    """Turns the task records of one submission into a human-readable summary."""
+    succeeded = [r for r in records.values() if r.exit_code == 0]
+    failed = [r for r in records.values() if r.exit_code != 0]
+    lines = [
+        f"Swarm report for '{job_name}' ({job_count} tasks)",
+        f"  Succeeded: {len(succeeded)}   Failed: {len(failed)}   "
+        f"Not reported (running, pending or killed): {job_count - len(records)}",
+    ]
+
+    # Percentiles are computed over successful tasks: they are what --time/--mem must fit
+    durations = [r.duration for r in succeeded if r.duration is not None]
+    peak_rss = [r.peak_rss_kb for r in succeeded if r.peak_rss_kb is not None]
+    if durations or peak_rss:
+        lines += ["", "  Successful tasks" + "".join(f"{'p' + str(p):>12}" for p in PERCENTILES) + f"{'max':>12}"]
+        if durations:
+            lines.append(_percentile_row("runtime", durations, format_duration))
+        if peak_rss:
+            lines.append(_percentile_row("peak memory", peak_rss, format_memory))
+
+    timed = sorted((r for r in records.values() if r.duration is not None), key=lambda r: r.duration, reverse=True)
+    if timed:
+        lines += ["", f"Slowest {min(top, len(timed))} task(s):", f"  {'task':>8}  {'runtime':>10}  {'exit':>4}  host"]
+        for record in timed[:top]:
+            lines.append(f"  {record.task_id:>8}  {format_duration(record.duration):>10}  {record.exit_code:>4}  {record.host or '-'}")
+
+    if failed:
+        histogram = Counter(r.exit_code for r in failed)
+        most = max(histogram.values())
+        lines += ["", "Failures by exit code:"]
+        for exit_code, count in histogram.most_common():
+            bar = "#" * max(1, round(HISTOGRAM_WIDTH * count / most))
+            lines.append(f"  {exit_code:>4}  {bar} {count}")
+
+    return "\n".join(lines)
+
+def report_job_array(array_dir: Path, job_name: Optional[str] = None, top: int = 10) -> str:
+    """Loads a submission's state and task records from array_dir and summarises them."""
+    state = load_state(array_dir, job_name)
+    records = read_task_records(Path(state["tasks_file"]))
+    logger.debug(f"Loaded {len(records)} task record(s) for '{state['job_name']}'")
+    return build_report(state["job_count"], records, state["job_name"], top=top)
@@ -1,13 +1,461 @@
 import logging
+import math
+import os
+import random
+import re
 import subprocess
+import textwrap
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from swarm.local import run_local_array
+from swarm.manifest import TaskManifest
+from swarm.profiling import PROFILER
+from swarm.state import (
+    done_path,
+    incomplete_tasks,
+    keys_path,
+    load_state,
+    pack_counter_path,
+    pack_queue_path,
+    read_task_status,
+    save_state,
+    logs_path,
+    started_path,
+    tasks_path,
+)
+from swarm.speculation import DEFAULT_THRESHOLD, Speculation
+from swarm.staging import NodeStaging
+from swarm.taskcache import TASK_KEYS_FILE
+from swarm.tasklogs import SLURM_LOG, LogStore
 
 # Set up our logger for debugging
 logger = logging.getLogger(__name__)
 
+# Slurm's own default when MaxArraySize is not set in slurm.conf
+DEFAULT_MAX_ARRAY_SIZE = 1001
+
+# sbatch errors that mean "slurmctld is busy, try again later" rather than
+# "this job is wrong". These are retried with jittered exponential backoff.
+TRANSIENT_SBATCH_ERRORS = (
+    "Socket timed out",
+    "Resource temporarily unavailable",
+    "Unable to contact slurm controller",
+    "Slurm temporarily unable to accept job",
+    "Transport endpoint is not connected",
+)
+# "Socket timed out" can also arrive after slurmctld has accepted the job. Before
+# retrying it, squeue is asked whether the job exists (see _find_submitted_job).
+AMBIGUOUS_SBATCH_ERRORS = ("Socket timed out",)
+SUBMIT_RETRIES = 5
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 60.0
+
+# How many sbatch calls may be in flight at once when submitting several arrays
+DEFAULT_MAX_IN_FLIGHT = 4
+
+def _task_command(job_scripts: Union[List[Path], TaskManifest], task_id_var: str, runner: str = "bash") -> str:
+    """
+    Returns the bash line(s) that run a single task, given a bash expression
+    holding the task's ID (e.g. "$SLURM_ARRAY_TASK_ID"). `runner` is the
+    program that runs the task's commands (bash, possibly behind a wrapper).
+    """
+    # JobScripts and TaskManifest know how to run one of their own tasks
+    if hasattr(job_scripts, "shell_command"):
+        return job_scripts.shell_command(task_id_var, runner=runner)
+
+    # A plain list of job_N.sh paths
+    job_script_path = job_scripts[0].parent.resolve()
+    return f"{runner} {job_script_path}/job_{task_id_var}.sh"
+
+def get_max_array_size() -> int:
+    """
+    Asks Slurm for its MaxArraySize (array indexes must stay below it).
+    Falls back to Slurm's own default if scontrol is unavailable.
+    """
+    try:
+        result = subprocess.run(
+            ["scontrol", "show", "config"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug(f"Could not query scontrol ({e}). Using MaxArraySize={DEFAULT_MAX_ARRAY_SIZE}.")
+        return DEFAULT_MAX_ARRAY_SIZE
+
+    match = re.search(r"^MaxArraySize\s*=\s*(\d+)", result.stdout, re.MULTILINE)
+    if not match:
+        logger.debug(f"MaxArraySize not found in scontrol output. Using {DEFAULT_MAX_ARRAY_SIZE}.")
+        return DEFAULT_MAX_ARRAY_SIZE
+
+    logger.debug(f"Cluster MaxArraySize is {match.group(1)}")
+    return int(match.group(1))
+
+def split_array(array_size: int, max_array_size: int = None) -> List[Tuple[int, int]]:
+    """
+    Splits an array of `array_size` tasks into chunks Slurm will accept.
+    Returns (offset, size) pairs: chunk k runs array indexes 1..size, which
+    map to tasks offset+1..offset+size of the whole array.
+    """
+    if not max_array_size or array_size < max_array_size:
+        return [(0, array_size)]
+
+    # Array indexes must be strictly below MaxArraySize
+    chunk_size = max_array_size - 1
+    return [
+        (offset, min(chunk_size, array_size - offset))
+        for offset in range(0, array_size, chunk_size)
+    ]
+
+def _task_lines(
+    job_scripts: Union[List[Path], TaskManifest],
+    task_id_var: str,
+    status_file: Path = None,
+    log_store: LogStore = None,
+    staging: NodeStaging = None,
+    speculation: Speculation = None
+) -> str:
+    """
+    Bash lines that run one task and leave its exit code in $RC.
+    If a status file is given, the task is also timed, and one line with its
+    exit code, start/end time, host and peak memory is appended to the file.
+    With a log store, the task's output goes to the shared log segments.
+    With staging, inputs are staged to node-local scratch first (and results
+    copied back afterwards). With speculation, only the first attempt of the
+    task to succeed records its result.
+    """
+    def run(command: str) -> str:
+        if log_store is None:
+            lines = "\n".join([command, "RC=$?"])
+        else:
+            lines = log_store.shell_capture(command)
+        return staging.wrap(lines) if staging else lines
+
+    if not status_file:
+        return run(_task_command(job_scripts, task_id_var))
+
+    run_lines = "\n".join([
+        "# Measure peak memory with GNU time, if this node has it",
+        "TIMER=()",
+        "RSS_FILE=",
+        "if [[ -x /usr/bin/time ]]; then",
+        "    RSS_FILE=$(mktemp)",
+        '    TIMER=(/usr/bin/time -f %M -o "$RSS_FILE")',
+        "fi",
+        "START=$(date +%s.%N)",
+        run(_task_command(job_scripts, task_id_var, runner='"${TIMER[@]}" bash')),
+        "END=$(date +%s.%N)",
+        "PEAK_RSS=",
+        'if [[ -n "$RSS_FILE" ]]; then',
+        '    PEAK_RSS=$(tail -n 1 "$RSS_FILE" 2>/dev/null)',
+        '    rm -f "$RSS_FILE"',
+        "fi",
+    ])
+    record_lines = "\n".join([
+        "# Record the result so `swarm resume` and `swarm report` know how the task went",
+        "printf '%s\\t%s\\t%s\\t%s\\t%s\\t%s\\n' \\",
+        f'    "$SWARM_TASK_ID" "$RC" "$START" "$END" "$HOSTNAME" "$PEAK_RSS" >> "{status_file}"',
+    ])
+    if speculation:
+        return speculation.wrap(run_lines, record_lines)
+    return "\n".join([run_lines, record_lines])
+
+def build_master_script(
+    job_scripts: Union[List[Path], TaskManifest],
+    bundle: int = 1,
+    parallel_tasks: int = 1,
+    offset: int = 0,
+    status_file: Path = None,
+    log_store: LogStore = None,
+    staging: NodeStaging = None,
+    speculation: Speculation = None
+) -> str:
+    """
+    Returns the content of the master script that Slurm runs once per array task.
+    With bundle > 1, each array task runs `bundle` consecutive commands,
+    up to `parallel_tasks` of them at the same time. `offset` is added to
+    $SLURM_ARRAY_TASK_ID when one big array is split into several smaller ones.
+    Each task's exit code is appended to `status_file` (if given), and its
+    output to `log_store` (if given). `staging` stages inputs to node-local scratch,
+    and `speculation` lets duplicate attempts of a task race (see Speculation).
+    """
+    job_count = len(job_scripts)
+
+    if bundle <= 1 and offset == 0:
+        return f"""#!/bin/bash
+# This is the master entry point for the Swarm job array.
+# Slurm will run this script {job_count} times.
+# SLURM_ARRAY_TASK_ID will automatically change from 1 to {job_count}.
+export SWARM_TASK_ID=$SLURM_ARRAY_TASK_ID
+# Execute the specific job script for this array task:
+{_task_lines(job_scripts, "$SLURM_ARRAY_TASK_ID", status_file, log_store, staging, speculation)}
+exit $RC
+"""
+
+    if bundle <= 1:
+        return f"""#!/bin/bash
+# This is the master entry point for one part of a split Swarm job array.
+# This part starts after task {offset}, so task N of the whole array
+# runs as SLURM_ARRAY_TASK_ID N - {offset}.
+export SWARM_TASK_ID=$(( SLURM_ARRAY_TASK_ID + {offset} ))
+# Execute the specific job script for this array task:
+{_task_lines(job_scripts, "$SWARM_TASK_ID", status_file, log_store, staging, speculation)}
+exit $RC
+"""
+
+    array_size = math.ceil(job_count / bundle)
+    offset_comment = f"# This part of the split array starts after bundle {offset}.\n" if offset else ""
+    return f"""#!/bin/bash
+# This is the master entry point for the bundled Swarm job array.
+# Each of the {array_size} bundles runs up to {bundle} of the {job_count} commands ({parallel_tasks} at a time).
+{offset_comment}# Inside each command, $SWARM_TASK_ID holds the command's own task number.
+run_task() {{
+    export SWARM_TASK_ID=$1
+{textwrap.indent(_task_lines(job_scripts, "$SWARM_TASK_ID", status_file, log_store, staging, speculation), "    ")}
+    return $RC
+}}
+export -f run_task
+
+FIRST=$(( (SLURM_ARRAY_TASK_ID + {offset} - 1) * {bundle} + 1 ))
+LAST=$(( FIRST + {bundle} - 1 ))
+if (( LAST > {job_count} )); then LAST={job_count}; fi
+
+# xargs exits non-zero if any command in the bundle failed
+seq "$FIRST" "$LAST" | xargs -P {parallel_tasks} -I{{}} bash -c 'run_task "$1"' _ {{}}
+"""
+
+def build_pack_script(
+    job_scripts: Union[List[Path], TaskManifest],
+    workers: int,
+    counter_file: Path,
+    queue_file: Path,
+    status_file: Path = None,
+    log_store: LogStore = None,
+    staging: NodeStaging = None
+) -> str:
+    """
+    Returns the master script for pack mode. Each allocation starts `workers`
+    worker loops, and every worker keeps claiming the next unclaimed task from
+    a shared, flock-protected counter until none are left. If the queue file
+    has content, the counter indexes into that list of task IDs instead.
+    """
+    job_count = len(job_scripts)
+    return f"""#!/bin/bash
+# This is the master entry point for a packed Swarm run.
+# Every allocation runs {workers} workers that pull the {job_count} commands
+# from a shared counter until all of them have been claimed.
+# Inside each command, $SWARM_TASK_ID holds the command's own task number.
+COUNTER="{counter_file}"
+QUEUE="{queue_file}"
+
+run_task() {{
+    export SWARM_TASK_ID=$1
+{textwrap.indent(_task_lines(job_scripts, "$SWARM_TASK_ID", status_file, log_store, staging), "    ")}
+    return $RC
+}}
+
+# Atomically claim the next position (the lock also works across nodes)
+next_task() {{
+    (
+        flock -x 9
+        POSITION=$(( $(cat "$COUNTER" 2>/dev/null || echo 0) + 1 ))
+        echo "$POSITION" > "$COUNTER"
+        if [[ -s "$QUEUE" ]]; then
+            sed -n "${{POSITION}}{{p;q}}" "$QUEUE"
+        elif (( POSITION <= {job_count} )); then
+            echo "$POSITION"
+        fi
+    ) 9>>"$COUNTER.lock"
+}}
+
+worker() {{
+    local FAILED=0
+    while TASK=$(next_task) && [[ -n "$TASK" ]]; do
+        run_task "$TASK" || FAILED=1
+    done
+    return $FAILED
+}}
+
+PIDS=()
+for _ in $(seq 1 {workers}); do
+    worker &
+    PIDS+=($!)
+done
+
+# Exit non-zero if any command run by this allocation failed
+EXIT_CODE=0
+for PID in "${{PIDS[@]}}"; do
+    wait "$PID" || EXIT_CODE=1
+done
+exit $EXIT_CODE
+"""
+
+def compress_ranges(indexes: List[int]) -> str:
+    """Turns [3, 17, 18, 19, 40] into Slurm's compact "3,17-19,40" form."""
+    ranges = []
+    for index in sorted(set(indexes)):
+        if ranges and index == ranges[-1][1] + 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+def _parse_job_id(sbatch_stdout: str) -> str:
+    """Pulls the job ID out of "Submitted batch job 123" (or "--parsable" output)."""
+    output = sbatch_stdout.strip()
+    if not output:
+        return ""
+    return output.split()[-1].split(";")[0]
+
+def _is_transient(stderr: str) -> bool:
+    return any(message in stderr for message in TRANSIENT_SBATCH_ERRORS)
+
+def _backoff_delay(attempt: int) -> float:
+    """"Full jitter" backoff: a random wait of up to base * 2^attempt seconds."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def _find_submitted_job(job_name: str, token: str) -> Optional[str]:
+    """
+    Looks for a job of ours whose --comment is `token`. Returns its job ID,
+    "" if there is none, or None if squeue could not answer either.
+    """
+    try:
+        result = subprocess.run(
+            ["squeue", "--me", "-h", f"--name={job_name}", "-o", "%A|%k"],
+            capture_output=True, text=True, check=True
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not check squeue for an earlier attempt: {getattr(e, 'stderr', e)}")
+        return None
+    for line in result.stdout.splitlines():
+        job_id, _, comment = line.strip().partition("|")
+        if comment == token:
+            return job_id
+    return ""
+
+def _run_sbatch(sbatch_command_parts: List[str]) -> str:
+    """
+    Runs one sbatch command and returns the new job's ID. Transient
+    controller errors are retried up to SUBMIT_RETRIES times. Each
+    submission is tagged with a unique --comment, so after a timeout that
+    may have hidden a successful submission, squeue can tell whether the
+    job exists before it is submitted a second time.
+    """
+    # --parsable makes sbatch print just "<job_id>[;cluster]"
+    if "--parsable" not in sbatch_command_parts:
+        sbatch_command_parts = [sbatch_command_parts[0], "--parsable"] + sbatch_command_parts[1:]
+
+    # A user-given --comment wins, and then a timed-out submission is not retried
+    token = None
+    if not any(part.startswith("--comment") for part in sbatch_command_parts):
+        token = f"swarm:{uuid.uuid4().hex}"
+        sbatch_command_parts = sbatch_command_parts[:2] + [f"--comment={token}"] + sbatch_command_parts[2:]
+    job_name = next((part.split("=", 1)[1] for part in sbatch_command_parts if part.startswith("--job-name=")), "")
+
+    unconfirmed = False
+    for attempt in range(SUBMIT_RETRIES + 1):
+        # After a timeout, only submit again once squeue confirms the job does not exist
+        if unconfirmed:
+            job_id = _find_submitted_job(job_name, token)
+            if job_id:
+                logger.warning(f"sbatch timed out, but job {job_id} had been submitted; not submitting it again.")
+                print(f"Success: {job_id}")
+                return job_id
+            if job_id is None:
+                if attempt == SUBMIT_RETRIES:
+                    raise RuntimeError("Slurm submission timed out, and squeue could not tell whether the job "
+                                       f"was submitted. Check `squeue --me --name={job_name}` before resubmitting.")
+                time.sleep(_backoff_delay(attempt))
+                continue
+            unconfirmed = False
+        try:
+            logger.debug("Executing subprocess.run...")
+            result = subprocess.run(
+                sbatch_command_parts,
+                capture_output=True, 
+                text=True,           
+                check=True           
+            )
+            logger.info(f"Subprocess succeeded. STDOUT: {result.stdout.strip()}")
+            print(f"Success: {result.stdout.strip()}")
+            return _parse_job_id(result.stdout)
+
+        except subprocess.CalledProcessError as e:
+            stderr = (e.stderr or "").strip()
+            ambiguous = any(message in stderr for message in AMBIGUOUS_SBATCH_ERRORS)
+            if attempt < SUBMIT_RETRIES and _is_transient(stderr) and (token or not ambiguous):
+                unconfirmed = ambiguous
+                delay = _backoff_delay(attempt)
+                logger.warning(f"sbatch failed with a transient error ({stderr}). Retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 1} of {SUBMIT_RETRIES}).")
+                time.sleep(delay)
+                continue
+            logger.error(f"Subprocess failed! Return code: {e.returncode}")
+            logger.error(f"STDERR output: {stderr}")
+            raise RuntimeError(f"Slurm submission failed: {stderr}")
+
+# Execution backends: each one takes a complete sbatch command line and
+# returns a job ID. "local" runs the array on this machine instead of Slurm.
+BACKENDS = {
+    "slurm": _run_sbatch,
+    "local": run_local_array,
+}
+
+def submit_all(
+    submit: Callable[[List[str]], str],
+    sbatch_commands: List[List[str]],
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+) -> Tuple[List[str], List[Exception]]:
+    """
+    Submits several commands, up to `max_in_flight` at a time, so one slow
+    sbatch call does not hold up the rest. Every command is attempted even
+    if some fail. Returns (job IDs of the successful ones in order, errors).
+    """
+    workers = max(1, min(max_in_flight, len(sbatch_commands)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(submit, sbatch_command_parts) for sbatch_command_parts in sbatch_commands]
+
+    job_ids, errors = [], []
+    for future in futures:
+        try:
+            job_ids.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    return job_ids, errors
+
+def _submit_and_record(
+    array_dir: Path,
+    state: Dict[str, Any],
+    sbatch_commands: List[List[str]],
+    max_in_flight: int
+) -> List[str]:
+    """
+    Submits through the state's backend and saves the new job IDs in the state
+    file, including those that went through when another submission failed.
+    """
+    backend = state.get("backend", "slurm")
+    # Local "submissions" run to completion, so running several at once would oversubscribe the CPUs
+    if backend != "slurm":
+        max_in_flight = 1
+    with PROFILER.phase("sbatch"):
+        job_ids, errors = submit_all(BACKENDS[backend], sbatch_commands, max_in_flight)
+
+    state["job_ids"] = state["job_ids"] + job_ids
+    save_state(array_dir, state["job_name"], state)
+
+    if errors:
+        if job_ids:
+            logger.error(f"{len(errors)} of {len(sbatch_commands)} submission(s) failed; "
+                         f"job(s) {', '.join(job_ids)} were submitted and recorded.")
+        raise errors[0]
+    return job_ids
+
 def submit_job_array(
-    job_scripts: List[Path],
+    job_scripts: Union[List[Path], TaskManifest],
     output_log: str,
     error_log: str,
     job_name: str,
@@ -23,101 +471,354 @@ def submit_job_array(
     modules: List[str] = None,
     container_image: str = None,
     container_mounts: str = None,
+    bundle: int = 1,
+    serial: bool = False,
+    max_array_size: int = None,
+    pack: int = 0,
+    backend: str = "slurm",
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    dependencies: List[str] = None,
+    log_segments: int = 0,
+    compress_logs: bool = False,
+    staging: NodeStaging = None,
+    speculative: bool = False,
     dry_run: bool = False
-) -> None:
+) -> List[str]:
     """
     Builds the submission environment and submits the sbatch command.
+    With bundle > 1, every array task runs `bundle` commands, in parallel
+    up to `cpus` at a time (or one after another if `serial` is set).
+    Arrays larger than `max_array_size` are split into several arrays.
+    With pack > 0, only `pack` allocations are requested instead, each one
+    running `cpus` workers that pull commands until none are left.
+    `backend` picks who runs the array (see BACKENDS). Split arrays are
+    submitted concurrently, at most `max_in_flight` at a time.
+    `dependencies` are --dependency values: one for every array, or a
+    single one shared by all arrays (see stage_dependencies).
+    With log_segments > 0, task output goes to that many shared, indexed log
+    segments (see LogStore) instead of `output_log`/`error_log`.
+    `staging` copies shared inputs to node-local scratch (see NodeStaging).
+    With `speculative`, `swarm speculate` can later start duplicate attempts
+    of slow tasks, of which only the first to succeed counts.
+    Returns the submitted job ID(s).
     """
     job_count = len(job_scripts)
-    logger.debug(f"Preparing to submit array of {job_count} jobs.")
+    bundle = max(bundle, 1)
+    if pack:
+        # Never ask for more allocations than there are commands
+        pack = min(pack, job_count)
+        bundle = 1
+        chunks = [(0, pack)]
+        logger.debug(f"Preparing to pack {job_count} jobs into {pack} allocation(s) of {cpus} worker(s).")
+    else:
+        array_size = math.ceil(job_count / bundle)
+        chunks = split_array(array_size, max_array_size)
+        logger.debug(f"Preparing to submit {job_count} jobs as {array_size} array tasks in {len(chunks)} array(s).")
     
-    # 1. Format the array string (e.g., "1-10" or "1-10%2" for rate limits)
+    # 1. Format the array strings (e.g., "1-10" or "1-10%2" for rate limits)
     rate_limit_str = f"%{rate_limit}" if rate_limit else ""
-    job_array_str = f"1-{job_count}{rate_limit_str}"
     
     # 2. Resolve absolute paths for safety
-    job_script_path = job_scripts[0].parent.resolve()
     cwd_resolved = cwd.resolve()
 
+    # A fresh submission starts with an empty record of finished tasks. A dry
+    # run leaves the records of the last real submission alone (resume,
+    # report and status still need them).
+    status_file = tasks_path(array_dir, job_name).resolve()
+    if not dry_run:
+        status_file.write_text("")
+
+    # Task cache keys (see TaskCache) move next to the tasks file, so the next
+    # run can tell which of these tasks finished
+    task_keys = Path(getattr(job_scripts, "directory", array_dir)) / TASK_KEYS_FILE
+    if not dry_run:
+        if task_keys.is_file():
+            os.replace(task_keys, keys_path(array_dir, job_name))
+        else:
+            keys_path(array_dir, job_name).unlink(missing_ok=True)
+
+    # Speculative runs start with no completion markers. Every array task must
+    # run exactly one command: a pack worker or a bundle would be cancelled
+    # mid-way through its other commands when a duplicate wins.
+    speculation = None
+    if speculative:
+        if pack:
+            raise ValueError("Speculative execution cannot be combined with pack mode.")
+        if bundle > 1:
+            raise ValueError("Speculative execution cannot be combined with bundling.")
+        speculation = Speculation(done_path(array_dir, job_name).resolve(), started_path(array_dir, job_name).resolve())
+        if not dry_run:
+            speculation.prepare(job_count)
+
+    if pack and not dry_run:
+        # Workers start counting from zero, over the whole command list
+        pack_counter_path(array_dir, job_name).write_text("0\n")
+        pack_queue_path(array_dir, job_name).write_text("")
+
+    # Shared log segments replace the two log files per task. Only Slurm's
+    # own messages still go through --output: every task of an array appends
+    # to one file (stderr included).
+    log_store = None
+    if log_segments:
+        log_store = LogStore(logs_path(array_dir, job_name).resolve(), log_segments, compress=compress_logs)
+        if not dry_run:
+            log_store.prepare()
+        log_parts = [f"--output={log_store.directory / SLURM_LOG}", "--open-mode=append"]
+    else:
+        log_parts = [f"--output={output_log}", f"--error={error_log}"]
+
     # =========================================================================
-    # Slurm submission script. This script uses $SLURM_ARRAY_TASK_ID to 
+    # Slurm submission scripts. Each one uses $SLURM_ARRAY_TASK_ID (plus its
+    # baked-in offset when the array is split) to pick which task(s) to run.
     # =========================================================================
-    master_script_path = array_dir / f"{job_name}_master.sh"
-    
-    master_script_content = f"""#!/bin/bash
-# This is the master entry point for the Swarm job array.
-# Slurm will run this script {job_count} times.
-# SLURM_ARRAY_TASK_ID will automatically change from 1 to {job_count}.
-# Execute the specific job script for this array task:
-bash {job_script_path}/job_$SLURM_ARRAY_TASK_ID.sh
-"""
-    # Save the master script to the disk
-    master_script_path.write_text(master_script_content)
-    logger.debug(f"Created master submission script at: {master_script_path}")
+    master_script_paths = []
+    for number, (offset, _) in enumerate(chunks, start=1):
+        suffix = f"_{number}" if len(chunks) > 1 else ""
+        master_script_path = array_dir / f"{job_name}_master{suffix}.sh"
+
+        if pack:
+            master_script_content = build_pack_script(
+                job_scripts,
+                workers=cpus,
+                counter_file=pack_counter_path(array_dir, job_name).resolve(),
+                queue_file=pack_queue_path(array_dir, job_name).resolve(),
+                status_file=status_file,
+                log_store=log_store,
+                staging=staging
+            )
+        else:
+            master_script_content = build_master_script(
+                job_scripts,
+                bundle=bundle,
+                parallel_tasks=1 if serial else cpus,
+                offset=offset,
+                status_file=status_file,
+                log_store=log_store,
+                staging=staging,
+                speculation=speculation
+            )
+        # Save the master script to the disk
+        master_script_path.write_text(master_script_content)
+        master_script_paths.append(master_script_path)
+        logger.debug(f"Created master submission script at: {master_script_path}")
 
 
     # 3. Build the core sbatch command. 
     # Notice we pass the master_script_path at the very end instead of --wrap!
-    sbatch_command_parts = [
+    sbatch_base_parts = [
         "sbatch",
         f"--chdir={cwd_resolved}",
         f"--partition={partition}",
         f"--job-name={job_name}",
-        f"--output={output_log}",
-        f"--error={error_log}",
+        *log_parts,
         f"--time={time}",
         f"--cpus-per-task={cpus}",
-        f"--mem={memory}",
-        f"--array={job_array_str}"
+        f"--mem={memory}"
     ]
 
     # 4. Add any custom options the user passed in (e.g., --gres=gpu:1)
     if sbatch_options:
         logger.debug(f"Appending user-provided sbatch_options: {sbatch_options}")
-        sbatch_command_parts.extend(sbatch_options.split())
+        sbatch_base_parts.extend(sbatch_options.split())
 
     # =========================================================================
     # CONTAINER SUPPORT (Pyxis / Enroot)
     # =========================================================================
     if container_image:
         logger.debug(f"Adding container image: {container_image}")
-        sbatch_command_parts.append(f"--container-image={container_image}")
+        sbatch_base_parts.append(f"--container-image={container_image}")
         
     if container_mounts:
         logger.debug(f"Adding container mounts: {container_mounts}")
-        sbatch_command_parts.append(f"--container-mounts={container_mounts}")
+        sbatch_base_parts.append(f"--container-mounts={container_mounts}")
 
-    # 5. Append the actual file we want to submit!
-    sbatch_command_parts.append(str(master_script_path))
+    # 5. One sbatch command per array, each ending with its own master script
+    sbatch_commands = [
+        sbatch_base_parts + [f"--array=1-{size}{rate_limit_str}", str(master_script_path)]
+        for (_, size), master_script_path in zip(chunks, master_script_paths)
+    ]
+
+    # 5.5. Wait for an earlier stage. Tasks whose dependency can never be met
+    # (because the matching task failed) are cancelled instead of pending forever.
+    if dependencies:
+        if len(dependencies) == 1:
+            dependencies = dependencies * len(sbatch_commands)
+        for parts, dependency in zip(sbatch_commands, dependencies):
+            parts[-2:-2] = [f"--dependency={dependency}", "--kill-on-invalid-dep=yes"]
 
-    # 6. Save a text copy of the exact command we are running for the user's records
-    sbatch_command_str = " ".join(sbatch_command_parts)
-    logger.debug(f"Final constructed sbatch command: {sbatch_command_str}")
+    # 6. Save a text copy of the exact command(s) we are running for the user's records
+    sbatch_command_strs = [" ".join(parts) for parts in sbatch_commands]
+    for sbatch_command_str in sbatch_command_strs:
+        logger.debug(f"Final constructed sbatch command: {sbatch_command_str}")
     
     sbatch_record_file = array_dir / f"{job_name}_command.txt"
-    sbatch_record_file.write_text(sbatch_command_str + "\n")
+    sbatch_record_file.write_text("\n".join(sbatch_command_strs) + "\n")
 
-    # 7. Dry Run Check
+    # 7. Remember how this array was built, so `swarm resume` can resubmit parts of it
+    state = {
+        "job_name": job_name,
+        "job_count": job_count,
+        "bundle": bundle,
+        # How many commands an array task (or pack allocation) runs at once
+        "parallel_tasks": cpus if pack else (1 if serial else cpus),
+        "pack": pack,
+        "backend": backend,
+        "max_in_flight": max_in_flight,
+        "rate_limit": rate_limit,
+        "sbatch_command": sbatch_base_parts,
+        "arrays": [
+            {"offset": offset, "size": size, "master_script": str(master_script_path)}
+            for (offset, size), master_script_path in zip(chunks, master_script_paths)
+        ],
+        "tasks_file": str(status_file),
+        "logs": log_store.to_state() if log_store else None,
+        "speculative": speculative,
+        "job_ids": [],
+    }
+
+    # 8. Dry Run Check (the state of the last real submission is kept)
     if dry_run:
         logger.info("Dry run flag detected. Skipping subprocess execution.")
-        print("\n[DRY RUN] Would submit the following command to Slurm:\n")
-        print(sbatch_command_str)
-        print(f"\n[DRY RUN] Master script saved to: {master_script_path}")
-        return
+        print("\n[DRY RUN] Would submit the following command(s) to Slurm:\n")
+        print("\n".join(sbatch_command_strs))
+        for master_script_path in master_script_paths:
+            print(f"\n[DRY RUN] Master script saved to: {master_script_path}")
+        return []
 
-    # 8. Execution
-    try:
-        logger.debug("Executing subprocess.run...")
-        result = subprocess.run(
-            sbatch_command_parts,
-            capture_output=True, 
-            text=True,           
-            check=True           
-        )
-        logger.info(f"Subprocess succeeded. STDOUT: {result.stdout.strip()}")
-        print(f"Success: {result.stdout.strip()}")
-        
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Subprocess failed! Return code: {e.returncode}")
-        logger.error(f"STDERR output: {e.stderr.strip()}")
-        raise RuntimeError(f"Slurm submission failed: {e.stderr.strip()}")
\ No newline at end of file
+    save_state(array_dir, job_name, state)
+
+    # 9. Execution (the job IDs are saved to the state file as well)
+    job_ids = _submit_and_record(array_dir, state, sbatch_commands, max_in_flight)
+
+    if len(job_ids) > 1:
+        print(f"Submitted {len(job_ids)} arrays: {', '.join(job_ids)}")
+    return job_ids
+
+def stage_dependencies(previous_stage: str, previous_job_ids: List[str], per_task: bool) -> List[str]:
+    """
+    The --dependency values that chain a stage to the stage before it.
+    With `per_task` (both stages are one array of the same size), task N only
+    waits for task N of the previous stage ("aftercorr"), one value per split
+    array. Otherwise (e.g. a final merge step) the whole previous stage must succeed.
+    """
+    # A dry run has no job IDs yet, so show a placeholder instead
+    job_ids = previous_job_ids or [f"<{previous_stage}>"]
+    if per_task:
+        return [f"aftercorr:{job_id}" for job_id in job_ids]
+    return ["afterok:" + ":".join(job_ids)]
+
+def resume_job_array(array_dir: Path, job_name: str = None, dry_run: bool = False) -> List[str]:
+    """
+    Resubmits only the tasks of an earlier submission that failed or never
+    finished, reusing its master scripts. Returns the new job ID(s).
+    """
+    state = load_state(array_dir, job_name)
+    job_name = state["job_name"]
+
+    status = read_task_status(Path(state["tasks_file"]))
+    missing_tasks = incomplete_tasks(state["job_count"], status)
+    logger.info(f"{len(missing_tasks)} of {state['job_count']} tasks of '{job_name}' are incomplete.")
+    if not missing_tasks:
+        print(f"All {state['job_count']} tasks of '{job_name}' finished successfully. Nothing to resume.")
+        return []
+
+    rate_limit_str = f"%{state['rate_limit']}" if state["rate_limit"] else ""
+
+    if state.get("pack"):
+        # Pack mode: queue just the missing tasks and start a smaller pool
+        if not dry_run:
+            pack_queue_path(array_dir, job_name).write_text("".join(f"{task_id}\n" for task_id in missing_tasks))
+            pack_counter_path(array_dir, job_name).write_text("0\n")
+        allocations = min(state["pack"], len(missing_tasks))
+        sbatch_commands = [
+            state["sbatch_command"]
+            + [f"--array=1-{allocations}{rate_limit_str}", state["arrays"][0]["master_script"]]
+        ]
+        return _resubmit(array_dir, state, missing_tasks, sbatch_commands, dry_run)
+
+    # With bundling, a whole bundle is rerun if any of its tasks is incomplete
+    bundle = state["bundle"]
+    missing_indexes = sorted({(task_id - 1) // bundle + 1 for task_id in missing_tasks})
+
+    sbatch_commands = []
+    for array in state["arrays"]:
+        offset, size = array["offset"], array["size"]
+        local_indexes = [index - offset for index in missing_indexes if offset < index <= offset + size]
+        if local_indexes:
+            sbatch_commands.append(
+                state["sbatch_command"]
+                + [f"--array={compress_ranges(local_indexes)}{rate_limit_str}", array["master_script"]]
+            )
+
+    return _resubmit(array_dir, state, missing_tasks, sbatch_commands, dry_run)
+
+def _resubmit(
+    array_dir: Path,
+    state: Dict[str, Any],
+    missing_tasks: List[int],
+    sbatch_commands: List[List[str]],
+    dry_run: bool
+) -> List[str]:
+    """Submits the resume command(s) and records the new job IDs in the state file."""
+    print(f"Resuming {len(missing_tasks)} incomplete task(s) of '{state['job_name']}'.")
+    if dry_run:
+        print("\n[DRY RUN] Would submit the following command(s) to Slurm:\n")
+        print("\n".join(" ".join(parts) for parts in sbatch_commands))
+        return []
+
+    return _submit_and_record(array_dir, state, sbatch_commands,
+                              state.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT))
+
+def speculate_job_array(
+    array_dir: Path,
+    job_name: str = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    now: float = None,
+    dry_run: bool = False
+) -> List[str]:
+    """
+    Starts a second attempt of every task of a --speculative submission that
+    has been running for more than `threshold` times the median task
+    duration, on a node other than the one it is stuck on. Whichever attempt
+    succeeds first is kept, and it cancels the other. Returns the new job ID(s).
+    """
+    state = load_state(array_dir, job_name)
+    job_name = state["job_name"]
+    if not state.get("speculative"):
+        raise ValueError(f"'{job_name}' was not submitted with --speculative.")
+
+    speculation = Speculation(done_path(array_dir, job_name).resolve(), started_path(array_dir, job_name).resolve())
+    stragglers = speculation.find_stragglers(Path(state["tasks_file"]), now if now is not None else time.time(), threshold)
+    if not stragglers:
+        print(f"No stragglers among the running tasks of '{job_name}'.")
+        return []
+
+    # The duplicates run the same array indexes of the same master scripts, away
+    # from the slow nodes (speculative arrays are never bundled: task N is index N)
+    exclude = ",".join(sorted({attempt.host for attempt in stragglers}))
+    sbatch_commands, submitted = [], []
+    for array in state["arrays"]:
+        offset, size = array["offset"], array["size"]
+        local = {attempt.task_id: attempt.task_id - offset for attempt in stragglers
+                 if offset < attempt.task_id <= offset + size}
+        if local:
+            sbatch_commands.append(
+                state["sbatch_command"]
+                + [f"--exclude={exclude}", f"--array={compress_ranges(sorted(local.values()))}", array["master_script"]]
+            )
+            submitted.append(local)
+
+    print(f"Starting a second attempt of {len(stragglers)} slow task(s) of '{job_name}', avoiding {exclude}.")
+    if dry_run:
+        print("\n[DRY RUN] Would submit the following command(s) to Slurm:\n")
+        print("\n".join(" ".join(parts) for parts in sbatch_commands))
+        return []
+
+    job_ids = _submit_and_record(array_dir, state, sbatch_commands, state.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT))
+
+    # Tell each task about all of its attempts, so the winner can cancel the others
+    original = {attempt.task_id: attempt.attempt_id for attempt in stragglers}
+    for new_job_id, local in zip(job_ids, submitted):
+        for task_id, local_index in local.items():
+            speculation.attempts_path(task_id).write_text(f"{original[task_id]}\n{new_job_id}_{local_index}\n")
+    return job_ids
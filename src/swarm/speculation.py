@@ -0,0 +1,139 @@
+import logging
+import shutil
+import statistics
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from swarm.state import read_task_records
+
+logger = logging.getLogger(__name__)
+
+# Completion markers are spread over sub-folders of this many tasks each
+MARKER_BUCKET = 1000
+
+# A task is a straggler once it has run this many times the median duration...
+DEFAULT_THRESHOLD = 3.0
+# ...and only once enough tasks have finished for the median to mean something
+MIN_FINISHED = 10
+
+class Attempt(NamedTuple):
+    """One line of the started file: an attempt at running a task."""
+    task_id: int
+    start: float
+    host: str
+    attempt_id: str   # "<array job>_<array index>", which scancel accepts
+
+class Speculation:
+    """
+    Lets several attempts of the same task run at once, keeping only the
+    first one to succeed. Every attempt records its start in a shared file.
+    A finished attempt tries to create the task's completion marker with
+    mkdir, which only one attempt can win. The winner records its result
+    and cancels the other attempts listed in the task's .attempts file. A
+    later attempt skips the task, and a losing attempt records nothing.
+    """
+
+    def __init__(self, done_dir: Path, started_file: Path):
+        self.done_dir = done_dir
+        self.started_file = started_file
+
+    def marker_path(self, task_id: int) -> Path:
+        return self.done_dir / str(task_id // MARKER_BUCKET) / str(task_id)
+
+    def attempts_path(self, task_id: int) -> Path:
+        """Written by `swarm speculate`: every attempt of the task, so the winner can cancel the rest."""
+        marker = self.marker_path(task_id)
+        return marker.with_name(f"{marker.name}.attempts")
+
+    def prepare(self, job_count: int) -> None:
+        """Starts with no markers, and creates the bucket folders the markers go into."""
+        shutil.rmtree(self.done_dir, ignore_errors=True)
+        for bucket in range(job_count // MARKER_BUCKET + 1):
+            (self.done_dir / str(bucket)).mkdir(parents=True, exist_ok=True)
+        self.started_file.write_text("")
+
+    def wrap(self, run_lines: str, record_lines: str) -> str:
+        """
+        Wraps the bash lines that run one task (leaving its exit code in $RC)
+        and the lines that record its result, so only the winning attempt
+        records anything.
+        """
+        return "\n".join([
+            "# Speculative execution: several attempts of this task may be running",
+            'SWARM_ATTEMPT="${SLURM_ARRAY_JOB_ID:-$SLURM_JOB_ID}_${SLURM_ARRAY_TASK_ID}"',
+            f'MARKER="{self.done_dir}/$(( SWARM_TASK_ID / {MARKER_BUCKET} ))/$SWARM_TASK_ID"',
+            'if [[ -d "$MARKER" ]]; then',
+            '    echo "Swarm: task $SWARM_TASK_ID already finished in another attempt." >&2',
+            "    RC=0",
+            "else",
+            "# Note when and where this attempt started, for `swarm speculate`",
+            "printf '%s\\t%s\\t%s\\t%s\\n' \\",
+            f'    "$SWARM_TASK_ID" "$(date +%s.%N)" "${{SLURMD_NODENAME:-$HOSTNAME}}" "$SWARM_ATTEMPT" >> "{self.started_file}"',
+            run_lines,
+            "# The first attempt to succeed claims the task (mkdir is atomic) and cancels the others",
+            'if (( RC == 0 )) && mkdir "$MARKER" 2>/dev/null; then',
+            '    if [[ -f "$MARKER.attempts" ]] && command -v scancel >/dev/null; then',
+            '        grep -vx "$SWARM_ATTEMPT" "$MARKER.attempts" | xargs -r scancel',
+            "    fi",
+            record_lines,
+            'elif (( RC == 0 )) || [[ -d "$MARKER" ]]; then',
+            '    echo "Swarm: another attempt of task $SWARM_TASK_ID finished first; keeping its result." >&2',
+            "    RC=0",
+            "else",
+            record_lines,
+            "fi",
+            "fi",
+        ])
+
+    def read_attempts(self) -> Dict[int, List[Attempt]]:
+        """{task_id: [attempts, oldest first]} from the started file."""
+        attempts: Dict[int, List[Attempt]] = {}
+        try:
+            with open(self.started_file) as handle:
+                for line in handle:
+                    fields = line.rstrip("\n").split("\t")
+                    # Skip lines cut short by a task that was killed mid-write
+                    if len(fields) != 4 or not fields[0].isdigit():
+                        continue
+                    try:
+                        attempt = Attempt(int(fields[0]), float(fields[1]), fields[2], fields[3])
+                    except ValueError:
+                        continue
+                    attempts.setdefault(attempt.task_id, []).append(attempt)
+        except FileNotFoundError:
+            logger.debug(f"No started file yet at {self.started_file}")
+        return attempts
+
+    def find_stragglers(
+        self,
+        tasks_file: Path,
+        now: float,
+        threshold: float = DEFAULT_THRESHOLD,
+        min_finished: int = MIN_FINISHED
+    ) -> List[Attempt]:
+        """
+        Running tasks that started more than `threshold` times the median
+        successful duration ago, and have not been speculated on yet.
+        """
+        records = read_task_records(tasks_file)
+        durations = [r.duration for r in records.values() if r.exit_code == 0 and r.duration is not None]
+        if len(durations) < min_finished:
+            logger.info(f"Only {len(durations)} task(s) have finished; waiting for {min_finished} before looking for stragglers.")
+            return []
+        limit = threshold * statistics.median(durations)
+
+        stragglers = []
+        for task_id, task_attempts in sorted(self.read_attempts().items()):
+            # Only the latest attempt counts (earlier ones may have failed before a resume)
+            latest = task_attempts[-1]
+            record = records.get(task_id)
+            if record and (record.end is None or record.end >= latest.start):
+                continue
+            # One duplicate per task is enough
+            if self.marker_path(task_id).exists() or self.attempts_path(task_id).exists():
+                continue
+            if now - latest.start > limit:
+                stragglers.append(latest)
+        logger.info(f"{len(stragglers)} task(s) have run longer than {limit:.0f}s "
+                    f"({threshold:g}x the median of {len(durations)} finished tasks).")
+        return stragglers
@@ -0,0 +1,95 @@
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Node-local base directory, unless --scratch says otherwise (a bash expression)
+DEFAULT_SCRATCH = "${TMPDIR:-/tmp}"
+
+class NodeStaging:
+    """
+    Copies shared inputs to node-local scratch once per node, instead of every
+    task reading them from the shared filesystem. The first task of an array
+    on a node copies them under a node-level lock; every later task of the
+    array on that node reuses the copy, whether or not another task is still
+    running. The copy is kept until the array job ends and is left for the
+    node's scratch cleanup (a per-job $TMPDIR or the site's epilog) to remove.
+    Commands find the copies in $SWARM_STAGED. With an output directory, every
+    task also gets an empty local $SWARM_OUTPUT that is copied back when it ends.
+    """
+
+    def __init__(self, inputs: List[Path], output_dir: Optional[Path] = None, scratch: str = None):
+        self.inputs = inputs
+        self.output_dir = output_dir
+        self.scratch = scratch or DEFAULT_SCRATCH
+
+    @classmethod
+    def create(cls, stage_in: List[str], stage_out: Optional[str], cwd: Path, scratch: str = None) -> "NodeStaging":
+        """Resolves --stage-in/--stage-out against the job's working directory and checks them."""
+        inputs = [(cwd / path).resolve() for path in stage_in or []]
+        missing = [str(path) for path in inputs if not path.exists()]
+        if missing:
+            raise ValueError(f"--stage-in path(s) not found: {', '.join(missing)}")
+        names = [path.name for path in inputs]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"--stage-in paths must have different names ($SWARM_STAGED/<name>): {', '.join(duplicates)}")
+
+        output_dir = None
+        if stage_out:
+            output_dir = (cwd / stage_out).resolve()
+            output_dir.mkdir(parents=True, exist_ok=True)
+        return cls(inputs, output_dir, scratch)
+
+    def wrap(self, task_lines: str) -> str:
+        """
+        Wraps the bash lines that run one task (and leave its exit code in
+        $RC) with the stage-in before and the stage-out and clean-up after.
+        A task whose inputs cannot be staged fails without running.
+        """
+        copy_lines = [f'            cp -a "{path}" "$SWARM_SCRATCH/staged/" || exit 1' for path in self.inputs]
+        # Just --stage-out: nothing to copy in, but the same scratch folder is used
+        copy_lines = copy_lines or ["            true"]
+        lines = [
+            "# Stage the shared inputs into node-local scratch, once per node: the lock",
+            "# lets all tasks of the array on the same node share one copy",
+            f'SWARM_SCRATCH="{self.scratch}/swarm_${{USER}}_${{SLURM_ARRAY_JOB_ID:-$SLURM_JOB_ID}}"',
+            'export SWARM_STAGED="$SWARM_SCRATCH/staged"',
+            'mkdir -p "$SWARM_SCRATCH"',
+            "(",
+            "    flock -x 7",
+            '    if [[ ! -e "$SWARM_SCRATCH/.staged" ]]; then',
+            '        rm -rf "$SWARM_STAGED"',
+            '        mkdir -p "$SWARM_STAGED"',
+            "        (",
+            *copy_lines,
+            '        ) || { rm -rf "$SWARM_STAGED"; exit 1; }',
+            '        touch "$SWARM_SCRATCH/.staged"',
+            "    fi",
+            ') 7>"$SWARM_SCRATCH.lock"',
+            "STAGE_RC=$?",
+        ]
+        if self.output_dir:
+            lines += [
+                'export SWARM_OUTPUT="$SWARM_SCRATCH/output_$SWARM_TASK_ID"',
+                'rm -rf "$SWARM_OUTPUT" && mkdir -p "$SWARM_OUTPUT"',
+            ]
+        lines += [
+            "if (( STAGE_RC == 0 )); then",
+            task_lines,
+            "else",
+            '    echo "Swarm: could not stage inputs into $SWARM_STAGED on $HOSTNAME" >&2',
+            "    RC=$STAGE_RC",
+            "fi",
+        ]
+        if self.output_dir:
+            lines += [
+                "# Copy the task's results back to shared storage (a failed copy fails the task)",
+                f'if ! cp -a "$SWARM_OUTPUT/." "{self.output_dir}/"; then',
+                f'    echo "Swarm: could not copy $SWARM_OUTPUT back to {self.output_dir}" >&2',
+                "    (( RC == 0 )) && RC=1",
+                "fi",
+                'rm -rf "$SWARM_OUTPUT"',
+            ]
+        return "\n".join(lines)
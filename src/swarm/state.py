@@ -0,0 +1,145 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from swarm.cache import load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+# Files Swarm keeps next to the generated scripts in array_dir
+STATE_SUFFIX = "_state.json"
+TASKS_SUFFIX = "_tasks.tsv"
+PACK_COUNTER_SUFFIX = "_pack.counter"
+PACK_QUEUE_SUFFIX = "_pack_queue.txt"
+LOGS_SUFFIX = "_logs"
+KEYS_SUFFIX = "_keys.tsv"
+DONE_SUFFIX = "_done"
+STARTED_SUFFIX = "_started.tsv"
+# A --dry-run writes its scripts in here, never over those of a real submission
+DRY_RUN_DIR = "dry_run"
+
+def state_path(array_dir: Path, job_name: str) -> Path:
+    """Everything needed to resubmit (part of) an array: sizes, scripts, sbatch options, job IDs."""
+    return array_dir / f"{job_name}{STATE_SUFFIX}"
+
+def tasks_path(array_dir: Path, job_name: str) -> Path:
+    """Append-only file where the master script records one line per finished task."""
+    return array_dir / f"{job_name}{TASKS_SUFFIX}"
+
+def pack_counter_path(array_dir: Path, job_name: str) -> Path:
+    """Shared counter that pack-mode workers bump (under a lock) to claim their next task."""
+    return array_dir / f"{job_name}{PACK_COUNTER_SUFFIX}"
+
+def pack_queue_path(array_dir: Path, job_name: str) -> Path:
+    """Optional list of task IDs for pack-mode workers to claim (used by resume)."""
+    return array_dir / f"{job_name}{PACK_QUEUE_SUFFIX}"
+
+def logs_path(array_dir: Path, job_name: str) -> Path:
+    """Folder with the shared, indexed log segments of --log-segments runs."""
+    return array_dir / f"{job_name}{LOGS_SUFFIX}"
+
+def keys_path(array_dir: Path, job_name: str) -> Path:
+    """Task cache keys of the submitted tasks that declared outputs (see TaskCache)."""
+    return array_dir / f"{job_name}{KEYS_SUFFIX}"
+
+def done_path(array_dir: Path, job_name: str) -> Path:
+    """Folder of completion markers: the first attempt of a task to succeed creates its marker."""
+    return array_dir / f"{job_name}{DONE_SUFFIX}"
+
+def started_path(array_dir: Path, job_name: str) -> Path:
+    """Append-only file where every attempt of a task records when and where it started."""
+    return array_dir / f"{job_name}{STARTED_SUFFIX}"
+
+def dry_run_dir(array_dir: Path) -> Path:
+    """Folder for the scripts of a --dry-run, so `swarm resume` keeps running the real ones."""
+    path = array_dir / DRY_RUN_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def save_state(array_dir: Path, job_name: str, state: Dict[str, Any]) -> None:
+    save_json(state_path(array_dir, job_name), state)
+
+def find_job_names(array_dir: Path) -> List[str]:
+    """Job names with a state file in array_dir, most recently submitted first."""
+    state_files = sorted(
+        array_dir.glob(f"*{STATE_SUFFIX}"),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True
+    )
+    return [path.name[:-len(STATE_SUFFIX)] for path in state_files]
+
+def load_state(array_dir: Path, job_name: str = None) -> Dict[str, Any]:
+    """
+    Loads the state of a submitted array. Without a job name, the most
+    recently submitted array in array_dir is used.
+    """
+    if job_name is None:
+        job_names = find_job_names(array_dir)
+        if not job_names:
+            raise FileNotFoundError(f"No Swarm submissions found in {array_dir}")
+        job_name = job_names[0]
+        logger.debug(f"No job name given. Using most recent submission: {job_name}")
+
+    state = load_json(state_path(array_dir, job_name))
+    if state is None:
+        raise FileNotFoundError(f"No Swarm submission named '{job_name}' found in {array_dir}")
+    return state
+
+class TaskRecord(NamedTuple):
+    """One line of the tasks file, written by the master script when a task ends."""
+    task_id: int
+    exit_code: int
+    start: Optional[float] = None        # epoch seconds
+    end: Optional[float] = None          # epoch seconds
+    host: Optional[str] = None
+    peak_rss_kb: Optional[int] = None    # only if GNU time was available on the node
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+def _optional(value: str, cast):
+    try:
+        return cast(value) if value else None
+    except ValueError:
+        return None
+
+def read_task_records(tasks_file: Path) -> Dict[int, TaskRecord]:
+    """
+    Returns {task_id: TaskRecord} from the tasks file. If a task ran more than
+    once (e.g. after a resume), its most recent record wins.
+    """
+    records: Dict[int, TaskRecord] = {}
+    try:
+        with open(tasks_file) as handle:
+            for line in handle:
+                fields = line.rstrip("\n").split("\t")
+                # Skip lines cut short by a task that was killed mid-write
+                if len(fields) < 2 or not fields[0].isdigit():
+                    continue
+                try:
+                    task_id, exit_code = int(fields[0]), int(fields[1])
+                except ValueError:
+                    continue
+                fields += [""] * (6 - len(fields))
+                records[task_id] = TaskRecord(
+                    task_id,
+                    exit_code,
+                    start=_optional(fields[2], float),
+                    end=_optional(fields[3], float),
+                    host=fields[4] or None,
+                    peak_rss_kb=_optional(fields[5], int),
+                )
+    except FileNotFoundError:
+        logger.debug(f"No tasks file yet at {tasks_file}")
+    return records
+
+def read_task_status(tasks_file: Path) -> Dict[int, int]:
+    """Returns {task_id: exit_code} for every task that has reported back."""
+    return {task_id: record.exit_code for task_id, record in read_task_records(tasks_file).items()}
+
+def incomplete_tasks(job_count: int, status: Dict[int, int]) -> List[int]:
+    """Tasks that never reported back or whose last attempt failed."""
+    return [task_id for task_id in range(1, job_count + 1) if status.get(task_id) != 0]
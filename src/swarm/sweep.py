@@ -0,0 +1,252 @@
+import csv
+import json
+import logging
+import math
+import re
+import shlex
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from swarm.manifest import ManifestWriter, TaskManifest
+
+logger = logging.getLogger(__name__)
+
+SWEEP_FILE = "sweep.json"
+PARAMS_DIR = "params"
+
+# Parameters reach the command as environment variables with this prefix
+ENV_PREFIX = "SWARM_PARAM_"
+
+PARAM_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# "1..100" or "0..1000..10" (inclusive, integers only)
+RANGE_SPEC = re.compile(r"(-?\d+)\.\.(-?\d+)(?:\.\.(-?\d+))?")
+
+class Parameter(NamedTuple):
+    """
+    One swept parameter. A range is computed from the task index at run time,
+    so it takes no disk space; any other values live in an indexed table.
+    """
+    name: str
+    count: int
+    start: int = 0                         # ranges only
+    step: int = 1                          # ranges only
+    table: Optional[TaskManifest] = None   # lists, files and CSV columns
+
+    def value(self, position: int) -> str:
+        """The parameter's value at a 0-based position."""
+        if self.table is None:
+            return str(self.start + position * self.step)
+        return self.table.read_command(position + 1)
+
+    def shell_value(self, position_expr: str) -> str:
+        """Bash expression for the value at a 0-based position (an arithmetic expression)."""
+        if self.table is None:
+            return f"$(( {self.start} + ({position_expr}) * {self.step} ))"
+        return f'"$({self.table.shell_read_line(f"{position_expr} + 1")})"'
+
+def _iter_values(spec: str, cwd: Path) -> Iterable[str]:
+    """Streams the values of a list ("a,b,c"), a file ("@values.txt") or a CSV column ("@table.csv:column")."""
+    if not spec.startswith("@"):
+        yield from spec.split(",")
+        return
+
+    path, _, column = spec[1:].partition(":")
+    path = cwd / path
+    if not path.is_file():
+        raise ValueError(f"Parameter file {path} does not exist.")
+    with open(path, newline="") as handle:
+        if not column:
+            for line in handle:
+                if line.strip():
+                    yield line.rstrip("\n")
+            return
+        reader = csv.DictReader(handle)
+        if column not in (reader.fieldnames or []):
+            raise ValueError(f"Column '{column}' not found in {path} (columns: {', '.join(reader.fieldnames or [])}).")
+        for row in reader:
+            yield row[column]
+
+def parse_parameter(spec: str, params_dir: Path, cwd: Path = Path(".")) -> Parameter:
+    """
+    Parses one --param value, NAME=VALUES. VALUES can be a list ("0.1,0.01"),
+    an inclusive integer range ("1..100" or "0..1000..10"), a file with one
+    value per line ("@seeds.txt") or a CSV column ("@samples.csv:sample_id").
+    """
+    name, separator, values = spec.partition("=")
+    name = name.strip()
+    if not separator or not PARAM_NAME.fullmatch(name) or not values:
+        raise ValueError(f"Expected --param NAME=VALUES, got '{spec}'.")
+
+    match = RANGE_SPEC.fullmatch(values)
+    if match:
+        first, last, step = int(match.group(1)), int(match.group(2)), int(match.group(3) or 1)
+        if step == 0 or (last - first) * step < 0:
+            raise ValueError(f"Parameter '{name}': the range {values} is empty.")
+        return Parameter(name, (last - first) // step + 1, start=first, step=step)
+
+    table_dir = params_dir / name
+    table_dir.mkdir(parents=True, exist_ok=True)
+    writer = ManifestWriter(table_dir)
+    try:
+        for value in _iter_values(values, cwd):
+            writer.write(value)
+    finally:
+        table = writer.close()
+    if not table.count:
+        raise ValueError(f"Parameter '{name}' has no values.")
+    return Parameter(name, table.count, table=table)
+
+class ParameterSweep:
+    """
+    A command template plus parameter tables, used in place of job scripts.
+    Nothing is written per task: every array task works out its own parameter
+    values from its index, either as a cartesian product (the last parameter
+    varies fastest, like itertools.product) or zipped together.
+    """
+
+    def __init__(self, directory: Path, template: str, parameters: List[Parameter], zipped: bool = False):
+        self.directory = directory
+        self.template = template
+        self.parameters = parameters
+        self.zipped = zipped
+        if zipped:
+            counts = {p.count for p in parameters}
+            if len(counts) > 1:
+                details = ", ".join(f"{p.name}={p.count}" for p in parameters)
+                raise ValueError(f"Zipped parameters must all have the same number of values ({details}).")
+            self.count = counts.pop() if counts else 1
+        else:
+            self.count = math.prod(p.count for p in parameters)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _positions(self, task_id: int) -> Dict[str, int]:
+        index = task_id - 1
+        if self.zipped:
+            return {p.name: index for p in self.parameters}
+        positions = {}
+        for parameter in reversed(self.parameters):
+            index, positions[parameter.name] = divmod(index, parameter.count)
+        return positions
+
+    def values(self, task_id: int) -> Dict[str, str]:
+        """The parameter values of a 1-based task ID."""
+        if not 1 <= task_id <= self.count:
+            raise IndexError(f"Task {task_id} is outside the sweep (1-{self.count}).")
+        positions = self._positions(task_id)
+        return {p.name: p.value(positions[p.name]) for p in self.parameters}
+
+    def read_command(self, task_id: int) -> str:
+        """The command a task runs, with its values filled in and quoted (handy for previews)."""
+        values = self.values(task_id)
+        return _fill(self.template, values, lambda name, quoting: _quote_value(values[name], quoting))
+
+    def shell_command(self, task_id_var: str, runner: str = "bash") -> str:
+        """
+        Bash lines that set SWARM_PARAM_<name> for one task and run the
+        template, in which every {name} refers to that variable. The
+        references are quoted like read_command quotes the values, so a value
+        is never word-split or globbed, even inside '...'.
+        """
+        lines = [f"SWARM_SWEEP_INDEX=$(( {task_id_var} - 1 ))"]
+        for parameter in reversed(self.parameters):
+            if self.zipped:
+                lines.append(f"export {ENV_PREFIX}{parameter.name}={parameter.shell_value('SWARM_SWEEP_INDEX')}")
+            else:
+                lines.append(f"export {ENV_PREFIX}{parameter.name}="
+                             f"{parameter.shell_value(f'SWARM_SWEEP_INDEX % {parameter.count}')}")
+                lines.append(f"SWARM_SWEEP_INDEX=$(( SWARM_SWEEP_INDEX / {parameter.count} ))")
+
+        names = {p.name for p in self.parameters}
+        command = _fill(self.template, names, _quote_reference)
+        lines.append(f"{runner} -c {shlex.quote(command)}")
+        return "\n".join(lines)
+
+def _placeholders(names: Iterable[str]) -> "re.Pattern":
+    """Matches {name} for the given names only, so bash's own ${VAR} and {a,b} are left alone."""
+    if not names:
+        return re.compile(r"(?!)")  # never matches
+    alternatives = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(rf"(?<!\$)\{{({alternatives})\}}")
+
+def _quoting_after(text: str, quoting: Optional[str]) -> Optional[str]:
+    """The quotes (None, "'" or '"') still open after `text`, given those open before it."""
+    escaped = False
+    for char in text:
+        if escaped:
+            escaped = False
+        elif quoting == "'":
+            quoting = None if char == "'" else quoting
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoting = None if quoting == '"' else '"'
+        elif char == "'" and quoting is None:
+            quoting = "'"
+    return quoting
+
+def _fill(template: str, names: Iterable[str], replace: Callable[[str, Optional[str]], str]) -> str:
+    """Replaces every {name} with replace(name, quoting), where quoting is the quote it sits in."""
+    parts, quoting, position = [], None, 0
+    for match in _placeholders(names).finditer(template):
+        literal = template[position:match.start()]
+        quoting = _quoting_after(literal, quoting)
+        parts += [literal, replace(match.group(1), quoting)]
+        position = match.end()
+    parts.append(template[position:])
+    return "".join(parts)
+
+def _quote_value(value: str, quoting: Optional[str]) -> str:
+    """A value written into the command so bash reads it back unchanged."""
+    if quoting == "'":
+        return value.replace("'", "'\"'\"'")
+    if quoting == '"':
+        return re.sub(r'([\\$`"])', r"\\\1", value)
+    return shlex.quote(value)
+
+def _quote_reference(name: str, quoting: Optional[str]) -> str:
+    """A reference to the value's variable that expands to exactly the value."""
+    reference = f"${{{ENV_PREFIX}{name}}}"
+    if quoting == "'":
+        return f"'\"{reference}\"'"
+    if quoting == '"':
+        return reference
+    return f'"{reference}"'
+
+def create_sweep(
+    template: str,
+    param_specs: List[str],
+    array_dir: Path,
+    zipped: bool = False,
+    modules: List[str] = None,
+    cwd: Path = Path(".")
+) -> ParameterSweep:
+    """
+    Writes the template and the parameter tables into array_dir and returns
+    the sweep. Relative "@file" paths are read from `cwd`.
+    """
+    parameters = [parse_parameter(spec, array_dir / PARAMS_DIR, cwd) for spec in param_specs]
+    names = [p.name for p in parameters]
+    if len(set(names)) != len(names):
+        raise ValueError("Each --param name can only be given once.")
+
+    unused = [name for name in names if not _placeholders([name]).search(template)]
+    if unused:
+        raise ValueError(f"The template never uses {', '.join('{' + name + '}' for name in unused)}.")
+
+    if modules:
+        template = f"module load {' '.join(modules)} && {template}"
+
+    sweep = ParameterSweep(array_dir, template, parameters, zipped=zipped)
+    (array_dir / SWEEP_FILE).write_text(json.dumps({
+        "template": template,
+        "mode": "zip" if zipped else "product",
+        "tasks": sweep.count,
+        "parameters": [
+            {"name": p.name, "count": p.count, **({"table": str(p.table.directory)} if p.table else {"start": p.start, "step": p.step})}
+            for p in parameters
+        ],
+    }, indent=2))
+    logger.info(f"Sweep of {sweep.count} tasks over {', '.join(names) or 'no parameters'} written to {array_dir}")
+    return sweep
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Set
+
+from swarm.cache import cache_dir, load_json
+from swarm.state import find_job_names, keys_path, read_task_status, state_path
+
+logger = logging.getLogger(__name__)
+
+# Written next to lines.txt: "<task_id>\t<key>" for every task that declared outputs.
+# On submission it moves to <job_name>_keys.tsv, next to the job's tasks file.
+TASK_KEYS_FILE = "keys.txt"
+
+def _cache_file() -> Path:
+    return cache_dir() / "task_cache.txt"
+
+def normalise_command(command: str) -> str:
+    """Collapses runs of whitespace, so re-indenting a command file does not change its keys."""
+    return " ".join(command.split())
+
+class TaskCache:
+    """
+    Remembers which commands finished successfully, so a command whose
+    declared outputs are up to date can be left out of the next submission.
+    A command's key is a hash of its normalised text, its declared outputs
+    and the modification time and size of each declared input. Changing the
+    command or touching an input changes the key, so the command runs again.
+    Keys of successful tasks are kept in an append-only file in the cache dir.
+    With skip=False nothing is skipped, but keys are still handed out, so
+    the next run knows which tasks finished. A command that reads the
+    declared output of a command running in this submission is never
+    skipped, so later stages rerun on new data.
+    """
+
+    def __init__(self, cwd: Path, path: Path = None, skip: bool = True):
+        self.cwd = cwd
+        self._path = path
+        self.skip = skip
+        self.skipped = 0
+        self._done: Optional[Set[str]] = None
+        # Declared outputs of the commands that will run (absolute paths)
+        self._pending: Set[Path] = set()
+
+    @property
+    def path(self) -> Path:
+        # Resolved on first use: runs without declared outputs never create the cache dir
+        if self._path is None:
+            self._path = _cache_file()
+        return self._path
+
+    @property
+    def done(self) -> Set[str]:
+        # Loaded on first use: runs without declared outputs never read the file
+        if self._done is None:
+            try:
+                self._done = set(self.path.read_text().split())
+            except FileNotFoundError:
+                self._done = set()
+        return self._done
+
+    def key(self, command: str, inputs: Iterable[str], outputs: Iterable[str]) -> Optional[str]:
+        """The cache key of a command, or None if it declares no outputs or an input is missing."""
+        outputs = sorted(outputs)
+        if not outputs:
+            return None
+        digest = hashlib.sha256(normalise_command(command).encode())
+        for name in sorted(inputs):
+            try:
+                stat = (self.cwd / name).stat()
+            except FileNotFoundError:
+                return None
+            digest.update(f"\0input\0{name}\0{stat.st_mtime_ns}\0{stat.st_size}".encode())
+        for name in outputs:
+            digest.update(f"\0output\0{name}".encode())
+        return digest.hexdigest()
+
+    def _absolute(self, name: str) -> Path:
+        return Path(os.path.normpath(self.cwd / name))
+
+    def is_up_to_date(self, key: Optional[str], inputs: Iterable[str], outputs: Iterable[str]) -> bool:
+        """
+        True if the command succeeded before with this key, all its outputs
+        still exist and none of its inputs is about to be rewritten.
+        Otherwise its outputs are noted as pending, for the commands after it.
+        """
+        outputs = list(outputs)
+        up_to_date = (
+            self.skip and key is not None
+            and not any(self._absolute(name) in self._pending for name in inputs)
+            and key in self.done
+            and all((self.cwd / name).exists() for name in outputs)
+        )
+        if not up_to_date:
+            self._pending.update(self._absolute(name) for name in outputs)
+            return False
+        self.skipped += 1
+        return True
+
+    def record(self, keys: Iterable[str]) -> int:
+        """Adds the keys of successful tasks to the cache file. Returns how many were new."""
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self.done]
+        if new_keys:
+            with open(self.path, "a") as handle:
+                handle.write("".join(f"{key}\n" for key in new_keys))
+            self.done.update(new_keys)
+        return len(new_keys)
+
+def record_finished_tasks(array_dir: Path, task_cache: TaskCache) -> int:
+    """
+    Adds every successful task of the earlier submissions in array_dir to the
+    cache, before a new submission overwrites their files. Returns the number
+    of new keys.
+    """
+    recorded = 0
+    for job_name in find_job_names(array_dir):
+        keys_file = keys_path(array_dir, job_name)
+        state = load_json(state_path(array_dir, job_name))
+        if not state or not keys_file.is_file():
+            continue
+
+        status = read_task_status(Path(state["tasks_file"]))
+        successful = []
+        with open(keys_file) as handle:
+            for line in handle:
+                task_id, _, key = line.rstrip("\n").partition("\t")
+                if task_id.isdigit() and key and status.get(int(task_id)) == 0:
+                    successful.append(key)
+        recorded += task_cache.record(successful)
+
+    if recorded:
+        logger.info(f"Recorded {recorded} finished task(s) in the task cache {task_cache.path}")
+    return recorded
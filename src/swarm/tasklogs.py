@@ -0,0 +1,144 @@
+import gzip
+import logging
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+from swarm.state import load_state
+
+logger = logging.getLogger(__name__)
+
+# A task's stdout and stderr are indexed separately
+STREAMS = ("out", "err")
+
+# Slurm's own messages (e.g. "CANCELLED ... DUE TO TIME LIMIT") go to one file per array
+SLURM_LOG = "slurm_%A.out"
+
+class LogChunk(NamedTuple):
+    """Where one task's stdout or stderr sits inside a segment (one line of a .idx file)."""
+    task_id: int
+    stream: str
+    offset: int
+    length: int
+
+class LogStore:
+    """
+    Task output kept in a few shared segment files instead of two files per
+    task. Task N captures its output in temporary files and, when it ends,
+    appends each stream as one chunk to segment N % segments under a lock,
+    recording the chunk's byte offset and length in that segment's index.
+    With `compress`, every chunk is a gzip member of its own, so a segment
+    is also an ordinary .gz file that zcat can read from start to end.
+    """
+
+    def __init__(self, directory: Path, segments: int, compress: bool = False):
+        self.directory = directory
+        self.segments = segments
+        self.compress = compress
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> Optional["LogStore"]:
+        """The log store of a submission, or None if it used per-task log files."""
+        logs = state.get("logs")
+        if not logs:
+            return None
+        return cls(Path(logs["directory"]), logs["segments"], logs.get("compress", False))
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"directory": str(self.directory), "segments": self.segments, "compress": self.compress}
+
+    @property
+    def extension(self) -> str:
+        return ".log.gz" if self.compress else ".log"
+
+    def segment_path(self, number: int) -> Path:
+        return self.directory / f"segment_{number}{self.extension}"
+
+    def index_path(self, number: int) -> Path:
+        return self.directory / f"segment_{number}.idx"
+
+    def segment_of(self, task_id: int) -> int:
+        return task_id % self.segments
+
+    def prepare(self) -> None:
+        """Creates the folder and removes the segments of an earlier submission."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for old_file in self.directory.glob("segment_*"):
+            old_file.unlink()
+
+    def shell_capture(self, command_lines: str) -> str:
+        """
+        Wraps the bash lines that run one task (and leave its exit code in
+        $RC) so the task's output ends up in its segment instead of Slurm's
+        per-task log files.
+        """
+        segment = f"{self.directory}/segment_$(( SWARM_TASK_ID % {self.segments} ))"
+        compress_line = ['        gzip -c "$CHUNK" > "$CHUNK.gz" && mv "$CHUNK.gz" "$CHUNK"'] if self.compress else []
+        return "\n".join([
+            "# Capture this task's output in temporary files (usually on the node's local disk)",
+            "TASK_LOG=$(mktemp)",
+            "{",
+            command_lines,
+            '} >"$TASK_LOG.out" 2>"$TASK_LOG.err"',
+            "RC=$?",
+            "# Append each stream to the shared segment as one chunk. The lock keeps",
+            "# concurrent tasks from interleaving, and the index records where it went.",
+            f'SEGMENT="{segment}"',
+            "for STREAM in out err; do",
+            '    CHUNK="$TASK_LOG.$STREAM"',
+            '    if [[ -s "$CHUNK" ]]; then',
+            *compress_line,
+            '        LENGTH=$(stat -c %s "$CHUNK")',
+            "        (",
+            "            flock -x 8",
+            f'            OFFSET=$(stat -c %s "$SEGMENT{self.extension}" 2>/dev/null || echo 0)',
+            f'            cat "$CHUNK" >> "$SEGMENT{self.extension}"',
+            "            printf '%s\\t%s\\t%s\\t%s\\n' \"$SWARM_TASK_ID\" \"$STREAM\" \"$OFFSET\" \"$LENGTH\" >> \"$SEGMENT.idx\"",
+            '        ) 8>>"$SEGMENT.lock"',
+            "    fi",
+            '    rm -f "$CHUNK"',
+            "done",
+            'rm -f "$TASK_LOG"',
+        ])
+
+    def find(self, task_id: int) -> Dict[str, LogChunk]:
+        """
+        The chunks of one task, by stream. Only the task's own segment index is
+        scanned, and if the task ran more than once (e.g. after a resume),
+        its most recent output wins.
+        """
+        chunks: Dict[str, LogChunk] = {}
+        try:
+            with open(self.index_path(self.segment_of(task_id))) as index:
+                for line in index:
+                    fields = line.rstrip("\n").split("\t")
+                    # Skip lines cut short by a task that was killed mid-write
+                    if len(fields) != 4 or fields[0] != str(task_id) or not fields[3].isdigit():
+                        continue
+                    chunks[fields[1]] = LogChunk(task_id, fields[1], int(fields[2]), int(fields[3]))
+        except FileNotFoundError:
+            logger.debug(f"No log index yet for task {task_id} in {self.directory}")
+        return chunks
+
+    def read(self, task_id: int, stream: str = "out") -> Optional[bytes]:
+        """One stream of a task's output, fetched with a single seek (None if it printed nothing)."""
+        chunk = self.find(task_id).get(stream)
+        if chunk is None:
+            return None
+        with open(self.segment_path(self.segment_of(task_id)), "rb") as segment:
+            segment.seek(chunk.offset)
+            data = segment.read(chunk.length)
+        return gzip.decompress(data) if self.compress else data
+
+def read_task_logs(array_dir: Path, task_id: int, job_name: str = None) -> Dict[str, Optional[bytes]]:
+    """
+    Fetches the stdout and stderr of one task of a --log-segments submission
+    (the most recent one in array_dir unless a job name is given).
+    """
+    state = load_state(array_dir, job_name)
+    store = LogStore.from_state(state)
+    if store is None:
+        raise ValueError(f"'{state['job_name']}' was submitted without --log-segments, "
+                         f"so its output is in the per-task --output_log/--error_log files.")
+    if not 1 <= task_id <= state["job_count"]:
+        raise ValueError(f"Task {task_id} is outside '{state['job_name']}' (1-{state['job_count']}).")
+    return {stream: store.read(task_id, stream) for stream in STREAMS}
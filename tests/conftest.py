@@ -0,0 +1,8 @@
+import pytest
+from pathlib import Path
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch):
+    """Keep Swarm's cache (task cache, history, local job IDs) inside each test's temporary folder."""
+    monkeypatch.setenv("SWARM_CACHE_DIR", str(tmp_path / "cache"))
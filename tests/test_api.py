@@ -0,0 +1,42 @@
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from swarm.api import Swarm
+
+
+def test_submit_generator_locally(tmp_path: Path):
+    """Commands are streamed from a generator into their own folder and run."""
+    swarm = Swarm(cwd=tmp_path, backend="local", rate_limit=2)
+    handle = swarm.submit((f"echo {i} > out_{i}.txt" for i in range(1, 4)), job_name="gen")
+
+    assert handle.task_count == 3
+    assert len(handle.job_ids) == 1
+    assert (tmp_path / "sbatch_arrays" / "gen" / "commands.txt").exists()
+    assert [(tmp_path / f"out_{i}.txt").read_text() for i in range(1, 4)] == ["1\n", "2\n", "3\n"]
+    assert handle.task_status() == {1: 0, 2: 0, 3: 0}
+
+    with pytest.raises(ValueError, match="spans several lines"):
+        swarm.submit(["echo a\necho b"], job_name="bad")
+    with pytest.raises(TypeError, match="Unknown submit option"):
+        swarm.submit(["true"], job_name="typo", mem="4G")
+    # A winning duplicate would cancel the rest of a bundle
+    with pytest.raises(ValueError, match="bundle"):
+        swarm.submit(["true"], job_name="spec", speculative=True, bundle=2)
+
+
+@patch("swarm.api.get_max_array_size", return_value=1001)
+@patch("swarm.slurm.subprocess.run")
+def test_many_submissions_share_setup(mock_run, mock_max_array_size, tmp_path: Path):
+    """One Swarm submits many arrays; scontrol is asked once and `after` chains them."""
+    mock_run.side_effect = [MagicMock(stdout="101\n"), MagicMock(stdout="102\n")]
+    swarm = Swarm(cwd=tmp_path, memory="2G")
+
+    first = swarm.submit(["echo a", "echo b"], job_name="first")
+    second = swarm.submit(["echo merge"], job_name="second", after=first, memory="16G")
+
+    assert (first.job_ids, second.job_ids) == (("101",), ("102",))
+    assert mock_max_array_size.call_count == 1
+    sbatch_command = mock_run.call_args_list[1].args[0]
+    assert "--mem=16G" in sbatch_command
+    assert "--dependency=afterok:101" in sbatch_command
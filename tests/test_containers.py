@@ -0,0 +1,60 @@
+import subprocess
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from swarm.containers import is_image_file, registry_reference, stage_image
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch):
+    """Keep staged images inside the test's temporary folder."""
+    monkeypatch.setenv("SWARM_IMAGE_CACHE", str(tmp_path / "images"))
+
+
+def fake_tools(digest="sha256:abc123"):
+    """A stand-in for skopeo and enroot: enroot 'imports' by writing the --output file."""
+    def run(command, **kwargs):
+        if command[0] == "skopeo":
+            if digest is None:
+                raise FileNotFoundError("skopeo")
+            return MagicMock(stdout=f"{digest}\n")
+        output = Path(command[command.index("--output") + 1])
+        output.write_text("squashfs")
+        return MagicMock(stdout="", stderr="")
+    return run
+
+
+def test_registry_reference():
+    assert registry_reference("ubuntu") == "docker.io/library/ubuntu:latest"
+    assert registry_reference("biocontainers/samtools:v1.9") == "docker.io/biocontainers/samtools:v1.9"
+    assert registry_reference("me@quay.io#biocontainers/samtools:1.23") == "quay.io/biocontainers/samtools:1.23"
+    assert is_image_file("/shared/images/samtools.sqsh")
+    assert not is_image_file("ubuntu:22.04")
+
+
+def test_stage_image_imports_once(tmp_path: Path):
+    with patch("swarm.containers.subprocess.run", side_effect=fake_tools()) as mock_run:
+        first = stage_image("ubuntu:22.04")
+        second = stage_image("ubuntu:22.04")
+
+    assert first == second == tmp_path / "images" / "sha256-abc123.sqsh"
+    assert first.read_text() == "squashfs"
+    enroot_calls = [call[0][0] for call in mock_run.call_args_list if call[0][0][0] == "enroot"]
+    assert len(enroot_calls) == 1
+    assert enroot_calls[0][-1] == "docker://ubuntu:22.04"
+    # No temporary files are left behind
+    assert sorted(p.name for p in (tmp_path / "images").iterdir()) == ["sha256-abc123.sqsh", "sha256-abc123.sqsh.lock"]
+
+
+def test_stage_image_without_skopeo_or_enroot(tmp_path: Path):
+    # Without skopeo the image is cached by name
+    with patch("swarm.containers.subprocess.run", side_effect=fake_tools(digest=None)):
+        path = stage_image("quay.io#biocontainers/samtools:1.23")
+    assert path.name == "quay.io_biocontainers_samtools_1.23.sqsh"
+
+    failed = subprocess.CalledProcessError(1, "enroot", stderr="401 Unauthorized")
+    with patch("swarm.containers.subprocess.run", side_effect=[MagicMock(stdout="sha256:fff\n"), failed]):
+        with pytest.raises(RuntimeError, match="401 Unauthorized"):
+            stage_image("private/image")
+    assert not list((tmp_path / "images").glob("*fff*.sqsh"))
@@ -0,0 +1,109 @@
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from swarm.history import (
+    load_history,
+    query_sacct,
+    record_previous_run,
+    record_previous_runs,
+    remember_submission,
+    suggest_resources,
+)
+from swarm.state import save_state
+
+
+def fake_previous_run(array_dir: Path, tasks: str, job_ids=("555",), job_count=3, **state):
+    tasks_file = array_dir / "align_tasks.tsv"
+    tasks_file.write_text(tasks)
+    save_state(array_dir, "align", {
+        "job_name": "align",
+        "job_count": job_count,
+        "tasks_file": str(tasks_file),
+        "job_ids": list(job_ids),
+        **state,
+    })
+
+
+def test_record_previous_run_and_suggest(tmp_path: Path):
+    fake_previous_run(tmp_path, (
+        "1\t0\t0\t600\tnode01\t1048576\n"    # 10 minutes, 1G
+        "2\t0\t0\t1200\tnode02\t2097152\n"   # 20 minutes, 2G
+        "3\t1\t0\t9999\tnode03\t9999999\n"   # failures are ignored
+    ))
+
+    assert record_previous_run(tmp_path, "align") is True
+    # The same run is never recorded twice
+    assert record_previous_run(tmp_path, "align") is False
+    assert len(load_history("align")) == 1
+
+    time_str, mem_str = suggest_resources("align")
+    # ~p99 of 20 min * 1.5 headroom, rounded up to the minute
+    assert time_str == "00:30:00"
+    # ~p99 of 2G * 1.25 headroom
+    assert mem_str == "2548M"
+
+    # Bundles of 4 commands, 2 at a time: two rounds, two commands in memory at once
+    time_str, mem_str = suggest_resources("align", serial_tasks=2, parallel_tasks=2)
+    assert time_str == "01:00:00"
+    assert mem_str == "5095M"
+
+    assert suggest_resources("never_ran") == (None, None)
+
+
+def test_record_previous_run_uses_sacct_for_memory(tmp_path: Path):
+    """Without GNU time on the nodes, peak memory comes from sacct."""
+    fake_previous_run(tmp_path, "1\t0\t0\t60\tnode01\t\n2\t0\t0\t60\tnode01\t\n")
+
+    with patch("swarm.history.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout=(
+            "555_1|COMPLETED|60|\n"
+            "555_1.batch|COMPLETED|60|3145728K\n"
+            "555_2|COMPLETED|60|\n"
+            "555_2.batch|COMPLETED|60|1G\n"
+            "555_3|FAILED|5|\n"
+        ))
+        assert record_previous_run(tmp_path, "align", use_sacct=True) is True
+
+    assert "555" in mock_run.call_args[0][0]
+    assert load_history("align")[0]["peak_rss_kb"] > 3 * 1024 * 1024 * 0.98
+    # Short tasks still get a sensible minimum time
+    assert suggest_resources("align")[0] == "00:05:00"
+
+
+def test_runs_are_found_by_job_name(tmp_path: Path):
+    """A pipeline run from another directory still learns from the earlier runs of its job name."""
+    first, second, elsewhere = (tmp_path / name for name in ("first", "second", "elsewhere"))
+    for folder in (first, second, elsewhere):
+        folder.mkdir()
+    fake_previous_run(first, "1\t0\t0\t600\tnode01\t1048576\n", job_ids=["101"], job_count=1)
+    fake_previous_run(second, "1\t0\t0\t60\tnode01\t1048576\n", job_ids=["102"], job_count=2)
+    remember_submission(first, "align")
+    remember_submission(second, "align")
+
+    # "second" has not finished yet: it is left for a later run
+    assert record_previous_runs("align", elsewhere) == 1
+    assert [run["job_ids"] for run in load_history("align")] == [["101"]]
+
+    (second / "align_tasks.tsv").write_text("1\t0\t0\t60\tnode01\t1048576\n2\t0\t0\t60\tnode01\t1048576\n")
+    assert record_previous_runs("align", elsewhere) == 1
+    assert record_previous_runs("align", elsewhere) == 0
+    assert len(load_history("align")) == 2
+
+
+def test_sacct_figures_are_per_command(tmp_path: Path):
+    """sacct reports whole bundles: 4 commands, 2 at a time, took two rounds and held two in memory."""
+    fake_previous_run(tmp_path, "1\t0\n2\t0\n3\t0\n4\t0\n", job_count=4, bundle=4, parallel_tasks=2)
+    with patch("swarm.history.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="555_1|COMPLETED|1200|\n555_1.batch|COMPLETED|1200|2G\n")
+        assert record_previous_run(tmp_path, "align", use_sacct=True) is True
+
+    run = load_history("align")[0]
+    assert run["runtime"] == 600
+    assert run["peak_rss_kb"] == 1024 * 1024
+    # Scaled back up for the same bundling, not twice over
+    assert suggest_resources("align", serial_tasks=2, parallel_tasks=2) == ("00:30:00", "2560M")
+
+
+def test_query_sacct_without_slurm():
+    with patch("swarm.history.subprocess.run", side_effect=FileNotFoundError("sacct")):
+        assert query_sacct(["1"]) == ([], [])
@@ -0,0 +1,85 @@
+from pathlib import Path
+from typer.testing import CliRunner
+
+from swarm.local import _allocate_job_ids, expand_log_pattern, parse_array_spec
+from swarm.main import app
+from swarm.parser import create_job_scripts
+from swarm.slurm import submit_job_array
+
+
+def test_parse_array_spec():
+    assert parse_array_spec("1-5") == ([1, 2, 3, 4, 5], 0)
+    assert parse_array_spec("3,17-19,40%2") == ([3, 17, 18, 19, 40], 2)
+    assert parse_array_spec("1-7:3") == ([1, 4, 7], 0)
+
+
+def test_expand_log_pattern():
+    assert expand_log_pattern("logs/%A_%a.log", "77", 3, "job") == "logs/77_3.log"
+    assert expand_log_pattern("%x-%j.err", "77", 3, "job", "79") == "job-79.err"
+    assert expand_log_pattern("100%%_%a", "77", 3, "job") == "100%_3"
+
+
+def test_local_job_ids_are_unique(tmp_path: Path, monkeypatch):
+    """Arrays get numeric IDs with room for one ID per task, never shared between runs."""
+    monkeypatch.setenv("SWARM_CACHE_DIR", str(tmp_path))
+    first = _allocate_job_ids(5)
+    second = _allocate_job_ids(1)
+    assert second == first + 5
+    # The counter lives on disk, so another swarm process carries on from it
+    assert (tmp_path / "local_job_ids.txt").read_text() == f"{second}\n"
+
+
+def test_local_backend_runs_array(tmp_path: Path):
+    """The local backend runs every task with Slurm's environment and log names."""
+    commands = tmp_path / "commands.sh"
+    commands.write_text("".join(f"echo \"task $SLURM_ARRAY_TASK_ID\"; exit {i % 2}\n" for i in range(1, 6)))
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    job_scripts = create_job_scripts(commands, array_dir)
+
+    job_ids = submit_job_array(
+        job_scripts=job_scripts,
+        output_log="%x_%A_%a.log",
+        error_log="%x_%A_%a.err",
+        job_name="local_job",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=1,
+        memory="4G",
+        cwd=tmp_path,
+        rate_limit=2,
+        backend="local",
+        dry_run=False
+    )
+
+    job_id = job_ids[0]
+    for task_id in range(1, 6):
+        assert (tmp_path / f"local_job_{job_id}_{task_id}.log").read_text() == f"task {task_id}\n"
+        assert (tmp_path / f"local_job_{job_id}_{task_id}.err").exists()
+
+    # Tasks report back exactly like they do on the cluster
+    tasks = (array_dir / "local_job_tasks.tsv").read_text().splitlines()
+    exit_codes = {line.split("\t")[0]: line.split("\t")[1] for line in tasks}
+    assert exit_codes == {"1": "1", "2": "0", "3": "1", "4": "0", "5": "1"}
+
+
+def test_local_stages_honour_dependencies(tmp_path: Path):
+    """Task N of a stage only runs if task N of the stage before it succeeded."""
+    commands = tmp_path / "pipeline.sh"
+    commands.write_text(
+        "#SWARM stage first\n"
+        "true\n"
+        "false\n"
+        "#SWARM stage second\n"
+        "echo $SLURM_JOB_ID > second_1.txt\n"
+        "echo $SLURM_JOB_ID > second_2.txt\n"
+    )
+    result = CliRunner().invoke(app, ["--file", str(commands), "-J", "pipe", "--backend", "local"])
+
+    assert result.exit_code == 0
+    assert "1 task(s) did not run because their --dependency failed" in result.stdout
+    assert not (tmp_path / "second_2.txt").exists()
+    # Every task has its own numeric job ID, as on Slurm
+    assert (tmp_path / "second_1.txt").read_text().strip().isdigit()
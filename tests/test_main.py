@@ -1,3 +1,4 @@
+import json
 import pytest
 from pathlib import Path
 from typer.testing import CliRunner
@@ -63,12 +64,165 @@ def test_main_with_modules(mock_submit, mock_verify, mock_bash_file): # <--- NEW
     assert result.exit_code == 0
     mock_verify.assert_called_once_with("python")
 
-def test_main_missing_file():
+def test_main_missing_file(tmp_path: Path, monkeypatch):
     """Test how the CLI handles a user providing a file that doesn't exist."""
+    monkeypatch.chdir(tmp_path)
     
     result = runner.invoke(app, ["--file", "this_file_is_fake.sh"])
     
     # The exit code should NOT be 0 (0 means success)
     assert result.exit_code != 0
     assert isinstance(result.exception, FileNotFoundError)
+    # Nothing is created for a file that isn't there
+    assert not (tmp_path / "sbatch_arrays").exists()
     
+
+@patch("swarm.main.submit_job_array")
+def test_main_reads_stdin(mock_submit, tmp_path: Path):
+    """Passing '-' as the file streams the commands from stdin."""
+    result = runner.invoke(
+        app,
+        ["--file", "-", "--chdir", str(tmp_path), "--dry-run"],
+        input="echo 'Task 1'\necho 'Task 2'\n"
+    )
+
+    assert result.exit_code == 0
+    assert "Successfully split into 2 array tasks." in result.stdout
+    _, kwargs = mock_submit.call_args
+    assert kwargs["cwd"] == tmp_path.resolve()
+
+@patch("swarm.main.resume_job_array")
+def test_main_resume(mock_resume, tmp_path: Path):
+    """`swarm resume` works without --file and passes the array_dir down."""
+    result = runner.invoke(app, ["resume", str(tmp_path), "-J", "my_job", "--dry-run"])
+
+    assert result.exit_code == 0
+    mock_resume.assert_called_once_with(tmp_path.resolve(), job_name="my_job", dry_run=True)
+
+@patch("swarm.main.suggest_resources", return_value=("00:30:00", "2G"))
+@patch("swarm.main.submit_job_array")
+def test_main_auto_resources(mock_submit, mock_suggest, mock_bash_file):
+    """--auto-resources replaces defaults but never values the user typed."""
+    result = runner.invoke(app, ["--file", str(mock_bash_file), "--auto-resources", "--mem", "4G", "--dry-run"])
+
+    assert result.exit_code == 0
+    _, kwargs = mock_submit.call_args
+    assert kwargs["time"] == "00:30:00"
+    assert kwargs["memory"] == "4G"
+
+@patch("swarm.main.remember_submission")
+@patch("swarm.main.record_previous_runs")
+@patch("swarm.main.submit_job_array", return_value=["101"])
+def test_main_history_is_opt_in(mock_submit, mock_record, mock_remember, mock_bash_file):
+    """Runs are only added to the history store with --auto-resources."""
+    result = runner.invoke(app, ["--file", str(mock_bash_file)])
+    assert result.exit_code == 0
+    mock_record.assert_not_called()
+    mock_remember.assert_not_called()
+
+def test_main_local_backend(tmp_path: Path):
+    """End to end: the local backend runs the commands without any Slurm."""
+    commands = tmp_path / "commands.sh"
+    commands.write_text("echo one > one.txt\necho two > two.txt\n")
+
+    result = runner.invoke(app, ["--file", str(commands), "--backend", "local", "--manifest", "--bundle", "2"])
+
+    assert result.exit_code == 0
+    assert "1 of 1 task(s) succeeded" in result.stdout
+    assert (tmp_path / "one.txt").read_text() == "one\n"
+    assert (tmp_path / "two.txt").read_text() == "two\n"
+
+@patch("swarm.main.submit_job_array", side_effect=[["101"], ["102"]])
+def test_main_stages(mock_submit, tmp_path: Path):
+    """Each stage becomes its own array, linked to the previous one with aftercorr."""
+    commands = tmp_path / "pipeline.sh"
+    commands.write_text("#SWARM stage align\necho a1\necho a2\n#SWARM stage sort\necho s1\necho s2\n")
+
+    result = runner.invoke(app, ["--file", str(commands), "-J", "pipe", "--max_array_size", "1001"])
+
+    assert result.exit_code == 0
+    first, second = (call.kwargs for call in mock_submit.call_args_list)
+    assert (first["job_name"], first["dependencies"]) == ("pipe_align", None)
+    assert (second["job_name"], second["dependencies"]) == ("pipe_sort", ["aftercorr:101"])
+
+@patch("swarm.main.submit_job_array")
+def test_main_resource_directives(mock_submit, tmp_path: Path):
+    """Directives override --mem/--time/--cpus for their own array only."""
+    commands = tmp_path / "commands.sh"
+    commands.write_text("echo small\n#SWARM --mem 64G -c 8\necho big\n")
+
+    result = runner.invoke(app, ["--file", str(commands), "-J", "mixed", "--mem", "2G", "--dry-run"])
+
+    assert result.exit_code == 0
+    calls = [call.kwargs for call in mock_submit.call_args_list]
+    assert [(c["job_name"], c["memory"], c["cpus"]) for c in calls] == [
+        ("mixed", "2G", 4), ("mixed_cpus8_memory64G", "64G", 8)
+    ]
+
+@patch("swarm.main.submit_job_array")
+def test_main_event_log_and_profile(mock_submit, mock_bash_file):
+    """Events go to <array_dir>/swarm_events.jsonl; --profile prints the phase timings."""
+    result = runner.invoke(app, ["--file", str(mock_bash_file), "--profile", "--log-level", "debug", "--dry-run"])
+
+    assert result.exit_code == 0
+    assert "Profile (wall time per phase):" in result.stdout
+    assert "parse" in result.stdout
+
+    events_file = mock_bash_file.parent / "sbatch_arrays" / "swarm_events.jsonl"
+    events = [json.loads(line) for line in events_file.read_text().splitlines()]
+    # Records logged before the array_dir was known are kept, too
+    assert events[0]["message"] == "--- Swarm execution started ---"
+    assert {"phase", "seconds"} <= set(events[-1])
+    assert len({event["run"] for event in events}) == 1
+
+def test_main_logs(tmp_path: Path):
+    """End to end: --log-segments collects the output that `swarm logs` shows."""
+    commands = tmp_path / "commands.sh"
+    commands.write_text("echo first\necho second; echo oops >&2\n")
+
+    result = runner.invoke(app, ["--file", str(commands), "--backend", "local", "--log-segments", "2", "--compress-logs"])
+    assert result.exit_code == 0
+
+    result = runner.invoke(app, ["logs", str(tmp_path / "sbatch_arrays"), "2"])
+    assert result.exit_code == 0
+    assert "second" in result.stdout and "oops" in result.output
+
+    result = runner.invoke(app, ["logs", str(tmp_path / "sbatch_arrays"), "1", "--stream", "err"])
+    assert "No output recorded for task 1" in result.output
+
+@patch("swarm.monitor.subprocess.run")
+def test_main_status(mock_run, tmp_path: Path):
+    """`swarm status` shows per-state counts from one sacct call."""
+    (tmp_path / "job_tasks.tsv").write_text("1\t0\n")
+    (tmp_path / "job_state.json").write_text(json.dumps({
+        "job_name": "job", "job_count": 3, "backend": "slurm", "job_ids": ["101"],
+        "tasks_file": str(tmp_path / "job_tasks.tsv")
+    }))
+    mock_run.return_value.stdout = "101_1|COMPLETED\n101_2|RUNNING\n101_3|PENDING\n"
+
+    result = runner.invoke(app, ["status", str(tmp_path)])
+
+    assert result.exit_code == 0
+    assert mock_run.call_count == 1
+    assert "job (3 commands): 1 succeeded, 0 failed, 2 not reported" in result.stdout
+    assert "job 101: COMPLETED 1, PENDING 1, RUNNING 1" in result.stdout
+
+def test_dry_run_leaves_resume_alone(tmp_path: Path):
+    """A dry run under the same -J must not change what `swarm resume` reruns."""
+    real = tmp_path / "real.sh"
+    real.write_text("echo real1\nexit 1\n")
+    other = tmp_path / "other.sh"
+    other.write_text("echo other1\necho other2\n")
+
+    result = runner.invoke(app, ["--file", str(real), "-J", "j", "--backend", "local"])
+    assert result.exit_code == 0
+    result = runner.invoke(app, ["--file", str(other), "-J", "j", "--backend", "local", "--log-segments", "2", "--dry-run"])
+    assert result.exit_code == 0
+    assert "dry_run" in result.stdout
+
+    array_dir = tmp_path / "sbatch_arrays"
+    result = runner.invoke(app, ["resume", str(array_dir), "-J", "j"])
+    assert result.exit_code == 0
+    # Task 2 is still the original `exit 1`, and still fails
+    assert (array_dir / "j_tasks.tsv").read_text().splitlines()[-1].split("\t")[:2] == ["2", "1"]
+    assert not (array_dir / "j_logs").exists()
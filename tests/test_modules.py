@@ -0,0 +1,63 @@
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+from swarm.modules import MARKER, check_modules, verify_modules_cached
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch):
+    """Keep the module cache inside the test's temporary folder."""
+    monkeypatch.setenv("SWARM_CACHE_DIR", str(tmp_path / "cache"))
+    modulefiles = tmp_path / "modulefiles"
+    modulefiles.mkdir()
+    monkeypatch.setenv("MODULEPATH", str(modulefiles))
+
+
+def fake_login_shell(*results):
+    """Builds the stdout our batched check script would print."""
+    lines = ["Welcome to the cluster!"]  # login banners must be ignored
+    for mod, rc, message in results:
+        lines.append(f"{MARKER}\t{mod}\t{rc}")
+        lines.append(message)
+    return MagicMock(stdout="\n".join(lines) + "\n", stderr="")
+
+
+@patch("swarm.modules.subprocess.run")
+def test_check_modules_single_shell(mock_run):
+    mock_run.return_value = fake_login_shell(
+        ("python", 0, ""),
+        ("fake_mod", 1, "Lmod has detected the following error:\nfake_mod not found"),
+    )
+
+    results = check_modules(["python", "fake_mod"])
+
+    # Both modules were checked by ONE login shell
+    mock_run.assert_called_once()
+    args, _ = mock_run.call_args
+    assert args[0][:2] == ["bash", "-l"]
+    assert args[0][-2:] == ["python", "fake_mod"]
+
+    assert results["python"] == (True, "")
+    assert results["fake_mod"][0] is False
+    assert "fake_mod not found" in results["fake_mod"][1]
+
+
+@patch("swarm.modules.subprocess.run")
+def test_verify_modules_cached(mock_run):
+    mock_run.return_value = fake_login_shell(("python", 0, ""), ("gcc", 0, ""))
+    assert verify_modules_cached(["python", "gcc"]) == {}
+
+    # The second run is answered entirely from the cache
+    assert verify_modules_cached(["gcc", "python"]) == {}
+    mock_run.assert_called_once()
+
+    # A new module only checks the new one
+    mock_run.return_value = fake_login_shell(("samtools", 1, "not found"))
+    assert verify_modules_cached(["python", "samtools"]) == {"samtools": "not found"}
+    assert mock_run.call_args[0][0][-1] == "samtools"
+
+    # An expired cache entry is checked again
+    mock_run.return_value = fake_login_shell(("python", 0, ""))
+    verify_modules_cached(["python"], ttl=-1)
+    assert mock_run.call_count == 3
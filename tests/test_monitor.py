@@ -0,0 +1,111 @@
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from swarm.monitor import ArrayMonitor, parse_sacct
+from swarm.slurm import resume_job_array
+from swarm.state import save_state
+
+
+def test_parse_sacct():
+    output = "101_1|COMPLETED\n101_2|FAILED\n101_[3-10%2]|PENDING\n102_4|CANCELLED by 0\n"
+    assert parse_sacct(output) == {
+        "101": {"COMPLETED": 1, "FAILED": 1, "PENDING": 8},
+        "102": {"CANCELLED": 1},
+    }
+
+
+class FakeSlurm:
+    """Stands in for sacct, the clock and sleep: time only moves when someone sleeps."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+        self.now = 1000.0
+        self.sleeps = []
+
+    def sacct(self, arguments):
+        self.calls.append(arguments)
+        return self.answers[min(len(self.calls), len(self.answers)) - 1]
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_wait_batches_caches_and_backs_off(tmp_path: Path):
+    tasks_file = tmp_path / "job_tasks.tsv"
+    tasks_file.write_text("1\t0\n2\t0\n")
+    save_state(tmp_path, "job", {"job_name": "job", "job_count": 2, "backend": "slurm",
+                                 "job_ids": ["101", "102"], "tasks_file": str(tasks_file)})
+    slurm = FakeSlurm([
+        "101_1|RUNNING\n102_1|PENDING\n",
+        "101_1|RUNNING\n102_1|PENDING\n",
+        "101_1|RUNNING\n102_1|RUNNING\n",
+        "101_1|COMPLETED\n102_1|COMPLETED\n",
+    ])
+    monitor = ArrayMonitor(tmp_path, runner=slurm.sacct, clock=lambda: slurm.now, min_interval=10)
+
+    # Both jobs in one query, and a second look within the interval is served from the cache
+    monitor.poll()
+    monitor.poll()
+    assert len(slurm.calls) == 1
+    assert "--jobs" in slurm.calls[0] and "101,102" in slurm.calls[0]
+
+    jobs = monitor.wait(sleep=slurm.sleep)
+    assert jobs == {"101": {"COMPLETED": 1}, "102": {"COMPLETED": 1}}
+    # Unchanged answers stretch the interval, a change resets it
+    assert slurm.sleeps == [10, 15.0, 10]
+    assert monitor.succeeded()
+    assert "job 101: COMPLETED 1" in monitor.summary(jobs)
+
+    # Finished jobs are never queried again
+    slurm.now += 3600
+    monitor.poll()
+    assert len(slurm.calls) == 4
+
+
+def test_wait_succeeds_after_resume(tmp_path: Path):
+    """Task 2 failed in job 101 and succeeded after `swarm resume` (job 102): its latest attempt decides."""
+    tasks_file = tmp_path / "job_tasks.tsv"
+    tasks_file.write_text("1\t0\n2\t3\n3\t0\n")
+    save_state(tmp_path, "job", {
+        "job_name": "job", "job_count": 3, "bundle": 1, "pack": 0, "backend": "slurm", "rate_limit": None,
+        "sbatch_command": ["sbatch", "--job-name=job"],
+        "arrays": [{"offset": 0, "size": 3, "master_script": "job_master.sh"}],
+        "job_ids": ["101"], "tasks_file": str(tasks_file),
+    })
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="102\n")
+        assert resume_job_array(tmp_path) == ["102"]
+    with open(tasks_file, "a") as handle:
+        handle.write("2\t0\n")
+
+    slurm = FakeSlurm(["101_1|COMPLETED\n101_2|FAILED\n101_3|COMPLETED\n102_2|COMPLETED\n"])
+    monitor = ArrayMonitor(tmp_path, runner=slurm.sacct, clock=lambda: slurm.now)
+    jobs = monitor.wait(sleep=slurm.sleep)
+    assert set(jobs) == {"101", "102"}
+    assert monitor.succeeded()
+
+
+def test_cache_only_covers_jobs_it_asked_about(tmp_path: Path):
+    """`swarm status -J one` must not answer for -J two, nor for a job `swarm resume` just added."""
+    for name, job_id in [("one", "201"), ("two", "202")]:
+        save_state(tmp_path, name, {"job_name": name, "job_count": 1, "backend": "slurm",
+                                    "job_ids": [job_id], "tasks_file": str(tmp_path / f"{name}_tasks.tsv")})
+    slurm = FakeSlurm(["201_1|RUNNING\n", "202_1|PENDING\n", "201_1|RUNNING\n203_1|PENDING\n"])
+    clock = lambda: slurm.now
+
+    ArrayMonitor(tmp_path, ["one"], runner=slurm.sacct, clock=clock, min_interval=10).poll()
+    jobs = ArrayMonitor(tmp_path, ["two"], runner=slurm.sacct, clock=clock, min_interval=10).poll()
+    assert jobs["202"] == {"PENDING": 1}
+    assert [call[1] for call in slurm.calls] == ["201", "202"]
+
+    save_state(tmp_path, "one", {"job_name": "one", "job_count": 1, "backend": "slurm",
+                                 "job_ids": ["201", "203"], "tasks_file": str(tmp_path / "one_tasks.tsv")})
+    jobs = ArrayMonitor(tmp_path, ["one"], runner=slurm.sacct, clock=clock, min_interval=10).poll()
+    assert jobs["203"] == {"PENDING": 1}
+    assert slurm.calls[-1][1] == "201,203"
+
+    # Both jobs were just asked about, so the cache answers
+    ArrayMonitor(tmp_path, runner=slurm.sacct, clock=clock, min_interval=10).poll()
+    assert len(slurm.calls) == 3
@@ -1,5 +1,8 @@
 from pathlib import Path
-from swarm.parser import create_job_scripts
+import gzip
+import pytest
+from swarm.parser import create_job_scripts, create_stages, create_task_manifest, parse_annotated_commands, parse_commands
+from swarm.manifest import TaskManifest
 
 def test_create_job_scripts(tmp_path: Path):
     # tmp_path is a built-in pytest fixture. 
@@ -47,4 +50,138 @@ def test_create_job_scripts_with_modules(tmp_path: Path): # <--- NEW
     content = job_scripts[0].read_text()
     
     # Verify module load is prepended correctly
-    assert "module load python/3.9 gcc && ls -l" in content
\ No newline at end of file
+    assert "module load python/3.9 gcc && ls -l" in content
+
+def test_create_task_manifest(tmp_path: Path):
+    mock_bash = tmp_path / "test_input.sh"
+    mock_bash.write_text("""
+# This is a comment
+ls -l
+
+echo 'hello' \\
+  'world'
+echo 'third'
+""")
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+
+    manifest = create_task_manifest(mock_bash, array_dir, modules=["gcc"])
+
+    # Only the manifest and its index are written, never job_N.sh files
+    assert len(manifest) == 3
+    assert sorted(p.name for p in array_dir.iterdir()) == ["commands.idx", "commands.txt"]
+
+    # Tasks can be read back in any order by seeking through the index
+    assert manifest.read_command(3) == "module load gcc && echo 'third'"
+    assert manifest.read_command(2) == "module load gcc && echo 'hello' 'world'"
+    assert TaskManifest.open(array_dir).read_command(1) == "module load gcc && ls -l"
+
+
+def test_parse_commands_streams_lazily():
+    """Commands are yielded as soon as they are complete, before the input ends."""
+    def endless_lines():
+        yield "ls -l"
+        yield "echo 'a' \\"
+        yield "  'b'"
+        raise AssertionError("The parser read further than it needed to!")
+
+    commands = parse_commands(endless_lines())
+    assert next(commands) == "ls -l"
+    assert next(commands) == "echo 'a' 'b'"
+
+
+def test_create_job_scripts_from_gzip(tmp_path: Path):
+    mock_bash = tmp_path / "test_input.sh.gz"
+    with gzip.open(mock_bash, "wt") as handle:
+        handle.write("# comment\nls -l\necho 'hello' \\\n  'world'\n")
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+
+    job_scripts = create_job_scripts(mock_bash, array_dir)
+
+    assert len(job_scripts) == 2
+    assert job_scripts[-1].name == "job_2.sh"
+    assert "echo 'hello' 'world'" in job_scripts[1].read_text()
+
+
+def test_create_stages(tmp_path: Path):
+    """'#SWARM stage' markers split the file into one folder of tasks per stage."""
+    mock_bash = tmp_path / "pipeline.sh"
+    mock_bash.write_text(
+        "#SWARM stage align\n"
+        "bwa mem ref.fa s1.fq > s1.sam\n"
+        "bwa mem ref.fa s2.fq > s2.sam\n"
+        "\n"
+        "#SWARM stage sort\n"
+        "samtools sort s1.sam \\\n"
+        "  -o s1.bam\n"
+        "samtools sort s2.sam -o s2.bam\n"
+    )
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+
+    groups = create_stages(mock_bash, array_dir, manifest=True)
+
+    assert [(group.stage, len(group.tasks)) for group in groups] == [("align", 2), ("sort", 2)]
+    assert groups[1].tasks.read_command(1) == "samtools sort s1.sam -o s1.bam"
+    assert (array_dir / "stage_align" / "commands.txt").exists()
+
+    commands = list(parse_annotated_commands(mock_bash.read_text().splitlines()))
+    assert [(c.line, c.stage) for c in commands] == [(2, "align"), (3, "align"), (6, "sort"), (8, "sort")]
+
+
+def test_create_stages_rejects_commands_before_first_marker(tmp_path: Path):
+    mock_bash = tmp_path / "pipeline.sh"
+    mock_bash.write_text("echo setup\n#SWARM stage align\necho align\n")
+    with pytest.raises(ValueError, match="before the first"):
+        create_stages(mock_bash, tmp_path)
+
+
+def test_resource_directives_group_commands(tmp_path: Path):
+    """'#SWARM --mem ...' applies to the next command only; each shape gets its own folder."""
+    mock_bash = tmp_path / "commands.sh"
+    mock_bash.write_text(
+        "echo small 1\n"
+        "#SWARM --mem 64G -t 2:00:00\n"
+        "echo big 1\n"
+        "echo small 2\n"
+        "#SWARM --mem=64G --time 2:00:00\n"
+        "echo big 2\n"
+        "#SWARM -c 8\n"
+        "echo wide\n"
+    )
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+
+    groups = create_stages(mock_bash, array_dir)
+
+    assert [(g.resources.label, len(g.tasks)) for g in groups] == [
+        ("", 2), ("memory64G_time2-00-00", 2), ("cpus8", 1)
+    ]
+    assert groups[1].resources.memory == "64G"
+    assert groups[2].resources.cpus == 8
+    assert groups[1].tasks[1].read_text() == "echo big 2\n"
+    # lines.txt maps task N of a group back to its line in the command file
+    assert (array_dir / "lines.txt").read_text() == "1\n4\n"
+    assert (array_dir / "resources_memory64G_time2-00-00" / "lines.txt").read_text() == "3\n6\n"
+
+    mock_bash.write_text("#SWARM --gres gpu:1\necho gpu\n")
+    with pytest.raises(ValueError, match="unknown option '--gres'"):
+        create_stages(mock_bash, array_dir)
+
+def test_file_directives():
+    """'#SWARM --inputs/--outputs' declare the next command's files, in either option form."""
+    commands = list(parse_annotated_commands([
+        "#SWARM --inputs a.fq,b.fq --outputs=a.bam\n",
+        "#SWARM --outputs a.bam.bai --mem 8G\n",
+        "align a.fq b.fq > a.bam\n",
+        "echo undeclared\n",
+    ]))
+
+    assert commands[0].inputs == ("a.fq", "b.fq")
+    assert commands[0].outputs == ("a.bam", "a.bam.bai")
+    assert commands[0].resources.memory == "8G"
+    assert commands[1].inputs == () and commands[1].outputs == ()
+
+    with pytest.raises(ValueError, match="missing file list"):
+        list(parse_annotated_commands(["#SWARM --outputs\n", "true\n"]))
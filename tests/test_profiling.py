@@ -0,0 +1,31 @@
+import time
+
+from swarm.profiling import Profiler
+
+
+def test_profiler_counts_nested_time_once():
+    profiler = Profiler()
+    profiler.reset(enabled=True)
+
+    def slow_items():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    with profiler.phase("write tasks"):
+        for _ in profiler.timed_iter("parse", slow_items()):
+            time.sleep(0.01)
+
+    # Parsing happened inside "write tasks", but is only counted as "parse"
+    assert 0.025 < profiler.totals["parse"] < 0.1
+    assert 0.025 < profiler.totals["write tasks"] < 0.1
+    assert "parse" in profiler.report()
+
+
+def test_profiler_disabled_is_transparent():
+    profiler = Profiler()
+    items = [1, 2, 3]
+    assert profiler.timed_iter("parse", items) is items
+    with profiler.phase("anything"):
+        pass
+    assert profiler.totals == {}
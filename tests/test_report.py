@@ -0,0 +1,43 @@
+from pathlib import Path
+from swarm.report import build_report, format_duration, format_memory, percentile, report_job_array
+from swarm.state import TaskRecord, save_state
+
+
+def test_percentile_and_formatting():
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile([10, 20], 90) == 19
+    assert format_duration(3725) == "01:02:05"
+    assert format_duration(90000) == "1-01:00:00"
+    assert format_memory(512 * 1024) == "512M"
+    assert format_memory(3 * 1024 * 1024 / 2) == "1.5G"
+
+
+def test_report_job_array(tmp_path: Path):
+    tasks_file = tmp_path / "my_job_tasks.tsv"
+    tasks_file.write_text(
+        "1\t0\t100.0\t110.0\tnode01\t204800\n"
+        "2\t0\t100.0\t400.0\tnode02\t409600\n"
+        "3\t137\t100.0\t105.0\tnode03\t\n"
+        "4\t1\t100.0\t101.0\tnode01\t\n"
+        "5\t1\t100.0\t102.0\tnode01\t\n"
+    )
+    save_state(tmp_path, "my_job", {"job_name": "my_job", "job_count": 6, "tasks_file": str(tasks_file)})
+
+    report = report_job_array(tmp_path, top=2)
+
+    assert "Succeeded: 2   Failed: 3" in report
+    assert "Not reported (running, pending or killed): 1" in report
+    assert "peak memory" in report
+    # Task 2 is the slowest at 5 minutes
+    slowest = report.split("Slowest 2 task(s):")[1].splitlines()
+    assert slowest[2].split() == ["2", "00:05:00", "0", "node02"]
+    # Exit code 1 is the most common failure
+    failures = report.split("Failures by exit code:")[1].splitlines()
+    assert failures[1].split()[0] == "1" and failures[1].endswith(" 2")
+
+
+def test_build_report_without_measurements():
+    """Tasks without timings (e.g. old tasks files) still get counted."""
+    report = build_report(2, {1: TaskRecord(1, 0)}, "old_job")
+    assert "Succeeded: 1" in report
+    assert "Slowest" not in report
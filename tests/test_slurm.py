@@ -1,7 +1,20 @@
+import os
+import subprocess
 import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
-from swarm.slurm import submit_job_array
+from swarm.manifest import ManifestWriter
+from swarm.state import load_state
+from swarm.slurm import (
+    DEFAULT_MAX_ARRAY_SIZE,
+    _run_sbatch,
+    compress_ranges,
+    get_max_array_size,
+    resume_job_array,
+    stage_dependencies,
+    submit_all,
+    submit_job_array,
+)
 
 def test_submit_job_array_dry_run(tmp_path: Path, capsys):
     """
@@ -114,4 +127,390 @@ def test_submit_job_array_live_run(mock_run, tmp_path: Path):
     # Verify the core list structure is intact
     assert command_list[0] == "sbatch"
     assert "--job-name=live_test" in command_list
-    assert kwargs["capture_output"] is True
\ No newline at end of file
+    assert kwargs["capture_output"] is True
+
+def test_submit_job_array_manifest_master_script(tmp_path: Path):
+    """The manifest master script should seek to (and run) only its own task."""
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+
+    writer = ManifestWriter(array_dir)
+    for i in range(1, 12):
+        writer.write(f"echo 'task {i}'")
+    manifest = writer.close()
+
+    submit_job_array(
+        job_scripts=manifest,
+        output_log="out.log",
+        error_log="err.log",
+        job_name="manifest_job",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=1,
+        memory="4G",
+        cwd=tmp_path,
+        rate_limit=None,
+        dry_run=True
+    )
+
+    master_script = array_dir / "manifest_job_master.sh"
+    assert "--array=1-11" in (array_dir / "manifest_job_command.txt").read_text()
+
+    # Run the master script exactly like a Slurm array task would
+    result = subprocess.run(
+        ["bash", str(master_script)],
+        env={**os.environ, "SLURM_ARRAY_TASK_ID": "10"},
+        capture_output=True,
+        text=True
+    )
+    assert result.stdout == "task 10\n"
+
+
+def test_submit_job_array_bundled(tmp_path: Path):
+    """Bundling packs several commands into each array task."""
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+
+    writer = ManifestWriter(array_dir)
+    for i in range(1, 8):
+        writer.write(f"echo \"task $SWARM_TASK_ID\"")
+    manifest = writer.close()
+
+    submit_job_array(
+        job_scripts=manifest,
+        output_log="out.log",
+        error_log="err.log",
+        job_name="bundled_job",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=2,
+        memory="4G",
+        cwd=tmp_path,
+        rate_limit=None,
+        bundle=3,
+        serial=True,
+        dry_run=True
+    )
+
+    # 7 commands in bundles of 3 -> 3 array tasks
+    assert "--array=1-3" in (array_dir / "bundled_job_command.txt").read_text()
+
+    # The last bundle only holds task 7
+    master_script = array_dir / "bundled_job_master.sh"
+    result = subprocess.run(
+        ["bash", str(master_script)],
+        env={**os.environ, "SLURM_ARRAY_TASK_ID": "2"},
+        capture_output=True,
+        text=True
+    )
+    assert result.stdout == "task 4\ntask 5\ntask 6\n"
+
+    result = subprocess.run(
+        ["bash", str(master_script)],
+        env={**os.environ, "SLURM_ARRAY_TASK_ID": "3"},
+        capture_output=True,
+        text=True
+    )
+    assert result.stdout == "task 7\n"
+
+
+@patch("swarm.slurm.subprocess.run")
+def test_get_max_array_size(mock_run):
+    mock_result = MagicMock()
+    mock_result.stdout = "MaxArraySize            = 10001\nMaxJobCount = 10000\n"
+    mock_run.return_value = mock_result
+
+    assert get_max_array_size() == 10001
+    assert mock_run.call_args[0][0] == ["scontrol", "show", "config"]
+
+    # Without scontrol we fall back to Slurm's default
+    mock_run.side_effect = FileNotFoundError("scontrol")
+    assert get_max_array_size() == DEFAULT_MAX_ARRAY_SIZE
+
+
+def test_submit_job_array_split(tmp_path: Path):
+    """Arrays over MaxArraySize are split, with offsets baked into each master script."""
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    writer = ManifestWriter(array_dir)
+    for i in range(1, 26):
+        writer.write(f"echo \"task $SWARM_TASK_ID\"")
+    manifest = writer.close()
+
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.side_effect = [
+            MagicMock(stdout="Submitted batch job 101\n"),
+            MagicMock(stdout="Submitted batch job 102\n"),
+            MagicMock(stdout="Submitted batch job 103\n"),
+        ]
+        job_ids = submit_job_array(
+            job_scripts=manifest,
+            output_log="out.log",
+            error_log="err.log",
+            job_name="split_job",
+            partition="general-cpu",
+            array_dir=array_dir,
+            sbatch_options="",
+            time="01:00:00",
+            cpus=1,
+            memory="4G",
+            cwd=tmp_path,
+            rate_limit=None,
+            max_array_size=11,  # indexes 1-10 per array
+            max_in_flight=1,  # one at a time, so the fake job IDs come back in order
+            dry_run=False
+        )
+
+    assert job_ids == ["101", "102", "103"]
+    arrays = [call[0][0] for call in mock_run.call_args_list]
+    assert [c[-2] for c in arrays] == ["--array=1-10", "--array=1-10", "--array=1-5"]
+    assert arrays[2][-1] == str(array_dir / "split_job_master_3.sh")
+
+    # Index 5 of the third array is task 25 of the whole array
+    result = subprocess.run(
+        ["bash", str(array_dir / "split_job_master_3.sh")],
+        env={**os.environ, "SLURM_ARRAY_TASK_ID": "5"},
+        capture_output=True,
+        text=True
+    )
+    assert result.stdout == "task 25\n"
+
+
+def test_compress_ranges():
+    assert compress_ranges([3, 17, 18, 19, 40, 99, 100]) == "3,17-19,40,99-100"
+    assert compress_ranges([5]) == "5"
+
+
+def test_resume_job_array(tmp_path: Path):
+    """Only failed or missing tasks are resubmitted, reusing the master scripts."""
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    writer = ManifestWriter(array_dir)
+    for i in range(1, 26):
+        writer.write("exit 3" if i in (4, 5) else "true")
+    manifest = writer.close()
+
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.side_effect = [MagicMock(stdout=f"Submitted batch job {i}\n") for i in (101, 102, 103)]
+        submit_job_array(
+            job_scripts=manifest,
+            output_log="out.log",
+            error_log="err.log",
+            job_name="resume_job",
+            partition="general-cpu",
+            array_dir=array_dir,
+            sbatch_options="",
+            time="01:00:00",
+            cpus=1,
+            memory="4G",
+            cwd=tmp_path,
+            rate_limit=2,
+            max_array_size=11,
+            max_in_flight=1,
+            dry_run=False
+        )
+
+    # Run every task except 12 and 13 (as if they timed out)
+    for number, first_task, size in ((1, 1, 10), (2, 11, 10), (3, 21, 5)):
+        for index in range(1, size + 1):
+            if first_task + index - 1 in (12, 13):
+                continue
+            subprocess.run(
+                ["bash", str(array_dir / f"resume_job_master_{number}.sh")],
+                env={**os.environ, "SLURM_ARRAY_TASK_ID": str(index)}
+            )
+
+    tasks = (array_dir / "resume_job_tasks.tsv").read_text().splitlines()
+    assert len(tasks) == 23
+    assert any(line.startswith("4\t3\t") for line in tasks)
+
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="Submitted batch job 200\n")
+        job_ids = resume_job_array(array_dir)
+
+    # Tasks 4-5 live in the first array, 12-13 are indexes 2-3 of the second
+    assert job_ids == ["200", "200"]
+    resubmitted = [call[0][0] for call in mock_run.call_args_list]
+    assert resubmitted[0][-2:] == ["--array=4-5%2", str(array_dir / "resume_job_master_1.sh")]
+    assert resubmitted[1][-2:] == ["--array=2-3%2", str(array_dir / "resume_job_master_2.sh")]
+
+
+def test_submit_job_array_pack(tmp_path: Path):
+    """Pack mode runs every command exactly once across all workers and allocations."""
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    writer = ManifestWriter(array_dir)
+    for i in range(1, 31):
+        writer.write("sleep 0.0$(( RANDOM % 5 )); echo \"task $SWARM_TASK_ID\"")
+    manifest = writer.close()
+
+    submit_job_array(
+        job_scripts=manifest,
+        output_log="out.log",
+        error_log="err.log",
+        job_name="packed",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=3,
+        memory="4G",
+        cwd=tmp_path,
+        rate_limit=None,
+        pack=2,
+        dry_run=True
+    )
+    assert "--array=1-2" in (array_dir / "packed_command.txt").read_text()
+
+    # Start both "allocations" at the same time, like Slurm would
+    master_script = str(array_dir / "packed_master.sh")
+    allocations = [
+        subprocess.Popen(["bash", master_script], stdout=subprocess.PIPE, text=True,
+                         env={**os.environ, "SLURM_ARRAY_TASK_ID": str(i)})
+        for i in (1, 2)
+    ]
+    output = "".join(allocation.communicate()[0] for allocation in allocations)
+
+    assert sorted(output.splitlines()) == sorted(f"task {i}" for i in range(1, 31))
+    assert len((array_dir / "packed_tasks.tsv").read_text().splitlines()) == 30
+
+
+def test_dry_run_keeps_the_last_submission(tmp_path: Path):
+    """A dry run with the same job name must not wipe what `swarm resume` needs."""
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    submit_kwargs = dict(
+        job_scripts=[array_dir / "job_1.sh", array_dir / "job_2.sh", array_dir / "job_3.sh"],
+        output_log="out.log", error_log="err.log", job_name="again", partition="general-cpu",
+        array_dir=array_dir, sbatch_options="", time="01:00:00", cpus=1, memory="4G", cwd=tmp_path,
+        rate_limit=None,
+    )
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="Submitted batch job 700\n")
+        submit_job_array(**submit_kwargs, dry_run=False)
+    (array_dir / "again_tasks.tsv").write_text("1\t0\n2\t1\n3\t0\n")
+
+    assert submit_job_array(**submit_kwargs, dry_run=True) == []
+    assert (array_dir / "again_tasks.tsv").read_text() == "1\t0\n2\t1\n3\t0\n"
+    assert load_state(array_dir, "again")["job_ids"] == ["700"]
+
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="Submitted batch job 701\n")
+        resume_job_array(array_dir)
+    assert mock_run.call_args[0][0][-2] == "--array=2"
+
+
+def test_resume_pack_queues_missing_tasks(tmp_path: Path):
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    writer = ManifestWriter(array_dir)
+    for i in range(1, 6):
+        writer.write("echo \"task $SWARM_TASK_ID\"")
+    manifest = writer.close()
+
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="Submitted batch job 200\n")
+        submit_job_array(
+            job_scripts=manifest, output_log="out.log", error_log="err.log", job_name="packed",
+            partition="general-cpu", array_dir=array_dir, sbatch_options="", time="01:00:00",
+            cpus=2, memory="4G", cwd=tmp_path, rate_limit=None, pack=4, dry_run=False
+        )
+    # Only tasks 1, 2 and 4 finished last time
+    (array_dir / "packed_tasks.tsv").write_text("1\t0\n2\t0\n4\t0\n")
+
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="Submitted batch job 300\n")
+        assert resume_job_array(array_dir) == ["300"]
+    assert mock_run.call_args[0][0][-2] == "--array=1-2"
+
+    # The restarted pool only picks up the queued tasks
+    result = subprocess.run(
+        ["bash", str(array_dir / "packed_master.sh")],
+        env={**os.environ, "SLURM_ARRAY_TASK_ID": "1"},
+        capture_output=True,
+        text=True
+    )
+    assert sorted(result.stdout.splitlines()) == ["task 3", "task 5"]
+
+
+@patch("swarm.slurm.time.sleep")
+@patch("swarm.slurm.subprocess.run")
+def test_run_sbatch_retries_transient_errors(mock_run, mock_sleep):
+    """A busy controller is retried with backoff; the job ID comes from --parsable output."""
+    busy = subprocess.CalledProcessError(1, "sbatch", stderr="sbatch: error: Resource temporarily unavailable")
+    mock_run.side_effect = [busy, busy, MagicMock(stdout="4242;cluster\n")]
+
+    assert _run_sbatch(["sbatch", "--job-name=x", "master.sh"]) == "4242"
+    assert mock_run.call_count == 3
+    assert mock_sleep.call_count == 2
+    assert mock_run.call_args[0][0][:2] == ["sbatch", "--parsable"]
+
+    # A real error (e.g. a bad partition) fails straight away
+    mock_run.reset_mock()
+    mock_run.side_effect = subprocess.CalledProcessError(1, "sbatch", stderr="invalid partition specified")
+    with pytest.raises(RuntimeError, match="invalid partition"):
+        _run_sbatch(["sbatch", "master.sh"])
+    assert mock_run.call_count == 1
+
+
+@patch("swarm.slurm.time.sleep")
+@patch("swarm.slurm.subprocess.run")
+def test_run_sbatch_timeout_is_not_submitted_twice(mock_run, mock_sleep):
+    """After "Socket timed out", squeue is asked first: the job may have been accepted after all."""
+    calls = []
+
+    def fake_run(parts, **kwargs):
+        calls.append(parts)
+        if parts[0] == "sbatch":
+            raise subprocess.CalledProcessError(1, "sbatch", stderr="sbatch: error: Socket timed out on send/recv operation")
+        comment = next(part for part in calls[0] if part.startswith("--comment=")).split("=", 1)[1]
+        return MagicMock(stdout=f"4100|other\n4242|{comment}\n")
+
+    mock_run.side_effect = fake_run
+    assert _run_sbatch(["sbatch", "--job-name=x", "master.sh"]) == "4242"
+    assert [parts[0] for parts in calls] == ["sbatch", "squeue"]
+    assert "--name=x" in calls[1]
+
+    # With the user's own --comment there is no way to tell, so it is not retried
+    calls.clear()
+    with pytest.raises(RuntimeError, match="Socket timed out"):
+        _run_sbatch(["sbatch", "--comment=mine", "--job-name=x", "master.sh"])
+    assert len(calls) == 1
+
+
+def test_submit_all_keeps_order_and_collects_errors():
+    def fake_submit(parts):
+        if parts[-1] == "bad.sh":
+            raise RuntimeError("Slurm submission failed: nope")
+        return parts[-1].split(".")[0]
+
+    commands = [["sbatch", f"{name}.sh"] for name in ("1", "2", "bad", "4", "5")]
+    job_ids, errors = submit_all(fake_submit, commands, max_in_flight=3)
+    assert job_ids == ["1", "2", "4", "5"]
+    assert len(errors) == 1
+
+
+def test_stage_dependencies(tmp_path: Path):
+    # Same size: task N waits for task N, split array by split array
+    assert stage_dependencies("align", ["11", "12"], per_task=True) == ["aftercorr:11", "aftercorr:12"]
+    # Different size (e.g. a merge step): wait for the whole stage
+    assert stage_dependencies("align", ["11", "12"], per_task=False) == ["afterok:11:12"]
+
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    with patch("swarm.slurm.subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(stdout="Submitted batch job 12\n")
+        submit_job_array(
+            job_scripts=[array_dir / "job_1.sh", array_dir / "job_2.sh"], output_log="out.log", error_log="err.log",
+            job_name="pipe_sort", partition="general-cpu", array_dir=array_dir, sbatch_options="",
+            time="01:00:00", cpus=1, memory="4G", cwd=tmp_path, rate_limit=None,
+            dependencies=stage_dependencies("pipe_align", ["11"], per_task=True), dry_run=False
+        )
+    command = (array_dir / "pipe_sort_command.txt").read_text().split()
+    assert command[-4:-2] == ["--dependency=aftercorr:11", "--kill-on-invalid-dep=yes"]
+    # A resume must not wait for the old stage again
+    assert not any("dependency" in part for part in load_state(array_dir, "pipe_sort")["sbatch_command"])
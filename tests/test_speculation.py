@@ -0,0 +1,110 @@
+import os
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from swarm.main import app
+from swarm.parser import create_job_scripts
+from swarm.slurm import speculate_job_array, submit_job_array
+from swarm.speculation import Speculation
+from swarm.state import done_path, load_state, started_path
+
+
+def submit_speculative(tmp_path: Path, commands: str):
+    """Submits the commands with --speculative to a fake sbatch, as job 500."""
+    command_file = tmp_path / "commands.sh"
+    command_file.write_text(commands)
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir(exist_ok=True)
+    with patch("swarm.slurm.subprocess.run") as run:
+        run.return_value = subprocess.CompletedProcess([], 0, stdout="Submitted batch job 500\n", stderr="")
+        submit_job_array(
+            job_scripts=create_job_scripts(command_file, array_dir),
+            output_log="%A_%a.log",
+            error_log="%A_%a.err",
+            job_name="spec",
+            partition="general-cpu",
+            array_dir=array_dir,
+            sbatch_options="",
+            time="01:00:00",
+            cpus=1,
+            memory="4G",
+            cwd=tmp_path,
+            rate_limit=None,
+            bundle=1,
+            speculative=True,
+            dry_run=False
+        )
+    return array_dir
+
+
+def run_attempt(master_script: str, job_id: str, task_id: int, cwd: Path, path: str) -> None:
+    """Runs one array task of the master script, as Slurm would for array job `job_id`."""
+    env = {**os.environ, "PATH": path, "SLURM_ARRAY_JOB_ID": job_id, "SLURM_ARRAY_TASK_ID": str(task_id)}
+    subprocess.run(["bash", master_script], cwd=cwd, env=env, check=True)
+
+
+def test_only_the_first_attempt_counts(tmp_path: Path):
+    """The first successful attempt records the task and cancels the duplicate; a later one skips it."""
+    array_dir = submit_speculative(tmp_path, "echo ran >> ran.txt\n")
+    state = load_state(array_dir, "spec")
+    master_script = state["arrays"][0]["master_script"]
+    speculation = Speculation(done_path(array_dir, "spec"), started_path(array_dir, "spec"))
+    speculation.attempts_path(1).write_text("111_1\n222_1\n")
+
+    # A fake scancel that only notes what it was asked to cancel
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    cancelled = tmp_path / "cancelled.txt"
+    (bin_dir / "scancel").write_text(f'#!/bin/bash\necho "$@" >> "{cancelled}"\n')
+    (bin_dir / "scancel").chmod(0o755)
+    path = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+
+    run_attempt(master_script, "222", 1, tmp_path, path)
+    run_attempt(master_script, "111", 1, tmp_path, path)
+
+    assert (tmp_path / "ran.txt").read_text() == "ran\n"
+    assert cancelled.read_text().split() == ["111_1"]
+    assert speculation.marker_path(1).is_dir()
+    assert [line.split("\t")[:2] for line in Path(state["tasks_file"]).read_text().splitlines()] == [["1", "0"]]
+    assert [attempt.attempt_id for attempt in speculation.read_attempts()[1]] == ["222_1"]
+
+
+def test_speculate_resubmits_stragglers_elsewhere(tmp_path: Path):
+    array_dir = submit_speculative(tmp_path, "".join(f"echo {i}\n" for i in range(1, 13)))
+    state = load_state(array_dir, "spec")
+
+    # Ten tasks took 10s each; task 11 has been running on node7 for 100s, task 12 only for 20s
+    Path(state["tasks_file"]).write_text("".join(f"{i}\t0\t0\t10\tnode1\n" for i in range(1, 11)))
+    started_path(array_dir, "spec").write_text("11\t900\tnode7\t500_11\n12\t980\tnode2\t500_12\n")
+
+    with patch("swarm.slurm.subprocess.run") as run:
+        run.return_value = subprocess.CompletedProcess([], 0, stdout="Submitted batch job 600\n", stderr="")
+        job_ids = speculate_job_array(array_dir, "spec", threshold=3.0, now=1000.0)
+
+    assert job_ids == ["600"]
+    sbatch = run.call_args.args[0]
+    assert "--exclude=node7" in sbatch and "--array=11" in sbatch
+    speculation = Speculation(done_path(array_dir, "spec"), started_path(array_dir, "spec"))
+    assert speculation.attempts_path(11).read_text().split() == ["500_11", "600_11"]
+    # Task 11 already has its duplicate
+    assert speculation.find_stragglers(Path(state["tasks_file"]), now=1000.0) == []
+
+
+def test_speculative_needs_one_command_per_array_task(tmp_path: Path):
+    """A winning duplicate cancels the other attempt's whole array task, so bundles are refused."""
+    commands = tmp_path / "commands.sh"
+    commands.write_text("echo one\necho two\n")
+    result = CliRunner().invoke(app, ["--file", str(commands), "--speculative", "--bundle", "2", "--dry-run"])
+    assert result.exit_code != 0
+    assert "--bundle" in result.output
+
+    with pytest.raises(ValueError, match="bundling"):
+        submit_job_array(
+            job_scripts=create_job_scripts(commands, tmp_path), output_log="out.log", error_log="err.log",
+            job_name="spec", partition="general-cpu", array_dir=tmp_path, sbatch_options="", time="01:00:00",
+            cpus=1, memory="4G", cwd=tmp_path, rate_limit=None, bundle=2, speculative=True, dry_run=True
+        )
@@ -0,0 +1,93 @@
+import os
+import pytest
+from pathlib import Path
+
+from swarm.parser import create_job_scripts
+from swarm.slurm import submit_job_array
+from swarm.staging import NodeStaging
+from swarm.state import read_task_status
+
+
+def submit_locally(tmp_path: Path, staging: NodeStaging, command: str, count: int = 6, bundle: int = None):
+    commands = tmp_path / "commands.sh"
+    commands.write_text(f"{command}\n" * count)
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir(exist_ok=True)
+    submit_job_array(
+        job_scripts=create_job_scripts(commands, array_dir),
+        output_log="%A_%a.log",
+        error_log="%A_%a.err",
+        job_name="staged",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=count,
+        memory="4G",
+        cwd=tmp_path,
+        rate_limit=1,
+        bundle=bundle or count,
+        backend="local",
+        staging=staging,
+        dry_run=False
+    )
+    return read_task_status(array_dir / "staged_tasks.tsv")
+
+
+def test_stage_in_once_per_node_and_stage_out(tmp_path: Path, monkeypatch):
+    """Concurrent tasks on one node share one copy of the inputs; results come back."""
+    (tmp_path / "ref.txt").write_text("reference\n")
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setenv("TMPDIR", str(scratch))
+
+    # Count the copies into scratch with a cp wrapper
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    copies = tmp_path / "copies.txt"
+    (bin_dir / "cp").write_text(f'#!/bin/bash\necho "$@" >> "{copies}"\nexec /bin/cp "$@"\n')
+    (bin_dir / "cp").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    staging = NodeStaging.create(["ref.txt"], "results", tmp_path)
+    status = submit_locally(
+        tmp_path, staging, 'sleep 0.5; cat "$SWARM_STAGED/ref.txt" > "$SWARM_OUTPUT/out_$SWARM_TASK_ID.txt"'
+    )
+
+    assert status == {task_id: 0 for task_id in range(1, 7)}
+    for task_id in range(1, 7):
+        assert (tmp_path / "results" / f"out_{task_id}.txt").read_text() == "reference\n"
+    assert sum("/staged/" in line for line in copies.read_text().splitlines()) == 1
+    # Only the per-task output folders are cleaned up; the staged copy stays for later tasks
+    staged = [path for path in scratch.iterdir() if path.is_dir()]
+    assert len(staged) == 1 and not list(staged[0].glob("output_*"))
+
+
+def test_tasks_run_one_after_another_reuse_the_copy(tmp_path: Path, monkeypatch):
+    """A node that runs one task at a time still copies the inputs only once."""
+    (tmp_path / "ref.txt").write_text("reference\n")
+    monkeypatch.setenv("TMPDIR", str(tmp_path / "scratch"))
+    (tmp_path / "scratch").mkdir()
+    staging = NodeStaging.create(["ref.txt"], None, tmp_path)
+
+    # One array task per command, with --rate_limit 1: never two tasks at once
+    status = submit_locally(tmp_path, staging, 'stat -c %Z "$SWARM_STAGED/ref.txt" >> ctimes.txt; sleep 1.1',
+                            count=3, bundle=1)
+
+    assert status == {1: 0, 2: 0, 3: 0}
+    assert len(set((tmp_path / "ctimes.txt").read_text().split())) == 1
+
+
+def test_failed_stage_in_fails_the_task(tmp_path: Path, monkeypatch):
+    (tmp_path / "ref.txt").write_text("reference\n")
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    staging = NodeStaging.create(["ref.txt"], None, tmp_path)
+    (tmp_path / "ref.txt").unlink()
+
+    status = submit_locally(tmp_path, staging, "touch ran.txt", count=2)
+
+    assert status == {1: 1, 2: 1}
+    assert not (tmp_path / "ran.txt").exists()
+
+    with pytest.raises(ValueError, match="not found"):
+        NodeStaging.create(["ref.txt"], None, tmp_path)
@@ -0,0 +1,27 @@
+import os
+from pathlib import Path
+from swarm.state import incomplete_tasks, load_state, read_task_status, save_state
+
+
+def test_read_task_status(tmp_path: Path):
+    tasks_file = tmp_path / "job_tasks.tsv"
+    # Task 2 failed and was later resumed; the last line was cut short
+    tasks_file.write_text("1\t0\n2\t1\n3\t0\n2\t0\n4\t")
+
+    status = read_task_status(tasks_file)
+
+    assert status == {1: 0, 2: 0, 3: 0}
+    assert incomplete_tasks(5, status) == [4, 5]
+    assert read_task_status(tmp_path / "missing.tsv") == {}
+
+
+def test_load_state_picks_most_recent(tmp_path: Path):
+    save_state(tmp_path, "old_job", {"job_name": "old_job"})
+    save_state(tmp_path, "new_job", {"job_name": "new_job"})
+    # Make sure the modification times differ
+    old_file = tmp_path / "old_job_state.json"
+    stamp = old_file.stat().st_mtime - 60
+    os.utime(old_file, (stamp, stamp))
+
+    assert load_state(tmp_path)["job_name"] == "new_job"
+    assert load_state(tmp_path, "old_job")["job_name"] == "old_job"
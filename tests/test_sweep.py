@@ -0,0 +1,79 @@
+import os
+import subprocess
+import pytest
+from pathlib import Path
+
+from swarm.slurm import build_master_script
+from swarm.sweep import create_sweep
+
+
+def run_task(sweep, task_id: int, cwd: Path = None) -> str:
+    """Runs one array task of a sweep the way Slurm would."""
+    script = build_master_script(sweep)
+    result = subprocess.run(
+        ["bash", "-c", script],
+        cwd=cwd,
+        env={**os.environ, "SLURM_ARRAY_TASK_ID": str(task_id)},
+        capture_output=True,
+        text=True
+    )
+    return result.stdout
+
+
+def test_product_sweep(tmp_path: Path):
+    samples = tmp_path / "samples.csv"
+    samples.write_text("sample_id,reads\nS1,r1.fq\nS2,r2.fq\n")
+
+    sweep = create_sweep(
+        'echo "{sample} lr={lr} seed={seed} ${HOME:+home}"',
+        ["sample=@samples.csv:sample_id", "lr=0.1,0.01", "seed=10..30..10"],
+        tmp_path,
+        cwd=tmp_path
+    )
+
+    # 2 samples x 2 learning rates x 3 seeds, last parameter varying fastest
+    assert len(sweep) == 12
+    assert sweep.values(1) == {"sample": "S1", "lr": "0.1", "seed": "10"}
+    assert sweep.values(12) == {"sample": "S2", "lr": "0.01", "seed": "30"}
+    assert sweep.read_command(5) == 'echo "S1 lr=0.01 seed=20 ${HOME:+home}"'
+
+    # Only the template and the two value tables are on disk, nothing per task
+    assert sorted(p.name for p in (tmp_path / "params").iterdir()) == ["lr", "sample"]
+
+    # The master script computes the same values at run time
+    assert run_task(sweep, 1) == "S1 lr=0.1 seed=10 home\n"
+    assert run_task(sweep, 5) == "S1 lr=0.01 seed=20 home\n"
+    assert run_task(sweep, 12) == "S2 lr=0.01 seed=30 home\n"
+
+
+def test_zip_sweep(tmp_path: Path):
+    sweep = create_sweep("echo {x}-{y}", ["x=1..3", "y=a,b,c"], tmp_path, zipped=True)
+    assert len(sweep) == 3
+    assert run_task(sweep, 2) == "2-b\n"
+
+    with pytest.raises(ValueError, match="same number of values"):
+        create_sweep("echo {x}-{y}", ["x=1..3", "y=a,b"], tmp_path, zipped=True)
+    with pytest.raises(ValueError, match="never uses"):
+        create_sweep("echo {x}", ["x=1..3", "unused=1,2"], tmp_path)
+
+
+def test_values_are_quoted(tmp_path: Path):
+    """Values reach the command unchanged, whatever quotes they sit in, and the preview shows the same."""
+    (tmp_path / "decoy.txt").write_text("")
+    sweep = create_sweep(
+        """printf '<%s>' '{v}' "{v}" {v} 'x{v}y' > 'out {n}.txt'""",
+        ["v=a  b,it's,$HOME *", "n=1..1"],
+        tmp_path
+    )
+    for task_id, value in enumerate(["a  b", "it's", "$HOME *"], start=1):
+        run_task(sweep, task_id, cwd=tmp_path)
+        expected = f"<{value}><{value}><{value}><x{value}y>"
+        assert (tmp_path / "out 1.txt").read_text() == expected
+        # The preview is a command that does the same thing
+        subprocess.run(["bash", "-c", sweep.read_command(task_id)], cwd=tmp_path, check=True)
+        assert (tmp_path / "out 1.txt").read_text() == expected
+
+    sweep = create_sweep("echo '{a}' > out_{a}.txt", ["a=1,2"], tmp_path)
+    assert sweep.read_command(1) == "echo '1' > out_1.txt"
+    run_task(sweep, 1, cwd=tmp_path)
+    assert (tmp_path / "out_1.txt").read_text() == "1\n"
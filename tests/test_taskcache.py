@@ -0,0 +1,74 @@
+from pathlib import Path
+from typer.testing import CliRunner
+
+from swarm.main import app
+from swarm.taskcache import TaskCache
+
+runner = CliRunner()
+
+
+def test_up_to_date_tasks_are_skipped(tmp_path: Path, monkeypatch):
+    """Only commands whose declared outputs are stale reach the scheduler again."""
+    monkeypatch.setenv("SWARM_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "a.txt").write_text("a\n")
+    (tmp_path / "b.txt").write_text("b\n")
+    commands = tmp_path / "commands.sh"
+    commands.write_text(
+        "#SWARM --inputs a.txt --outputs a.out\n"
+        "cat a.txt >> a.out\n"
+        "#SWARM --inputs b.txt --outputs b.out\n"
+        "cat b.txt >> b.out\n"
+        "echo always >> always.out\n"
+    )
+    swarm = ["--file", str(commands), "--backend", "local"]
+
+    result = runner.invoke(app, swarm)
+    assert result.exit_code == 0
+    assert "3 of 3 task(s) succeeded" in result.stdout
+
+    # Nothing changed: only the command without declared outputs runs again
+    result = runner.invoke(app, swarm)
+    assert "Skipping 2 task(s)" in result.stdout
+    assert "1 of 1 task(s) succeeded" in result.stdout
+    assert (tmp_path / "a.out").read_text() == "a\n"
+
+    # A changed input, a deleted output and --force each make tasks run again
+    (tmp_path / "a.txt").write_text("a, edited\n")
+    (tmp_path / "b.out").unlink()
+    result = runner.invoke(app, swarm)
+    assert "Skipping" not in result.stdout
+    assert (tmp_path / "a.out").read_text() == "a\na, edited\n"
+    assert (tmp_path / "b.out").read_text() == "b\n"
+
+    result = runner.invoke(app, swarm + ["--force"])
+    assert "Skipping" not in result.stdout
+    assert "3 of 3 task(s) succeeded" in result.stdout
+
+
+def test_stale_upstream_reruns_downstream(tmp_path: Path, monkeypatch):
+    """A command reading the output of a rerun command runs again too, whatever its own key says."""
+    monkeypatch.setenv("SWARM_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "a.txt").write_text("a\n")
+    (tmp_path / "a.out").write_text("a\n")
+    (tmp_path / "b.out").write_text("a\n")
+
+    def check(cache):
+        align = cache.is_up_to_date(cache.key("align", ["a.txt"], ["a.out"]), ["a.txt"], ["a.out"])
+        sort = cache.is_up_to_date(cache.key("sort", ["a.out"], ["b.out"]), ["a.out"], ["b.out"])
+        return align, sort
+
+    cache = TaskCache(tmp_path)
+    cache.record([cache.key("align", ["a.txt"], ["a.out"]), cache.key("sort", ["a.out"], ["b.out"])])
+    assert check(TaskCache(tmp_path)) == (True, True)
+
+    # Only a.txt changed, but "sort" reads what "align" is about to rewrite
+    (tmp_path / "a.txt").write_text("a, edited\n")
+    assert check(TaskCache(tmp_path)) == (False, False)
+
+
+def test_cache_dir_only_created_when_needed(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("SWARM_CACHE_DIR", str(tmp_path / "cache"))
+    cache = TaskCache(tmp_path)
+    assert not cache.is_up_to_date(cache.key("echo hi", [], []), [], [])
+    assert cache.record([]) == 0
+    assert not (tmp_path / "cache").exists()
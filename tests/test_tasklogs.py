@@ -0,0 +1,52 @@
+import pytest
+from pathlib import Path
+
+from swarm.parser import create_task_manifest
+from swarm.slurm import submit_job_array
+from swarm.tasklogs import read_task_logs
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_log_segments(tmp_path: Path, compress: bool):
+    """Task output lands in a few shared segments and can be read back per task."""
+    commands = tmp_path / "commands.sh"
+    commands.write_text("".join(f"echo out {i}; echo err {i} >&2; exit {i % 2}\n" for i in range(1, 8)) + "true\n")
+    array_dir = tmp_path / "arrays"
+    array_dir.mkdir()
+    manifest = create_task_manifest(commands, array_dir)
+
+    submit_job_array(
+        job_scripts=manifest,
+        output_log="%A_%a.log",
+        error_log="%A_%a.err",
+        job_name="logged",
+        partition="general-cpu",
+        array_dir=array_dir,
+        sbatch_options="",
+        time="01:00:00",
+        cpus=2,
+        memory="4G",
+        cwd=tmp_path,
+        rate_limit=3,
+        bundle=2,
+        backend="local",
+        log_segments=3,
+        compress_logs=compress,
+        dry_run=False
+    )
+
+    # No per-task log files, just a few segments with their indexes
+    logs_dir = array_dir / "logged_logs"
+    assert not list(tmp_path.glob("*.log")) and not list(tmp_path.glob("*.err"))
+    extension = ".log.gz" if compress else ".log"
+    for number in range(3):
+        assert (logs_dir / f"segment_{number}{extension}").exists()
+        assert (logs_dir / f"segment_{number}.idx").exists()
+
+    for task_id in range(1, 8):
+        assert read_task_logs(array_dir, task_id) == {"out": f"out {task_id}\n".encode(), "err": f"err {task_id}\n".encode()}
+    # A task that printed nothing has no chunks at all
+    assert read_task_logs(array_dir, 8, job_name="logged") == {"out": None, "err": None}
+
+    with pytest.raises(ValueError, match="outside"):
+        read_task_logs(array_dir, 9)